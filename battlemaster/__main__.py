@@ -2,17 +2,52 @@ import asyncio
 import logging
 import argparse
 from argparse import Namespace
-from typing import Dict
+from contextlib import nullcontext
+from time import perf_counter
+from typing import Dict, List, Optional, Any
 
+from dependency_injector import providers
 from dependency_injector.wiring import Provide, inject
 from poke_env.player import Player
-from poke_env.concurrency import POKE_LOOP
 
 from .containers import Container
+from .benchmarking import BenchmarkResult, play_baselines, format_results_table
+from .sharding import run_sharded_benchmark
+from .isolation import play_isolated_baselines
+from .profiling import profile_loop
+
+BENCHMARK_AGENTS = ['random', 'max_damage', 'simple_heuristic', 'exp_minmax']
 
 
 def _parse_command_line_args() -> Namespace:
     parser = argparse.ArgumentParser()
+    parser.add_argument("--trace", metavar='PATH', help='Write a JSON line per decision (timings, goal, effort, action) to this file')
+    parser.add_argument("--memory-interval", metavar='SECONDS', type=float, help='Log the memory usage of the agent periodically')
+    parser.add_argument("--tracemalloc-top", metavar='N', type=int, default=0,
+                        help='With --memory-interval, also trace allocations and log the N source lines that grew the most')
+    parser.add_argument("--profile", metavar='DIR',
+                        help='Profile the thread battles are played on and write pstats and collapsed stacks (for flame graphs) to this directory')
+    parser.add_argument("--decision-cache", metavar='N', type=int, default=0,
+                        help='Reuse the decisions of up to N perceived states instead of thinking again when a state repeats')
+    parser.add_argument("--decision-cache-scope", choices=['battle', 'global'], default='battle',
+                        help='Whether cached decisions are only reused within the battle they were made in or across battles')
+    parser.add_argument("--shed-load", metavar='MS', type=float,
+                        help='Downgrade battles from trying hard to autopilot once decisions take longer than MS on average, '
+                             'while a simulation is running or when the turn timer runs low')
+    parser.add_argument("--simulation-workers", metavar='N', type=int, default=0,
+                        help='Run mental simulations on N worker processes, overlapping the rest of the decision')
+    parser.add_argument("--simulation-timeout", metavar='SECONDS', type=float, default=5.,
+                        help='With --simulation-workers, how long a decision waits for its mental simulation before deciding without it')
+    parser.add_argument("--speculate", action='store_true',
+                        help="Search the positions likely to follow the agent's order while waiting for the opponent")
+    parser.add_argument("--opponent-top-k", metavar='K', type=int,
+                        help="Only search the opponent's K strongest options in mental simulations")
+    parser.add_argument("--dense-motivation", action='store_true',
+                        help='Activate goals from drives with vector operations instead of symbol by symbol')
+    parser.add_argument("--seed", type=int,
+                        help="Seed the agent's sampling of goals and actions, so each battle samples the same way across runs")
+    parser.add_argument("--opening-book", metavar='PATH',
+                        help='Answer the first turn (and team preview) of battles from this opening book instead of thinking')
     subparsers = parser.add_subparsers(dest="mode")
     subparsers.required = True
 
@@ -20,14 +55,20 @@ def _parse_command_line_args() -> Namespace:
     challenge_parser.add_argument("opponent_username", help='The name of the user')
 
     benchmark_parser = subparsers.add_parser('benchmark', help='Run Battle Master against a benchmark agent')
-    benchmark_parser.add_argument("agent", type=str, help='Which benchmark agent to use',
-                                  choices=['random', 'max_damage', 'simple_heuristic', 'exp_minmax'])
-    benchmark_parser.add_argument("num_battles", type=int, help='The number of battles to play')
+    benchmark_parser.add_argument("agent", type=str, help='Which benchmark agent to use. "all" plays every benchmark agent concurrently',
+                                  choices=[*BENCHMARK_AGENTS, 'all'])
+    benchmark_parser.add_argument("num_battles", type=int, help='The number of battles to play (against each benchmark agent for "all")')
+    benchmark_parser.add_argument("--workers", type=int, default=1,
+                                  help='The number of worker processes to split the battles among. Requires a server with security disabled when greater than 1')
+    benchmark_parser.add_argument("--isolate-baselines", action='store_true',
+                                  help='Host the benchmark agents in a separate process, so they do not compete with the agent for its thread')
 
     ladder_parser = subparsers.add_parser('ladder', help='Play against opponents on the ladder')
     ladder_parser.add_argument("num_games", type=int, help='The number of games to play on the ladder')
 
     args = parser.parse_args()
+    if args.mode == 'benchmark' and args.isolate_baselines and args.workers > 1:
+        parser.error('--isolate-baselines cannot be combined with --workers')
     return args
 
 
@@ -40,20 +81,38 @@ async def challenge_opponent(opponent: str, agent: Player = Provide[Container.pl
 
 
 @inject
-async def benchmark(number_battles: int, benchmark_agent_name: str,
+async def benchmark(number_battles: int, benchmark_agent_names: List[str], isolate_baselines: bool = False,
                     agent: Player = Provide[Container.player],
                     benchmark_agents: Dict[str, Player] = Provide[Container.benchmark_agents]):
     logger = logging.getLogger(f"{__name__}")
-    logger.info(f"Benchmarking {agent.username} against {benchmark_agent_name}")
+    logger.info(f"Benchmarking {agent.username} against {', '.join(benchmark_agent_names)}")
+
+    start_time = perf_counter()
+    if isolate_baselines:
+        results = await play_isolated_baselines(agent, benchmark_agent_names, number_battles)
+    else:
+        baselines = {name: benchmark_agents[name] for name in benchmark_agent_names}
+        results = await play_baselines(agent, baselines, number_battles)
+    _log_benchmark_results(results, perf_counter() - start_time)
+
+
+def sharded_benchmark(number_battles: int, benchmark_agent_names: List[str], workers: int, trace_path: Optional[str],
+                      profile_dir: Optional[str], overrides: Dict[str, Any]):
+    logger = logging.getLogger(f"{__name__}")
+    logger.info(f"Benchmarking against {', '.join(benchmark_agent_names)} with {workers} workers")
+
+    start_time = perf_counter()
+    results = run_sharded_benchmark(number_battles, benchmark_agent_names, workers, trace_path, profile_dir, overrides)
+    _log_benchmark_results(results, perf_counter() - start_time)
 
-    benchmark_agent = benchmark_agents[benchmark_agent_name]
-    benchmark_agent.ps_client._listening_coroutine = asyncio.run_coroutine_threadsafe(
-        benchmark_agent.ps_client.listen(), POKE_LOOP
-    )
-    await benchmark_agent.ps_client.wait_for_login()
 
-    await agent.battle_against(benchmark_agent, number_battles)
-    logger.info(f'Agent won {agent.n_won_battles} / {number_battles} battles {agent.n_won_battles/number_battles}%')
+def _log_benchmark_results(results: List[BenchmarkResult], elapsed_seconds: float):
+    logger = logging.getLogger(f"{__name__}")
+    total_battles = sum(result.battles for result in results)
+    total_wins = sum(result.wins for result in results)
+    logger.info(f'Agent won {total_wins} / {total_battles} battles {total_wins / total_battles if total_battles else 0.}%')
+    logger.info(f'Played {total_battles} battles in {elapsed_seconds:.1f}s ({total_battles / elapsed_seconds:.2f} battles/s)')
+    logger.info(f'Results:\n{format_results_table(results)}')
 
 
 @inject
@@ -67,13 +126,46 @@ async def play_ladder(num_games: int, agent: Player = Provide[Container.player])
 if __name__ == "__main__":
     cli_args = _parse_command_line_args()
 
+    is_sharded = cli_args.mode == 'benchmark' and cli_args.workers > 1
+
+    # applied to the containers of sharded workers as well
+    agent_overrides = {
+        'decision_cache_size': cli_args.decision_cache,
+        'decision_cache_per_battle': cli_args.decision_cache_scope == 'battle',
+        'load_target_ms': cli_args.shed_load,
+        'simulation_workers': cli_args.simulation_workers,
+        'simulation_timeout': cli_args.simulation_timeout,
+        'speculate': cli_args.speculate,
+        'opponent_top_k': cli_args.opponent_top_k,
+        'dense_motivation': cli_args.dense_motivation,
+        'seed': cli_args.seed,
+        'opening_book_path': cli_args.opening_book,
+    }
+
     ioc_container = Container()
+    for provider_name, value in agent_overrides.items():
+        getattr(ioc_container, provider_name).override(providers.Object(value))
+    if not is_sharded:
+        # sharded workers trace to their own files
+        ioc_container.trace_path.override(providers.Object(cli_args.trace))
+    ioc_container.memory_interval.override(providers.Object(cli_args.memory_interval))
+    ioc_container.memory_top.override(providers.Object(cli_args.tracemalloc_top))
     ioc_container.init_resources()
     ioc_container.wire(modules=[__name__])
 
-    if cli_args.mode == 'challenge':
-        asyncio.run(challenge_opponent(cli_args.opponent_username))
-    elif cli_args.mode == 'benchmark':
-        asyncio.run(benchmark(cli_args.num_battles, cli_args.agent))
-    elif cli_args.mode == 'ladder':
-        asyncio.run(play_ladder(cli_args.num_games))
+    # sharded workers profile their own POKE_LOOP
+    profiling = profile_loop(cli_args.profile, cli_args.mode) if cli_args.profile and not is_sharded else nullcontext()
+    with profiling:
+        if cli_args.mode == 'challenge':
+            asyncio.run(challenge_opponent(cli_args.opponent_username))
+        elif cli_args.mode == 'benchmark':
+            baseline_names = BENCHMARK_AGENTS if cli_args.agent == 'all' else [cli_args.agent]
+            if is_sharded:
+                sharded_benchmark(cli_args.num_battles, baseline_names, cli_args.workers, cli_args.trace, cli_args.profile,
+                                  agent_overrides)
+            else:
+                asyncio.run(benchmark(cli_args.num_battles, baseline_names, cli_args.isolate_baselines))
+        elif cli_args.mode == 'ladder':
+            asyncio.run(play_ladder(cli_args.num_games))
+
+    ioc_container.shutdown_resources()
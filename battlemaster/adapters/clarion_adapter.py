@@ -1,5 +1,7 @@
 import logging
-from typing import Mapping, Optional, Dict
+from functools import partial
+from time import perf_counter
+from typing import Mapping, Optional, Dict, List, Tuple
 from enum import Enum
 
 import pyClarion as cl
@@ -8,7 +10,11 @@ from poke_env.environment import (
     Battle, Pokemon, SideCondition, STACKABLE_CONDITIONS, Weather, Field
 )
 
-from ..clarion_ext.attention import GroupedStimulusInput
+from ..clarion_ext.attention import GroupedStimulusInput, GroupedChunkInstance, SymbolTable
+from ..clarion_ext.battle_state import BattleScoped, find_battle_scoped
+from ..clarion_ext.knowledge import HiddenInformationLedger, SpeciesKnowledge
+from ..tracing import DecisionTracer, TurnSpan
+from .decision_cache import DecisionCache, CachedDecision
 
 
 class BattleConcept(str, Enum):
@@ -30,94 +36,226 @@ class BattleConcept(str, Enum):
         return self.value
 
 
+def opponent_pokemon(perception: GroupedStimulusInput) -> List[GroupedChunkInstance]:
+    """The opponent's perceived Pokemon, the active one first"""
+    return [*perception.group_stimulus(BattleConcept.OPPONENT_ACTIVE_POKEMON).keys(),
+            *perception.group_stimulus(BattleConcept.OPPONENT_TEAM).keys()]
+
+
 class MindAdapter:
-    def __init__(self, mind: cl.Structure, stimulus: cl.Construct, factory: 'PerceptionFactory'):
+    """
+    Feeds battles to the mind and reads its decisions. With a decision cache, the ACS's action distribution is cached
+    by perceived state: when a state repeats, the mind is not stepped at all and the action is sampled from the cached
+    distribution instead, with the battle's random stream. Since the mind is skipped, per-battle state in the mind (e.g.,
+    the sticky goal) is not updated on those turns. The exception is the ledger of what the opponent revealed, which is
+    fed from every perception, cached or not, and by observe on turns that aren't perceived at all.
+    """
+    _SUBSYSTEMS = ('ms', 'mcs', 'nacs', 'acs')
+    # never repeat, so they are left out of the key of a perceived state
+    _VOLATILE_FEATURES = ('tag', 'turn')
+    # who plays doesn't change the decision, so the same position against another opponent is reused
+    _IGNORED_GROUPS = (BattleConcept.PLAYERS,)
+
+    def __init__(self, mind: cl.Structure, stimulus: cl.Construct, factory: 'PerceptionFactory',
+                 tracer: Optional[DecisionTracer] = None, decision_cache: Optional[DecisionCache] = None,
+                 ledger: Optional[HiddenInformationLedger] = None):
         self._mind = mind
+        self._ledger = ledger
         self._stimulus = stimulus
         self._factory = factory
+        self._tracer = tracer
+        self._decision_cache = decision_cache
+        self._cached_decision: Optional[CachedDecision] = None
+        self._cached_action: Optional[str] = None
+        self._battle_scoped: Optional[List[BattleScoped]] = None
         self._logger = logging.getLogger(f"{__name__}")
 
+        if tracer is not None:
+            tracer.instrument({name: mind[cl.subsystem(name)] for name in self._SUBSYSTEMS})
+
+    def observe(self, battle: Battle):
+        """
+        Notes what the opponent has revealed in the battle, for turns that are decided without perceiving the battle
+        (e.g., turns with a single option or openings from the book), so no reveal is missed.
+        """
+        if self._ledger is not None:
+            self._ledger.observe(battle.battle_tag, self._factory.map_opponent_pokemon(battle))
+
+    def opponent_knowledge(self, battle_tag: str) -> Optional[Mapping[str, SpeciesKnowledge]]:
+        """What has been revealed about the opponent's Pokemon in the battle, by species. None without a ledger."""
+        return self._ledger.snapshot(battle_tag) if self._ledger is not None else None
+
     def perceive(self, battle: Battle) -> Mapping[str, nd.NumDict]:
+        start_time = perf_counter()
         perception = self._factory.map(battle)
+        self._cached_decision = None
+        if self._ledger is not None:
+            self._ledger.observe(battle.battle_tag, opponent_pokemon(perception))
+
+        state_key = None
+        if self._decision_cache is not None:
+            state_key = perception.canonical_key(self._VOLATILE_FEATURES, self._IGNORED_GROUPS)
+            cached_decision = self._decision_cache.get(battle.battle_tag, state_key)
+            if cached_decision is not None:
+                self._replay(cached_decision, battle.battle_tag, start_time)
+                return perception.view()
 
         self._stimulus.process.input(perception)
+        perceived_time = perf_counter()
         self._mind.step()
         #self._logger.info(cl.pprint(self._mind[cl.buffer('wm_ms_out')].output))
         #self._logger.info(cl.pprint(self._mind[cl.subsystem('nacs')][cl.chunks('goal_in')].output))
         #self._logger.info(cl.pprint(self._mind[cl.subsystem('nacs')][cl.flow_tt('actions_to_pick_from')].output))
 
-        return perception.to_stimulus()
+        if self._tracer is not None and self._tracer.current is not None:
+            self._record_step(self._tracer.current, perceived_time - start_time, perf_counter() - perceived_time)
+
+        if state_key is not None:
+            self._decision_cache.put(battle.battle_tag, state_key, self._read_decision())
+
+        return perception.view()
 
     def choose_action(self) -> Optional[str]:
+        if self._cached_decision is not None:
+            return self._cached_action
         acs_terminus = self._mind[cl.subsystem('acs')][cl.terminus("choose_move")]
         acs_output = [action_chunk.cid for action_chunk in acs_terminus.output.keys()]
         return acs_output[0] if len(acs_output) > 0 else None
 
+    def forget(self, battle_tag: str):
+        """Drops all state the mind keeps for the battle"""
+        if self._battle_scoped is None:
+            self._battle_scoped = list(find_battle_scoped(self._mind))
+        for holder in self._battle_scoped:
+            holder.forget_battle(battle_tag)
+        if self._decision_cache is not None:
+            self._decision_cache.forget(battle_tag)
+
+    def current_goal(self) -> Optional[str]:
+        if self._cached_decision is not None:
+            return self._cached_decision.goal
+        goal_terminus = self._mind[cl.subsystem('mcs')][cl.terminus('goal_out')]
+        goals = [goal_chunk.cid for goal_chunk in goal_terminus.output.keys()]
+        return goals[0] if len(goals) > 0 else None
+
+    def current_effort(self) -> Optional[str]:
+        if self._cached_decision is not None:
+            return self._cached_decision.effort
+        effort_gate = self._mind[cl.buffer('mcs_effort_gate')]
+        efforts = [effort_feature.tag[1] for effort_feature in effort_gate.output.keys()]
+        return efforts[0] if len(efforts) > 0 else None
+
+    def _record_step(self, span: TurnSpan, perceive_seconds: float, step_seconds: float):
+        span.perceive_ms = perceive_seconds * 1000
+        span.step_ms['total'] = step_seconds * 1000
+        span.goal = self.current_goal()
+        span.effort = self.current_effort()
+        span.action = self.choose_action()
+        span.cached = self._cached_decision is not None
+
+    def _replay(self, decision: CachedDecision, battle_tag: str, start_time: float):
+        self._cached_decision = decision
+        sampled_time = perf_counter()
+        # drawn from the battle's stream the ACS's selector draws from, so seeded battles replay the same way
+        streams = self._mind[cl.subsystem('acs')][cl.terminus('choose_move')].process.streams
+        self._cached_action = decision.sample(streams.generator(battle_tag))
+
+        if self._tracer is not None and self._tracer.current is not None:
+            self._record_step(self._tracer.current, sampled_time - start_time, perf_counter() - sampled_time)
+
+    def _read_decision(self) -> CachedDecision:
+        """Reads the distribution the ACS's selector sampled this step's action from"""
+        acs = self._mind[cl.subsystem('acs')]
+        selector = acs[cl.terminus('choose_move')].process
+        strengths = nd.threshold(acs[cl.chunks('out')].output, th=selector.threshold, keep_default=True)
+        probabilities = nd.boltzmann(strengths, selector.temperature) if len(strengths) > 0 else strengths
+        return CachedDecision([action.cid for action in probabilities.keys()], list(probabilities.values()),
+                              self.current_goal(), self.current_effort())
+
 
 class PerceptionFactory:
+    """
+    Maps a battle to a perception. The groups only mental simulation reads (the players, side conditions, weather and
+    field effects) are deferred, so turns that don't simulate don't build them. The battle's state they are built from
+    is copied right away and also keys them (see GroupedStimulusInput.canonical_key), except for the players.
+    """
+    # shared by every battle of the process, so the symbols a battle perceives are interned across turns and battles
+    _symbols = SymbolTable()
+
     def map(self, battle: Battle) -> GroupedStimulusInput:
-        perception = GroupedStimulusInput([concept for concept in BattleConcept])
+        perception = GroupedStimulusInput([concept for concept in BattleConcept], self._symbols)
 
         self._add_battle_metadata(battle, perception)
-        self._add_players(battle, perception)
+        players = ((battle.player_username, battle.player_role, battle.rating),
+                   (battle.opponent_username, battle.opponent_role, battle.opponent_rating))
+        perception.defer_group(BattleConcept.PLAYERS, partial(self._add_players, players, perception))
 
         self._add_player_active_pokemon(battle.active_pokemon, perception)
         self._add_available_moves(battle, perception)
         self._add_available_switches(battle, perception)
         self._add_player_team(battle.team, perception)
-        self._add_side_conditions(battle.side_conditions, BattleConcept.SIDE_CONDITIONS, perception)
+        side_conditions = dict(battle.side_conditions)
+        perception.defer_group(BattleConcept.SIDE_CONDITIONS,
+                               partial(self._add_side_conditions, side_conditions, BattleConcept.SIDE_CONDITIONS, perception),
+                               key=frozenset(side_conditions.items()))
 
         self._add_opponent_active_pokemon(battle.opponent_active_pokemon, perception)
         self._add_active_opponent_pokemon_types(battle, perception)
         self._add_opponent_team(battle.opponent_team, perception)
-        self._add_side_conditions(battle.opponent_side_conditions, BattleConcept.OPPONENT_SIDE_CONDITIONS, perception)
+        opponent_side_conditions = dict(battle.opponent_side_conditions)
+        perception.defer_group(BattleConcept.OPPONENT_SIDE_CONDITIONS,
+                               partial(self._add_side_conditions, opponent_side_conditions, BattleConcept.OPPONENT_SIDE_CONDITIONS, perception),
+                               key=frozenset(opponent_side_conditions.items()))
 
-        self._add_weather(battle.weather, perception)
-        self._add_field_effects(battle.fields, perception)
+        weather, fields = dict(battle.weather), dict(battle.fields)
+        perception.defer_group(BattleConcept.WEATHER, partial(self._add_weather, weather, perception), key=frozenset(weather.items()))
+        perception.defer_group(BattleConcept.FIELD_EFFECTS, partial(self._add_field_effects, fields, perception), key=frozenset(fields.items()))
 
         return perception
 
-    @staticmethod
-    def _add_battle_metadata(battle: Battle, perception: GroupedStimulusInput):
-        features = [
-            cl.feature('tag', battle.battle_tag),
-            cl.feature('force_switch', battle.force_switch),
-            cl.feature('wait', battle._wait),
-            cl.feature('format', battle._format),
-            cl.feature('is_team_preview', battle.in_team_preview),
-            cl.feature('turn', battle.turn)
-        ]
-        perception.add_chunk_instance_to_group(cl.chunk('metadata'), BattleConcept.BATTLE, features)
+    def map_opponent_pokemon(self, battle: Battle) -> List[GroupedChunkInstance]:
+        """The opponent's perceived Pokemon alone, the active one first, as the mind perceives them in a full perception"""
+        perception = GroupedStimulusInput([BattleConcept.OPPONENT_ACTIVE_POKEMON, BattleConcept.OPPONENT_TEAM], self._symbols)
+        self._add_opponent_active_pokemon(battle.opponent_active_pokemon, perception)
+        self._add_opponent_team(battle.opponent_team, perception)
+        return opponent_pokemon(perception)
 
-    @staticmethod
-    def _add_players(battle: Battle, perception: GroupedStimulusInput):
-        self_features = [
-            cl.feature('name', battle.player_username),
-            cl.feature('role', battle.player_role),
-            cl.feature('rating', battle.rating)
+    @classmethod
+    def _add_battle_metadata(cls, battle: Battle, perception: GroupedStimulusInput):
+        features = [
+            cls._symbols.feature('tag', battle.battle_tag),
+            cls._symbols.feature('force_switch', battle.force_switch),
+            cls._symbols.feature('wait', battle._wait),
+            cls._symbols.feature('format', battle._format),
+            cls._symbols.feature('is_team_preview', battle.in_team_preview),
+            cls._symbols.feature('turn', battle.turn)
         ]
-        perception.add_chunk_instance_to_group(cl.chunk('self'), BattleConcept.PLAYERS, self_features)
+        perception.add_chunk_instance_to_group(cls._symbols.chunk('metadata'), BattleConcept.BATTLE, features)
 
-        opponent_features = [
-            cl.feature('name', battle.opponent_username),
-            cl.feature('role', battle.opponent_role),
-            cl.feature('rating', battle.opponent_rating)
-        ]
-        perception.add_chunk_instance_to_group(cl.chunk('opponent'), BattleConcept.PLAYERS, opponent_features)
+    @classmethod
+    def _add_players(cls, players: Tuple[Tuple[Optional[str], Optional[str], Optional[int]], ...], perception: GroupedStimulusInput):
+        """players holds the name, role and rating of the agent, then of the opponent"""
+        for player_chunk, (name, role, rating) in zip(('self', 'opponent'), players):
+            features = [
+                cls._symbols.feature('name', name),
+                cls._symbols.feature('role', role),
+                cls._symbols.feature('rating', rating)
+            ]
+            perception.add_chunk_instance_to_group(cls._symbols.chunk(player_chunk), BattleConcept.PLAYERS, features)
 
-    @staticmethod
-    def _add_active_opponent_pokemon_types(battle: Battle, perception: GroupedStimulusInput):
-        type_chunks = [cl.chunk(typing.name.lower()) for typing in battle.opponent_active_pokemon.types if typing is not None]
+    @classmethod
+    def _add_active_opponent_pokemon_types(cls, battle: Battle, perception: GroupedStimulusInput):
+        type_chunks = [cls._symbols.chunk(typing.name.lower()) for typing in battle.opponent_active_pokemon.types if typing is not None]
         perception.add_chunks_to_group(type_chunks, BattleConcept.ACTIVE_OPPONENT_TYPE)
 
-    @staticmethod
-    def _add_available_moves(battle: Battle, perception: GroupedStimulusInput):
-        move_chunks = [cl.chunk(move.id) for move in battle.available_moves]
+    @classmethod
+    def _add_available_moves(cls, battle: Battle, perception: GroupedStimulusInput):
+        move_chunks = [cls._symbols.chunk(move.id) for move in battle.available_moves]
         perception.add_chunks_to_group(move_chunks, BattleConcept.AVAILABLE_MOVES)
 
-    @staticmethod
-    def _add_available_switches(battle: Battle, perception: GroupedStimulusInput):
-        pokemon_chunks = [cl.chunk(pokemon.species) for pokemon in battle.available_switches]
+    @classmethod
+    def _add_available_switches(cls, battle: Battle, perception: GroupedStimulusInput):
+        pokemon_chunks = [cls._symbols.chunk(pokemon.species) for pokemon in battle.available_switches]
         perception.add_chunks_to_group(pokemon_chunks, BattleConcept.AVAILABLE_SWITCHES)
 
     @classmethod
@@ -136,12 +274,12 @@ class PerceptionFactory:
     @classmethod
     def _add_side_conditions(cls, side_conditions: Dict[SideCondition, int], group: str, perception: GroupedStimulusInput):
         for condition, value in side_conditions.items():
-            chunk = cl.chunk(cls._normalize_name(condition))
+            chunk = cls._symbols.chunk(cls._normalize_name(condition))
             features = []
             if condition in STACKABLE_CONDITIONS:
-                features.append(cl.feature('layers', value))
+                features.append(cls._symbols.feature('layers', value))
             else:
-                features.append(cl.feature('start_turn', value))
+                features.append(cls._symbols.feature('start_turn', value))
 
             perception.add_chunk_instance_to_group(chunk, group, features)
 
@@ -161,58 +299,58 @@ class PerceptionFactory:
     @classmethod
     def _add_weather(cls, weather_turn_map: Dict[Weather, int], perception: GroupedStimulusInput):
         for weather, turn in weather_turn_map.items():
-            chunk = cl.chunk(cls._normalize_name(weather))
+            chunk = cls._symbols.chunk(cls._normalize_name(weather))
             perception.add_chunk_instance_to_group(chunk,
                                                    BattleConcept.WEATHER,
-                                                   [cl.feature('start_turn', turn)])
+                                                   [cls._symbols.feature('start_turn', turn)])
 
     @classmethod
     def _add_field_effects(cls, fields: Dict[Field, int], perception: GroupedStimulusInput):
         for field, turn in fields.items():
-            chunk = cl.chunk(cls._normalize_name(field))
+            chunk = cls._symbols.chunk(cls._normalize_name(field))
             perception.add_chunk_instance_to_group(chunk,
                                                    BattleConcept.FIELD_EFFECTS,
-                                                   [cl.feature('start_turn', turn)])
+                                                   [cls._symbols.feature('start_turn', turn)])
 
     @classmethod
     def _add_player_pokemon(cls, pokemon: Pokemon, group: str, perception: GroupedStimulusInput):
         features = [
-            *[cl.feature('type', cls._normalize_name(typing)) for typing in pokemon.types if typing is not None],
-            cl.feature('level', pokemon.level),
-            cl.feature('fainted', pokemon.fainted),
-            cl.feature('active', pokemon.active),
-            cl.feature('status', cls._normalize_name(pokemon.status) if pokemon.status is not None else None),
-            *[cl.feature('volatile_status', cls._normalize_name(effect)) for effect in pokemon.effects.keys()],
-            *[cl.feature(stat, pokemon.stats[stat]) for stat in ['atk', 'def', 'spa', 'spd', 'spe']],
-            cl.feature('hp', pokemon.current_hp),
-            cl.feature('max_hp', pokemon.max_hp),
-            cl.feature('item', pokemon.item),
-            cl.feature('ability', pokemon.ability),
-            *[cl.feature('move', name) for name, move in pokemon.moves.items() if move.current_pp > 0],
-            *[cl.feature(f'{stat}_boost', pokemon.boosts[stat]) for stat in ['atk', 'def', 'spa', 'spd', 'spe', 'accuracy', 'evasion']],
-            cl.feature('terastallized', pokemon.terastallized)
+            *[cls._symbols.feature('type', cls._normalize_name(typing)) for typing in pokemon.types if typing is not None],
+            cls._symbols.feature('level', pokemon.level),
+            cls._symbols.feature('fainted', pokemon.fainted),
+            cls._symbols.feature('active', pokemon.active),
+            cls._symbols.feature('status', cls._normalize_name(pokemon.status) if pokemon.status is not None else None),
+            *[cls._symbols.feature('volatile_status', cls._normalize_name(effect)) for effect in pokemon.effects.keys()],
+            *[cls._symbols.feature(stat, pokemon.stats[stat]) for stat in ['atk', 'def', 'spa', 'spd', 'spe']],
+            cls._symbols.feature('hp', pokemon.current_hp),
+            cls._symbols.feature('max_hp', pokemon.max_hp),
+            cls._symbols.feature('item', pokemon.item),
+            cls._symbols.feature('ability', pokemon.ability),
+            *[cls._symbols.feature('move', name) for name, move in pokemon.moves.items() if move.current_pp > 0],
+            *[cls._symbols.feature(f'{stat}_boost', pokemon.boosts[stat]) for stat in ['atk', 'def', 'spa', 'spd', 'spe', 'accuracy', 'evasion']],
+            cls._symbols.feature('terastallized', pokemon.terastallized)
         ]
 
-        perception.add_chunk_instance_to_group(cl.chunk(pokemon.species), group, features)
+        perception.add_chunk_instance_to_group(cls._symbols.chunk(pokemon.species), group, features)
 
     @classmethod
     def _add_opponent_pokemon(cls, pokemon: Pokemon, group: str, perception: GroupedStimulusInput):
         features = [
-            *[cl.feature('type', cls._normalize_name(typing)) for typing in pokemon.types if typing is not None],
-            cl.feature('level', pokemon.level),
-            cl.feature('fainted', pokemon.fainted),
-            cl.feature('active', pokemon.active),
-            cl.feature('status', cls._normalize_name(pokemon.status) if pokemon.status is not None else None),
-            *[cl.feature('volatile_status', cls._normalize_name(effect)) for effect in pokemon.effects.keys()],
-            cl.feature('hp_percentage', pokemon.current_hp),
-            cl.feature('item', pokemon.item),
-            cl.feature('ability', pokemon.ability),
-            *[cl.feature('move', name) for name, move in pokemon.moves.items() if move.current_pp > 0],
-            *[cl.feature(f'{stat}_boost', pokemon.boosts[stat]) for stat in ['atk', 'def', 'spa', 'spd', 'spe', 'accuracy', 'evasion']],
-            cl.feature('terastallized', pokemon.terastallized)
+            *[cls._symbols.feature('type', cls._normalize_name(typing)) for typing in pokemon.types if typing is not None],
+            cls._symbols.feature('level', pokemon.level),
+            cls._symbols.feature('fainted', pokemon.fainted),
+            cls._symbols.feature('active', pokemon.active),
+            cls._symbols.feature('status', cls._normalize_name(pokemon.status) if pokemon.status is not None else None),
+            *[cls._symbols.feature('volatile_status', cls._normalize_name(effect)) for effect in pokemon.effects.keys()],
+            cls._symbols.feature('hp_percentage', pokemon.current_hp),
+            cls._symbols.feature('item', pokemon.item),
+            cls._symbols.feature('ability', pokemon.ability),
+            *[cls._symbols.feature('move', name) for name, move in pokemon.moves.items() if move.current_pp > 0],
+            *[cls._symbols.feature(f'{stat}_boost', pokemon.boosts[stat]) for stat in ['atk', 'def', 'spa', 'spd', 'spe', 'accuracy', 'evasion']],
+            cls._symbols.feature('terastallized', pokemon.terastallized)
         ]
 
-        perception.add_chunk_instance_to_group(cl.chunk(pokemon.species), group, features)
+        perception.add_chunk_instance_to_group(cls._symbols.chunk(pokemon.species), group, features)
 
     @staticmethod
     def _normalize_name(enum: Enum):
@@ -0,0 +1,73 @@
+from collections import OrderedDict
+from typing import Hashable, Optional, List, Dict, Set, Tuple
+
+import numpy as np
+
+
+class CachedDecision:
+    """The ACS's action distribution for a perceived state, along with the goal and effort that produced it"""
+    __slots__ = ('actions', 'probabilities', 'goal', 'effort')
+
+    def __init__(self, actions: List[str], probabilities: List[float], goal: Optional[str], effort: Optional[str]):
+        self.actions = actions
+        self.probabilities = probabilities
+        self.goal = goal
+        self.effort = effort
+
+    def sample(self, generator: np.random.Generator) -> Optional[str]:
+        """Draws an action with a single uniform from the generator, like the ACS's selector draws its action"""
+        if len(self.actions) == 0:
+            return None
+        cumulative = np.cumsum(self.probabilities)
+        index = int(np.searchsorted(cumulative, generator.random() * cumulative[-1], side='right'))
+        return self.actions[min(index, len(self.actions) - 1)]
+
+
+class DecisionCache:
+    """
+    A bounded LRU cache of decisions keyed by perceived state. With per_battle, states are only reused within the battle
+    they were seen in and a battle's entries are dropped when it is forgotten. Otherwise entries are shared by all
+    battles and only evicted by size.
+    """
+
+    def __init__(self, max_size: int = 1024, per_battle: bool = False):
+        if max_size < 1:
+            raise ValueError(f'The decision cache needs room for at least one entry, but got {max_size}')
+        self._max_size = max_size
+        self._per_battle = per_battle
+        self._entries: 'OrderedDict[Tuple[Optional[str], Hashable], CachedDecision]' = OrderedDict()
+        self._keys_by_battle: Dict[str, Set[Tuple[Optional[str], Hashable]]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, battle_tag: str, key: Hashable) -> Optional[CachedDecision]:
+        scoped_key = self._scoped_key(battle_tag, key)
+        decision = self._entries.get(scoped_key)
+        if decision is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(scoped_key)
+        return decision
+
+    def put(self, battle_tag: str, key: Hashable, decision: CachedDecision):
+        scoped_key = self._scoped_key(battle_tag, key)
+        self._entries[scoped_key] = decision
+        self._entries.move_to_end(scoped_key)
+        if self._per_battle:
+            self._keys_by_battle.setdefault(battle_tag, set()).add(scoped_key)
+
+        while len(self._entries) > self._max_size:
+            evicted_key, _ = self._entries.popitem(last=False)
+            if self._per_battle:
+                self._keys_by_battle.get(evicted_key[0], set()).discard(evicted_key)
+
+    def forget(self, battle_tag: str):
+        for scoped_key in self._keys_by_battle.pop(battle_tag, ()):
+            self._entries.pop(scoped_key, None)
+
+    def _scoped_key(self, battle_tag: str, key: Hashable) -> Tuple[Optional[str], Hashable]:
+        return (battle_tag if self._per_battle else None), key
@@ -1,17 +1,21 @@
-from typing import Mapping, List, Optional
+from typing import Mapping, List, Optional, Dict, Hashable, Sequence, Tuple
 from collections import defaultdict
 from enum import Enum
 from functools import partial
 
+from poke_env.data import GenData
 from poke_env.environment import Battle, Pokemon, Effect, Field
 from poke_engine import Battle as Simulation, Battler, Pokemon as PokemonSimulation, constants, StateMutator
 from poke_engine.select_best_move import get_payoff_matrix, pick_safest
+from poke_engine.find_state_instructions import get_all_state_instructions
 from poke_engine.helpers import normalize_name
 from poke_engine.constants import SWITCH_STRING
 from pyClarion import nd
 
 from .clarion_adapter import BattleConcept
+from .search_cache import SearchCache, PayoffMatrix
 from ..clarion_ext.attention import GroupedChunkInstance
+from ..clarion_ext.knowledge import SpeciesKnowledge, is_revealed
 from ..clarion_ext.numdicts_ext import get_chunk_from_numdict, get_only_value_from_numdict, is_empty
 
 
@@ -24,18 +28,90 @@ class OptionFilter(Enum):
         return self.value(*args, **kwargs)
 
 
-class Simulator:
+_move_data = GenData.from_gen(9).moves
+
+
+def _estimate_power(option: str) -> float:
+    """A cheap estimate of how strong an option is: the expected base power of moves. Switches come last."""
+    if option.startswith(SWITCH_STRING):
+        return -1.
+    move = _move_data.get(option)
+    if move is None:
+        return 0.
+    accuracy = 100 if move['accuracy'] is True else move['accuracy']
+    return move['basePower'] * accuracy / 100
+
+
+class SearchStats:
+    """
+    How well the searches of a Simulator were pruned: of the (bot option, opponent option) pairs at the root of every
+    search, how many were searched. Pruned pairs are missing from the payoff matrix get_payoff_matrix returns.
+    """
+
     def __init__(self):
-        pass
+        self.searches = 0
+        self.pairs_possible = 0
+        self.pairs_searched = 0
 
-    def pick_safest_move(self, simulation: Simulation, user_option_filter: OptionFilter = OptionFilter.NO_FILTER) -> Optional[str]:
+    @property
+    def pruned(self) -> float:
+        """Share of root pairs that were pruned"""
+        return 1 - self.pairs_searched / self.pairs_possible if self.pairs_possible > 0 else 0.
+
+    def record(self, scores: PayoffMatrix, user_options: Sequence[str], opponent_options: Sequence[str]):
+        self.searches += 1
+        self.pairs_possible += len(user_options) * len(opponent_options)
+        self.pairs_searched += len(scores)
+
+    def merge(self, other: 'SearchStats'):
+        self.searches += other.searches
+        self.pairs_possible += other.pairs_possible
+        self.pairs_searched += other.pairs_searched
+
+    def __str__(self):
+        return (f'{self.searches} searches, {self.pairs_searched} / {self.pairs_possible} root pairs searched '
+                f'({self.pruned:.1%} pruned)')
+
+
+class Simulator:
+    """
+    Searches for the safest option of a battle. With a search cache, the payoff matrices of positions that were already
+    searched (e.g., speculatively) are reused. The cache stays in the process that created the simulator: a copy sent to
+    a worker process searches without it and with stats of its own.
+
+    get_payoff_matrix prunes an option once a reply makes it worse than an option already searched, so options are
+    searched strongest first: the bot's by the given priority (e.g., the activations of the mind's efficacy reasoning),
+    then by the base power of moves, and the opponent's by the base power of moves. With opponent_top_k, only the
+    opponent's k strongest options are searched.
+    """
+
+    def __init__(self, cache: Optional[SearchCache] = None, order_options: bool = True, opponent_top_k: Optional[int] = None):
+        if opponent_top_k is not None and opponent_top_k < 1:
+            raise ValueError(f'At least one opponent option must be searched, but got a top k of {opponent_top_k}')
+        self._cache = cache
+        self._should_order_options = order_options
+        self._opponent_top_k = opponent_top_k
+        self.stats = SearchStats()
+
+    def __getstate__(self):
+        # a copy counts its own searches, which the process that sent it adds to its stats (see SearchStats.merge)
+        return {**self.__dict__, '_cache': None, 'stats': SearchStats()}
+
+    def pick_safest_move(self, simulation: Simulation, user_option_filter: OptionFilter = OptionFilter.NO_FILTER,
+                         option_priority: Optional[Mapping[str, float]] = None) -> Optional[str]:
+        safest = self.pick_safest_option(simulation, user_option_filter, option_priority)
+        return safest[0] if safest is not None else None
+
+    def pick_safest_option(self, simulation: Simulation, user_option_filter: OptionFilter = OptionFilter.NO_FILTER,
+                           option_priority: Optional[Mapping[str, float]] = None) -> Optional[Tuple[str, float]]:
+        """The safest option along with its payoff against the opponent's best reply"""
         battles = simulation.prepare_battles(guess_mega_evo_opponent=False, join_moves_together=True)
         all_scores = dict()
         for i, battle in enumerate(battles):
             state = battle.create_state()
             mutator = StateMutator(state)
-            user_options, opponent_options = self._get_user_and_opponent_options(battle, user_option_filter)
-            scores = get_payoff_matrix(mutator, user_options, opponent_options, prune=True)
+            user_options, opponent_options = self._get_user_and_opponent_options(battle, user_option_filter, option_priority)
+            scores = self._search(mutator, user_options, opponent_options)
 
             prefixed_scores = self._prefix_opponent_move(scores, str(i))
             all_scores = {**all_scores, **prefixed_scores}
@@ -44,13 +120,66 @@ class Simulator:
             return None
 
         decision, payoff = pick_safest(all_scores, remove_guaranteed=True)
-        choice = decision[0]
-        return choice
+        return decision[0], payoff
 
-    @staticmethod
-    def _get_user_and_opponent_options(battle: Simulation, user_option_filter: OptionFilter):
+    def speculate(self, simulation: Simulation, option: str, replies: int = 2, outcomes: int = 2,
+                  user_option_filters: Sequence[OptionFilter] = (OptionFilter.MOVES, OptionFilter.SWITCHES)) -> Dict[Hashable, PayoffMatrix]:
+        """
+        Searches the positions most likely to follow choosing option: its most likely outcomes against the opponent's
+        best replies to it. Returns the payoff matrices by SearchCache key, so they can be added to the cache of another
+        process. Positions are searched with the options the next position offers, filtered like mental simulation
+        filters them.
+        """
+        entries: Dict[Hashable, PayoffMatrix] = {}
+        for battle in simulation.prepare_battles(guess_mega_evo_opponent=False, join_moves_together=True):
+            mutator = StateMutator(battle.create_state())
+            user_options, opponent_options = battle.get_all_options()
+            if option not in user_options:
+                continue
+
+            scores = get_payoff_matrix(mutator, [option], opponent_options, prune=False)
+            # the opponent's best replies are the ones worst for us
+            likely_replies = sorted(opponent_options, key=lambda reply: scores.get((option, reply), float('inf')))[:replies]
+            for reply in likely_replies:
+                transitions = get_all_state_instructions(mutator, option, reply)
+                for transition in sorted(transitions, key=lambda t: t.percentage, reverse=True)[:outcomes]:
+                    mutator.apply(transition.instructions)
+                    self._search_next_position(mutator, user_option_filters, entries)
+                    mutator.reverse(transition.instructions)
+        return entries
+
+    def _search_next_position(self, mutator: StateMutator, user_option_filters: Sequence[OptionFilter], entries: Dict[Hashable, PayoffMatrix]):
+        next_user_options, next_opponent_options = mutator.state.get_all_options()
+        for user_option_filter in user_option_filters:
+            user_options, opponent_options = self._order_options(next_user_options, next_opponent_options, user_option_filter)
+            key = SearchCache.key(mutator.state, user_options, opponent_options)
+            if len(user_options) > 0 and key not in entries:
+                entries[key] = get_payoff_matrix(mutator, user_options, opponent_options, prune=True)
+
+    def _search(self, mutator: StateMutator, user_options: List[str], opponent_options: List[str]) -> PayoffMatrix:
+        key = SearchCache.key(mutator.state, user_options, opponent_options) if self._cache is not None else None
+        scores = self._cache.get(key) if self._cache is not None else None
+        if scores is None:
+            scores = get_payoff_matrix(mutator, user_options, opponent_options, prune=True)
+            self.stats.record(scores, user_options, opponent_options)
+            if self._cache is not None:
+                self._cache.put(key, scores)
+        return scores
+
+    def _get_user_and_opponent_options(self, battle: Simulation, user_option_filter: OptionFilter,
+                                       option_priority: Optional[Mapping[str, float]] = None):
         user_options, opponent_options = battle.get_all_options()
+        return self._order_options(user_options, opponent_options, user_option_filter, option_priority)
+
+    def _order_options(self, user_options: List[str], opponent_options: List[str], user_option_filter: OptionFilter,
+                       option_priority: Optional[Mapping[str, float]] = None):
         user_options = [option for option in user_options if user_option_filter(option)]
+        if self._should_order_options:
+            option_priority = option_priority if option_priority is not None else {}
+            user_options = sorted(user_options, key=lambda option: (option_priority.get(option, 0.), _estimate_power(option)), reverse=True)
+            opponent_options = sorted(opponent_options, key=_estimate_power, reverse=True)
+        if self._opponent_top_k is not None:
+            opponent_options = opponent_options[:self._opponent_top_k]
 
         return user_options, opponent_options
 
@@ -73,11 +202,16 @@ class BattleStimulusAdapter(Simulation):
         raise NotImplementedError('Adapter is intended to be controlled externally')
 
     @classmethod
-    def from_stimulus(cls, stimulus: Mapping[BattleConcept, nd.NumDict]) -> 'BattleStimulusAdapter':
+    def from_stimulus(cls, stimulus: Mapping[BattleConcept, nd.NumDict],
+                      opponent_knowledge: Optional[Mapping[str, SpeciesKnowledge]] = None) -> 'BattleStimulusAdapter':
+        """
+        :param opponent_knowledge: What has been revealed about the opponent's Pokemon over the battle, by species. The
+            attributes of the opponent's Pokemon are only inferred where nothing has been revealed.
+        """
         battle_metadata_stim: GroupedChunkInstance = get_chunk_from_numdict('metadata', stimulus[BattleConcept.BATTLE])
         simulation = BattleSimulationAdapter(battle_metadata_stim.get_feature_value('battle_tag'))
         simulation.user = cls._convert_player(stimulus)
-        simulation.opponent = cls._convert_opponent(stimulus)
+        simulation.opponent = cls._convert_opponent(stimulus, opponent_knowledge if opponent_knowledge is not None else {})
 
         weather_stim = stimulus[BattleConcept.WEATHER]
         simulation.weather = get_only_value_from_numdict(weather_stim).cid if not is_empty(weather_stim) else None
@@ -103,22 +237,22 @@ class BattleStimulusAdapter(Simulation):
         user.active = cls._convert_player_active_pokemon(stimulus) if not is_empty(stimulus[BattleConcept.ACTIVE_POKEMON]) else None
         user.reserve = cls._convert_player_benched_pokemon(stimulus)
         user.trapped = cls._check_trapped(stimulus, BattleConcept.ACTIVE_POKEMON) if user.active is not None else False
-        user.side_conditions = defaultdict(lambda: 0, {condition_chunk.cid: condition_chunk.features[0].val for condition_chunk in stimulus[BattleConcept.SIDE_CONDITIONS].keys()})
+        user.side_conditions = defaultdict(int, {condition_chunk.cid: condition_chunk.features[0].val for condition_chunk in stimulus[BattleConcept.SIDE_CONDITIONS].keys()})
 
         return user
 
     @classmethod
-    def _convert_opponent(cls, stimulus: Mapping[BattleConcept, nd.NumDict]) -> Battler:
+    def _convert_opponent(cls, stimulus: Mapping[BattleConcept, nd.NumDict], knowledge: Mapping[str, SpeciesKnowledge]) -> Battler:
         player_stim: GroupedChunkInstance = get_chunk_from_numdict('opponent', stimulus[BattleConcept.PLAYERS])
         user = Battler()
         user.name = player_stim.get_feature_value('name')
         user.account_name = user.name
 
         pokemon_stim: GroupedChunkInstance = get_only_value_from_numdict(stimulus[BattleConcept.OPPONENT_ACTIVE_POKEMON]) if not is_empty(stimulus[BattleConcept.OPPONENT_ACTIVE_POKEMON]) else None
-        user.active = cls._convert_opponent_pokemon(pokemon_stim) if pokemon_stim is not None else None
-        user.reserve = cls._convert_opponent_benched_pokemon(stimulus)
+        user.active = cls._convert_opponent_pokemon(pokemon_stim, knowledge.get(pokemon_stim.cid)) if pokemon_stim is not None else None
+        user.reserve = cls._convert_opponent_benched_pokemon(stimulus, knowledge)
         user.trapped = cls._check_trapped(stimulus, BattleConcept.OPPONENT_ACTIVE_POKEMON) if user.active is not None else False
-        user.side_conditions = defaultdict(lambda: 0, {condition_chunk.cid: condition_chunk.features[0].val for condition_chunk in stimulus[BattleConcept.OPPONENT_SIDE_CONDITIONS].keys()})
+        user.side_conditions = defaultdict(int, {condition_chunk.cid: condition_chunk.features[0].val for condition_chunk in stimulus[BattleConcept.OPPONENT_SIDE_CONDITIONS].keys()})
 
         return user
 
@@ -196,7 +330,7 @@ class BattleStimulusAdapter(Simulation):
         return simulated
 
     @staticmethod
-    def _convert_opponent_pokemon(pokemon_stim: GroupedChunkInstance) -> PokemonSimulation:
+    def _convert_opponent_pokemon(pokemon_stim: GroupedChunkInstance, knowledge: Optional[SpeciesKnowledge] = None) -> PokemonSimulation:
         simulated = PokemonSimulation(pokemon_stim.cid, pokemon_stim.get_feature_value('level'))
         simulated.fainted = pokemon_stim.get_feature_value('fainted')
         simulated.status = pokemon_stim.get_feature_value('status')
@@ -204,16 +338,21 @@ class BattleStimulusAdapter(Simulation):
         simulated.hp = (pokemon_stim.get_feature_value('hp_percentage') / 100.0) * simulated.max_hp
 
         simulated.ability = pokemon_stim.get_feature_value('ability')
+        if simulated.ability is None and knowledge is not None:
+            simulated.ability = knowledge.ability
         if simulated.ability is None:
             simulated.set_most_likely_ability_unless_revealed()
 
         simulated.item = pokemon_stim.get_feature_value('item')
+        if not is_revealed(simulated.item) and knowledge is not None and knowledge.is_item_known:
+            simulated.item = knowledge.item
         if simulated.item is None:
             simulated.set_most_likely_item_unless_revealed()
 
         for move_feature in pokemon_stim.get_feature('move'):
-            simulated.add_move(move_feature.tag)
-        if len(simulated.moves) < 4:
+            simulated.add_move(move_feature.val)
+        # moves out of PP aren't perceived, but were revealed all the same
+        if len(simulated.moves) < 4 and (knowledge is None or knowledge.unknown_moves > 0):
             simulated.set_likely_moves_unless_revealed()
 
         simulated.volatile_statuses = [status_feature.val for status_feature in pokemon_stim.get_feature('volatile_status')]
@@ -234,13 +373,13 @@ class BattleStimulusAdapter(Simulation):
         return simulated
 
     @classmethod
-    def _convert_opponent_benched_pokemon(cls, stimulus: Mapping[BattleConcept, nd.NumDict]) -> List[PokemonSimulation]:
+    def _convert_opponent_benched_pokemon(cls, stimulus: Mapping[BattleConcept, nd.NumDict], knowledge: Mapping[str, SpeciesKnowledge]) -> List[PokemonSimulation]:
         benched_pokemon = []
         team_stim = stimulus[BattleConcept.OPPONENT_TEAM]
         for pokemon_chunk in team_stim.keys():
             if pokemon_chunk.get_feature_value('active'):
                 continue
-            simulated_pokemon = cls._convert_opponent_pokemon(pokemon_chunk)
+            simulated_pokemon = cls._convert_opponent_pokemon(pokemon_chunk, knowledge.get(pokemon_chunk.cid))
             benched_pokemon.append(simulated_pokemon)
 
         return benched_pokemon
@@ -283,7 +422,7 @@ class BattleSimulationAdapter(Simulation):
         user.active = cls._convert_player_pokemon(battle.active_pokemon, battle) if battle.active_pokemon is not None else None
         user.reserve = [cls._convert_player_pokemon(pokemon, battle) for pokemon in battle.available_switches]
         user.trapped = Effect.TRAPPED in battle.active_pokemon.effects if battle.active_pokemon is not None else False
-        user.side_conditions = defaultdict(lambda: 0, {normalize_name(condition.name).replace("_", ""): value for condition, value in battle.side_conditions.items()})
+        user.side_conditions = defaultdict(int, {normalize_name(condition.name).replace("_", ""): value for condition, value in battle.side_conditions.items()})
 
         return user
 
@@ -295,7 +434,7 @@ class BattleSimulationAdapter(Simulation):
         user.active = cls._convert_opponent_pokemon(battle.opponent_active_pokemon) if battle.opponent_active_pokemon is not None else None
         user.reserve = [cls._convert_opponent_pokemon(pokemon) for pokemon in battle.opponent_team.values() if not pokemon.active]
         user.trapped = Effect.TRAPPED in battle.opponent_active_pokemon.effects if battle.opponent_active_pokemon is not None else False
-        user.side_conditions = defaultdict(lambda: 0, {normalize_name(condition.name).replace("_", ""): value for condition, value in battle.opponent_side_conditions.items()})
+        user.side_conditions = defaultdict(int, {normalize_name(condition.name).replace("_", ""): value for condition, value in battle.opponent_side_conditions.items()})
 
         return user
 
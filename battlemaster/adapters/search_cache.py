@@ -0,0 +1,83 @@
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional, Dict, Tuple, Any, Iterable, Mapping
+
+# (bot option, opponent option) -> payoff
+PayoffMatrix = Dict[Tuple[str, str], float]
+
+# HP is keyed to the nearest tenth: the opponent's is only perceived as a percentage, and the damage the engine
+# expects rarely matches the roll of the real turn
+_HP_BUCKETS = 10
+_BOOSTS = ('attack_boost', 'defense_boost', 'special_attack_boost', 'special_defense_boost', 'speed_boost',
+           'accuracy_boost', 'evasion_boost')
+
+
+def position_key(state: Any) -> Hashable:
+    """
+    The position of a poke-engine state, as far as it can be perceived. A position the engine reaches from this turn
+    (e.g., speculatively) and the root rebuilt from the perception of the next turn differ in what isn't perceived: the
+    exact HP left and the wish and future sight pending, which the perception doesn't carry. Those are left out, with HP
+    bucketed, so both have the same key.
+    """
+    return (_side_key(state.user), _side_key(state.opponent), state.weather, state.field, state.trick_room)
+
+
+def _side_key(side: Any) -> Hashable:
+    active = _pokemon_key(side.active) if side.active is not None else None
+    reserve = tuple(sorted(_pokemon_key(pokemon) for pokemon in side.reserve.values()))
+    side_conditions = tuple(sorted((condition, count) for condition, count in side.side_conditions.items() if count > 0))
+    return active, reserve, side_conditions
+
+
+def _pokemon_key(pokemon: Any) -> Hashable:
+    hp = round(pokemon.hp / pokemon.maxhp * _HP_BUCKETS) if pokemon.maxhp > 0 else 0
+    # a fainted Pokemon stays fainted however little HP rounds to
+    hp = max(hp, 1) if pokemon.hp > 0 else 0
+    return (pokemon.id, hp, pokemon.status, pokemon.item, pokemon.ability, pokemon.terastallized,
+            tuple(sorted(pokemon.types)), tuple(getattr(pokemon, boost) for boost in _BOOSTS),
+            tuple(sorted(pokemon.volatile_status)), tuple(sorted(move['id'] for move in pokemon.moves)))
+
+
+class SearchCache:
+    """
+    A bounded LRU cache of the payoff matrices of searched positions, keyed by the position (see position_key) and the
+    options searched from it. Entries can be added from other threads (e.g., by speculative searches).
+    """
+
+    def __init__(self, max_size: int = 4096):
+        if max_size < 1:
+            raise ValueError(f'The search cache needs room for at least one entry, but got {max_size}')
+        self._max_size = max_size
+        self._entries: 'OrderedDict[Hashable, PayoffMatrix]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def key(state: Any, user_options: Iterable[str], opponent_options: Iterable[str]) -> Hashable:
+        # the order options are searched in only changes what is pruned, not the safest option
+        return position_key(state), tuple(sorted(user_options)), tuple(sorted(opponent_options))
+
+    def get(self, key: Hashable) -> Optional[PayoffMatrix]:
+        with self._lock:
+            scores = self._entries.get(key)
+            if scores is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return scores
+
+    def put(self, key: Hashable, scores: PayoffMatrix):
+        self.update({key: scores})
+
+    def update(self, entries: Mapping[Hashable, PayoffMatrix]):
+        with self._lock:
+            for key, scores in entries.items():
+                self._entries[key] = scores
+                self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
@@ -1,43 +1,169 @@
-from poke_env.player import Player, BattleOrder
-from poke_env.environment import Battle, Move
+import logging
+from time import perf_counter
+from typing import Optional, Tuple, List, Dict, Any
+
+import numpy as np
+from poke_env.player import Player, BattleOrder, DefaultBattleOrder
+from poke_env.environment import AbstractBattle, Battle
 from poke_engine.select_best_move import get_payoff_matrix, pick_safest
 from poke_engine import Battle as BattleSimulation, StateMutator
 from poke_engine.constants import SWITCH_STRING as SWITCH_ACTION
 
 from battlemaster.adapters.clarion_adapter import MindAdapter
 from battlemaster.adapters.poke_engine_adapter import BattleSimulationAdapter
+from battlemaster.damage import DamageScorer
+from battlemaster.tracing import DecisionTracer
+from battlemaster.load import LoadMonitor
+from battlemaster.speculation import Speculator
+from battlemaster.opening_book import OpeningBook
+
+
+class FinishedBattle:
+    """
+    What remains of a battle once it is over: enough for the win/loss tallies, without the whole battle state. Showdown
+    can still send a few messages to the room after the battle ended, which are ignored. Their handling still sets the
+    flags poke-env keeps on a battle (e.g., trapped on a late error), which are kept for that.
+    """
+    __slots__ = ('battle_tag', 'opponent_username', 'won', 'lost', 'finished', 'move_on_next_request', 'teampreview',
+                 'trapped')
+
+    def __init__(self, battle: AbstractBattle):
+        self.battle_tag = battle.battle_tag
+        self.opponent_username = battle.opponent_username
+        self.won = battle.won
+        self.lost = battle.lost
+        self.finished = battle.finished
+        self.move_on_next_request = False
+        self.teampreview = False
+        self.trapped = False
+
+    def parse_message(self, split_message: List[str]):
+        pass
+
+    def parse_request(self, request: Dict[str, Any]):
+        pass
 
 
 class BattleMasterPlayer(Player):
 
-    def __init__(self, mind: MindAdapter, *args, **kwargs):
+    def __init__(self, mind: MindAdapter, *args, tracer: Optional[DecisionTracer] = None,
+                 load_monitor: Optional[LoadMonitor] = None, speculator: Optional[Speculator] = None,
+                 opening_book: Optional[OpeningBook] = None, evict_finished_battles: bool = True, **kwargs):
         super().__init__(*args, **kwargs)
         self._mind = mind
+        self._tracer = tracer
+        self._load_monitor = load_monitor
+        self._speculator = speculator
+        self._opening_book = opening_book
+        self._evict_finished_battles = evict_finished_battles
+
+    async def _handle_battle_message(self, split_messages: List[List[str]]):
+        if self._load_monitor is not None:
+            battle_tag = split_messages[0][0][1:]
+            for split_message in split_messages[1:]:
+                if len(split_message) > 2 and split_message[1] == 'inactive':
+                    self._load_monitor.record_time_left(battle_tag, split_message[2])
+        await super()._handle_battle_message(split_messages)
+
+    async def _handle_battle_request(self, battle: AbstractBattle, from_teampreview_request: bool = False,
+                                     maybe_default_order: bool = False):
+        # a late error or request of a finished battle has nothing left to decide
+        if isinstance(battle, FinishedBattle):
+            return
+        await super()._handle_battle_request(battle, from_teampreview_request, maybe_default_order)
+
+    def _battle_finished_callback(self, battle: AbstractBattle):
+        self._mind.forget(battle.battle_tag)
+        if self._load_monitor is not None:
+            self._load_monitor.forget_battle(battle.battle_tag)
+        if self._speculator is not None:
+            self._speculator.cancel(battle.battle_tag)
+        if self._evict_finished_battles:
+            self._battles[battle.battle_tag] = FinishedBattle(battle)
 
     def choose_move(self, battle: Battle) -> BattleOrder:
+        if self._tracer is not None:
+            self._tracer.start(battle.battle_tag, battle.turn)
+
+        order, is_fallback = self._decide(battle)
+
+        if self._tracer is not None:
+            self._tracer.finish(order.message, is_fallback)
+        return order
+
+    def _decide(self, battle: Battle) -> Tuple[BattleOrder, bool]:
+        if self._speculator is not None:
+            self._speculator.cancel(battle.battle_tag)
+        trivial_order = self._decide_trivially(battle)
+        if trivial_order is not None:
+            self._mind.observe(battle)
+            self.logger.debug("There's nothing to think about. I'm choosing %s | %s", trivial_order.message, battle.battle_tag)
+            if self._tracer is not None and self._tracer.current is not None:
+                self._tracer.current.fast_path = True
+            return trivial_order, False
+
+        book_order = self._open_from_book(battle)
+        if book_order is not None:
+            self._mind.observe(battle)
+            self.logger.info("I'm opening with %s from the book | %s", book_order.message, battle.battle_tag)
+            if self._tracer is not None and self._tracer.current is not None:
+                self._tracer.current.book = True
+            return book_order, False
+
+        start_time = perf_counter()
         perception = self._mind.perceive(battle)
         chosen_move = self._mind.choose_action()
+        if self._load_monitor is not None:
+            self._load_monitor.record_latency(perf_counter() - start_time)
 
-        self.logger.debug(f'I see {perception}')
+        self.logger.debug('I see %s', perception)
 
         if chosen_move is not None:
-            self.logger.info(f"I'm choosing {chosen_move} | {battle.battle_tag}")
-            return self._select_move(battle, chosen_move)
-
-        self.logger.info(f"I couldn't decide on an action. I'm picking a random action | {battle.battle_tag}")
-        return self.choose_random_move(battle)
-
-    def _select_move(self, battle: Battle, order: str) -> BattleOrder:
+            self.logger.info("I'm choosing %s | %s", chosen_move, battle.battle_tag)
+            order, is_fallback = self._select_move(battle, chosen_move)
+            if self._speculator is not None and not is_fallback:
+                self._speculator.speculate(battle.battle_tag, perception, order, self._mind.opponent_knowledge(battle.battle_tag))
+            return order, is_fallback
+
+        self.logger.info("I couldn't decide on an action. I'm picking a random action | %s", battle.battle_tag)
+        return self.choose_random_move(battle), True
+
+    def _open_from_book(self, battle: Battle) -> Optional[BattleOrder]:
+        """The opening book's order for the first turn, unless its option isn't available (e.g., the lead has other moves)"""
+        if self._opening_book is None:
+            return None
+        option = self._opening_book.opening(battle, lambda option: self._is_available_move(battle, option) or self._is_available_switch(battle, option))
+        return self._select_move(battle, option)[0] if option is not None else None
+
+    def teampreview(self, battle: AbstractBattle) -> str:
+        team_order = self._opening_book.team_order(battle) if self._opening_book is not None else None
+        return team_order if team_order is not None else super().teampreview(battle)
+
+    def _decide_trivially(self, battle: Battle) -> Optional[BattleOrder]:
+        """
+        Answers turns that need no thought without consulting the mind: waiting on the opponent or having a single legal
+        option (e.g., one switch left on a force switch, a locked-in move or an Encore). Gimmicks (e.g., terastallizing)
+        don't count as options, since the agent never uses them. What the opponent revealed is still noted on these turns
+        (see MindAdapter.observe); the mind's other per-battle state (e.g., the sticky goal of a battle) simply carries
+        over a skipped turn.
+        """
+        if battle._wait:
+            return DefaultBattleOrder()
+
+        options = [*battle.available_moves, *battle.available_switches]
+        return self.create_order(options[0]) if len(options) == 1 else None
+
+    def _select_move(self, battle: Battle, order: str) -> Tuple[BattleOrder, bool]:
         if self._is_available_move(battle, order):
             move_to_choose = [move for move in battle.available_moves if move.id == order][0]
-            return self.create_order(move_to_choose)
+            return self.create_order(move_to_choose), False
 
         elif self._is_available_switch(battle, order):
             switch_to_choose = [pokemon for pokemon in battle.available_switches if pokemon.species == order or pokemon.base_species == order][0]
-            return self.create_order(switch_to_choose)
+            return self.create_order(switch_to_choose), False
 
-        self.logger.warning(f"Attempted to choose {order}, but it's not one of the available moves or switches. Choosing a random action instead. | {battle.battle_tag}")
-        return self.choose_random_move(battle)
+        self.logger.warning("Attempted to choose %s, but it's not one of the available moves or switches. Choosing a random action instead. | %s", order, battle.battle_tag)
+        return self.choose_random_move(battle), True
 
     def _is_available_move(self, battle: Battle, order: str) -> bool:
         move_names = [move.id for move in battle.available_moves]
@@ -49,24 +175,28 @@ class BattleMasterPlayer(Player):
 
 
 class MaxDamagePlayer(Player):
+    """
+    Picks the move with the highest score, as scored by a DamageScorer. With use_stats, moves are scored by the damage
+    formula instead of by base power, effectiveness and same-type attack bonus alone.
+    """
+    def __init__(self, *args, use_stats: bool = False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._scorer = DamageScorer(use_stats)
+
     def choose_move(self, battle: Battle):
         if battle.available_moves:
-            move_score_tuples = [(move, self._calculate_score(battle, move)) for move in battle.available_moves]
-            self.logger.info(f"My available moves (and scores) are {[(move.id, score) for move, score in move_score_tuples]}")
-            best_move, score = max(move_score_tuples, key=lambda move_score: move_score[1])
+            scores = self._scorer.score(battle, battle.available_moves)
+            if self.logger.isEnabledFor(logging.INFO):
+                self.logger.info("My available moves (and scores) are %s", [(move.id, score) for move, score in zip(battle.available_moves, scores)])
+            best = int(np.argmax(scores))
+            best_move, score = battle.available_moves[best], scores[best]
             if score > 0:
-                self.logger.info(f"My strongest damaging move is {best_move.id} with a score of {score}")
+                self.logger.info("My strongest damaging move is %s with a score of %s", best_move.id, score)
                 return self.create_order(best_move)
 
         self.logger.info("I have no moves that do damage. Choosing a random action.")
         return self.choose_random_move(battle)
 
-    @staticmethod
-    def _calculate_score(battle: Battle, move: Move) -> float:
-        target_pokemon = battle.opponent_active_pokemon
-        stab_bonus = 1.5 if move.type in battle.active_pokemon.types else 1
-        return move.base_power * target_pokemon.damage_multiplier(move) * stab_bonus
-
 
 class ExpectiminimaxPlayer(Player):
     def choose_move(self, battle: Battle):
@@ -87,7 +217,7 @@ class ExpectiminimaxPlayer(Player):
             state = b.create_state()
             mutator = StateMutator(state)
             user_options, opponent_options = b.get_all_options()
-            self.logger.info("Searching through the state: {}".format(mutator.state))
+            self.logger.info("Searching through the state: %s", mutator.state)
             scores = get_payoff_matrix(mutator, user_options, opponent_options, prune=True)
 
             prefixed_scores = self._prefix_opponent_move(scores, str(i))
@@ -95,7 +225,7 @@ class ExpectiminimaxPlayer(Player):
 
         decision, payoff = pick_safest(all_scores, remove_guaranteed=True)
         choice = decision[0]
-        self.logger.info("Safest: {}, {}".format(choice, payoff))
+        self.logger.info("Safest: %s, %s", choice, payoff)
         return choice
 
     def _select_switch(self, battle: Battle, pokemon_name: str) -> BattleOrder:
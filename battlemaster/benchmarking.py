@@ -0,0 +1,117 @@
+import asyncio
+from typing import Dict, Iterable, List
+
+from poke_env.player import Player
+from poke_env.concurrency import POKE_LOOP
+from poke_env.environment import AbstractBattle
+from poke_env.data import to_id_str
+
+
+class BenchmarkResult:
+    """Win/loss/tie tally of the agent under test against a single baseline agent"""
+
+    def __init__(self, baseline: str, wins: int = 0, losses: int = 0, ties: int = 0):
+        self.baseline = baseline
+        self.wins = wins
+        self.losses = losses
+        self.ties = ties
+
+    @property
+    def battles(self) -> int:
+        return self.wins + self.losses + self.ties
+
+    @property
+    def win_rate(self) -> float:
+        return self.wins / self.battles if self.battles > 0 else 0.
+
+    def record(self, battle: AbstractBattle):
+        if battle.won:
+            self.wins += 1
+        elif battle.lost:
+            self.losses += 1
+        elif battle.finished:
+            self.ties += 1
+
+    def merge(self, other: 'BenchmarkResult') -> 'BenchmarkResult':
+        if other.baseline != self.baseline:
+            raise ValueError(f'Cannot merge results against {other.baseline} into results against {self.baseline}')
+        return BenchmarkResult(self.baseline, self.wins + other.wins, self.losses + other.losses, self.ties + other.ties)
+
+    def __repr__(self):
+        return f'BenchmarkResult({self.baseline}: {self.wins}W/{self.losses}L/{self.ties}T)'
+
+
+async def play_baselines(agent: Player, baselines: Dict[str, Player], number_battles: int) -> List[BenchmarkResult]:
+    """
+    Plays number_battles against each baseline. When there are several baselines they challenge the agent (a Showdown
+    user can only have one outgoing challenge at a time) and all series run concurrently, capped by the agent's
+    max_concurrent_battles.
+    """
+    await asyncio.gather(*[start_listening(baseline) for baseline in baselines.values()])
+
+    if len(baselines) == 1:
+        await agent.battle_against(next(iter(baselines.values())), number_battles)
+    else:
+        await asyncio.gather(
+            agent.accept_challenges([baseline.username for baseline in baselines.values()], number_battles * len(baselines), None),
+            *[baseline.send_challenges(to_id_str(agent.username), number_battles, to_wait=agent.ps_client.logged_in)
+              for baseline in baselines.values()]
+        )
+
+    return collect_results(agent, baselines)
+
+
+async def start_listening(player: Player):
+    """Connects a player created with start_listening=False to Showdown and waits until it is logged in"""
+    player.ps_client._listening_coroutine = asyncio.run_coroutine_threadsafe(
+        player.ps_client.listen(), POKE_LOOP
+    )
+    await player.ps_client.wait_for_login()
+
+
+def collect_results(agent: Player, baselines: Dict[str, Player]) -> List[BenchmarkResult]:
+    """
+    Tallies the agent's finished battles per baseline. Baselines are keyed by their benchmark name (e.g., 'random') and
+    matched to battles by the baseline's username.
+    """
+    return tally_results(agent, {name: baseline.username for name, baseline in baselines.items()})
+
+
+def tally_results(agent: Player, usernames: Dict[str, str]) -> List[BenchmarkResult]:
+    """Tallies the agent's finished battles per baseline, given the username of each baseline by its benchmark name"""
+    results = {to_id_str(username): BenchmarkResult(name) for name, username in usernames.items()}
+    for battle in agent.battles.values():
+        result = results.get(to_id_str(battle.opponent_username or ''))
+        if result is not None:
+            result.record(battle)
+
+    return list(results.values())
+
+
+def merge_results(shard_results: Iterable[List[BenchmarkResult]]) -> List[BenchmarkResult]:
+    merged: Dict[str, BenchmarkResult] = {}
+    for results in shard_results:
+        for result in results:
+            merged[result.baseline] = merged[result.baseline].merge(result) if result.baseline in merged else result
+
+    return list(merged.values())
+
+
+def split_battles(number_battles: int, shards: int) -> List[int]:
+    """Splits the battles as evenly as possible. Shards that would play no battles are dropped."""
+    if shards < 1:
+        raise ValueError(f'At least one shard is required, but got {shards}')
+    quotient, remainder = divmod(number_battles, shards)
+    shard_sizes = [quotient + 1 if shard < remainder else quotient for shard in range(shards)]
+    return [size for size in shard_sizes if size > 0]
+
+
+def format_results_table(results: Iterable[BenchmarkResult]) -> str:
+    header = ('baseline', 'battles', 'won', 'lost', 'tied', 'win rate')
+    rows = [(result.baseline, str(result.battles), str(result.wins), str(result.losses), str(result.ties),
+             f'{result.win_rate:.1%}') for result in results]
+    widths = [max(len(row[column]) for row in [header, *rows]) for column in range(len(header))]
+
+    lines = [' | '.join(cell.ljust(width) for cell, width in zip(row, widths)) for row in [header, *rows]]
+    lines.insert(1, '-+-'.join('-' * width for width in widths))
+    return '\n'.join(lines)
@@ -1,5 +1,5 @@
 from types import MappingProxyType
-from typing import Hashable, List, Dict, Mapping, Any, Optional, Union
+from typing import Hashable, List, Dict, Mapping, Any, Optional, Union, Collection, Tuple, Callable, Iterator
 
 import pyClarion as cl
 from pyClarion import nd
@@ -7,13 +7,17 @@ from pyClarion.base.realizers import Pt
 
 
 class GroupedChunk(cl.chunk):
-    """A chunk symbol with extra metadata attaching it to a group"""
-    __slots__ = ('group',)
+    """
+    A chunk symbol with extra metadata attaching it to a group. Its hash (the hash of the plain chunk) is computed once,
+    since perceived chunks are hashed by every NumDict they pass through.
+    """
+    __slots__ = ('group', '_hash')
     group: str
 
     def __init__(self, cid: Hashable, group: str) -> None:
         self.group = group
         super().__init__(cid)
+        self._hash = super().__hash__()
 
     def __setattr__(self, key, value):
         object.__setattr__(self, key, value)
@@ -31,7 +35,11 @@ class GroupedChunk(cl.chunk):
         return result
 
     def __hash__(self):
-        return super().__hash__()
+        return self._hash
+
+    def __reduce__(self):
+        # the cached hash is only valid in the process that computed it
+        return GroupedChunk, (self.cid, self.group)
 
     @staticmethod
     def from_chunk(other: cl.chunk, group: str):
@@ -54,6 +62,9 @@ class GroupedChunkInstance(GroupedChunk):
         cls_name = type(self).__name__
         return "{}({}|{}){}".format(cls_name, self.cid, self.group, self.features)
 
+    def __reduce__(self):
+        return GroupedChunkInstance, (self.cid, self.group, self.features)
+
     @staticmethod
     def from_chunk(other: cl.chunk, group: str, features: List[cl.feature]):
         return GroupedChunkInstance(other.cid, group, features)
@@ -76,10 +87,103 @@ class GroupedChunkInstance(GroupedChunk):
         return False
 
 
+class SymbolTable:
+    """
+    Interns the symbols of perceptions. Most features and chunks perceived on a turn (e.g., boosts at 0, moves and
+    species) were already perceived on the turns before, so equal symbols are shared instead of being allocated and
+    hashed again every turn. Symbols are immutable, so sharing them is safe.
+
+    Some features are unique to a battle or a turn (e.g., the battle tag or the turn number), so each kind of symbol is
+    bounded by max_size: the table of that kind is cleared once it is full and refills with the symbols still in use.
+    """
+
+    def __init__(self, max_size: int = 50_000):
+        if max_size < 1:
+            raise ValueError(f'The symbol table needs room for at least one symbol, but got {max_size}')
+        self._max_size = max_size
+        self._features: Dict[Tuple[str, type, Any], cl.feature] = {}
+        self._chunks: Dict[Hashable, cl.chunk] = {}
+        self._grouped_chunks: Dict[Tuple[Hashable, str], GroupedChunk] = {}
+
+    def __len__(self):
+        return len(self._features) + len(self._chunks) + len(self._grouped_chunks)
+
+    def feature(self, tag: str, val: Any = None) -> cl.feature:
+        # True == 1 and hash(True) == hash(1), but they are different feature values
+        key = (tag, type(val), val)
+        try:
+            symbol = self._features.get(key)
+        except TypeError:
+            # unhashable values can't be interned
+            return cl.feature(tag, val)
+        if symbol is None:
+            symbol = cl.feature(tag, val)
+            self._add(self._features, key, symbol)
+        return symbol
+
+    def chunk(self, cid: Hashable) -> cl.chunk:
+        symbol = self._chunks.get(cid)
+        if symbol is None:
+            symbol = cl.chunk(cid)
+            self._add(self._chunks, cid, symbol)
+        return symbol
+
+    def grouped_chunk(self, cid: Hashable, group: str) -> GroupedChunk:
+        key = (cid, group)
+        symbol = self._grouped_chunks.get(key)
+        if symbol is None:
+            symbol = GroupedChunk(cid, group)
+            self._add(self._grouped_chunks, key, symbol)
+        return symbol
+
+    def _add(self, symbols: Dict, key: Hashable, symbol: cl.Symbol):
+        if len(symbols) >= self._max_size:
+            symbols.clear()
+        symbols[key] = symbol
+
+
 class GroupedStimulusInput:
-    def __init__(self, groups: List[str]):
+    """
+    A perception, by group. Groups only some consumers read can be deferred: a deferred group is built the first time
+    it is read (e.g., through a StimulusView) and kept for the rest of the step.
+
+    Chunks are added to one mutable backing store per group. Reading a group's stimulus copies it once; later reads
+    share that copy until the group changes.
+    """
+
+    def __init__(self, groups: List[str], symbols: Optional[SymbolTable] = None):
+        """
+        :param groups: The groups chunks can be added to.
+        :param symbols: Interns the grouped chunks added. Each chunk gets a new grouped chunk without it.
+        """
         self.groups = groups
+        self._symbols = symbols
         self._inputs = {group: nd.MutableNumDict(default=0.) for group in groups}
+        self._deferred: Dict[str, Callable[[], None]] = {}
+        self._deferred_keys: Dict[str, Hashable] = {}
+        self._frozen: Dict[Tuple[str, float], nd.NumDict] = {}
+
+    @property
+    def materialized_groups(self) -> List[str]:
+        return [group for group in self.groups if group not in self._deferred]
+
+    def defer_group(self, group: str, build: Callable[[], None], key: Optional[Hashable] = None):
+        """
+        Defers building a group until it is read. build adds the group's chunks to this perception. key identifies what
+        build adds (e.g., the state of the battle it is built from), so the group can be keyed without building it.
+        """
+        self._assert_group_registered(group)
+        self._deferred[group] = build
+        if key is not None:
+            self._deferred_keys[group] = key
+
+    def materialize(self, group: str):
+        build = self._deferred.pop(group, None)
+        if build is not None:
+            build()
+
+    def view(self, default=0.) -> 'StimulusView':
+        return StimulusView(self, default)
 
     def add_chunk_to_group(self, chunk: cl.chunk, group: str, weight: float = 1.):
         self._assert_group_registered(group)
@@ -95,18 +199,99 @@ class GroupedStimulusInput:
         self._assert_group_registered(group)
 
         chunk_instance = GroupedChunkInstance.from_chunk(chunk, group, features)
-        self._inputs[group][chunk_instance] = weight
+        self._set(group, chunk_instance, weight)
 
-    def to_stimulus(self, default=0.) -> Dict[str, nd.NumDict]:
-        return {group: nd.NumDict(d, default=default) for group, d in self._inputs.items()}
+    def to_stimulus(self, default=0., groups: Optional[Collection[str]] = None) -> Dict[str, nd.NumDict]:
+        """The stimulus of the given groups (every group by default). Deferred groups among them are built."""
+        groups = self.groups if groups is None else groups
+        return {group: self.group_stimulus(group, default) for group in groups}
+
+    def group_stimulus(self, group: str, default=0.) -> nd.NumDict:
+        self._assert_group_registered(group)
+        self.materialize(group)
+        stimulus = self._frozen.get((group, default))
+        if stimulus is None:
+            stimulus = self._frozen[(group, default)] = nd.NumDict(self._inputs[group], default=default)
+        return stimulus
+
+    def flatten(self, groups: Optional[Collection[str]] = None, default=0.) -> nd.NumDict:
+        """The stimulus of the given groups (every group by default) merged into one, copied straight from the groups"""
+        merged = {}
+        for group in (self.groups if groups is None else groups):
+            self._assert_group_registered(group)
+            self.materialize(group)
+            merged.update(self._inputs[group].items())
+        return nd.NumDict(merged, default=default)
+
+    def canonical_key(self, ignored_features: Collection[str] = (), ignored_groups: Collection[str] = ()) -> Hashable:
+        """
+        A hashable key that is equal for equal perceptions, regardless of the order chunks and features were added in.
+        Features whose tag is in ignored_features (e.g., the battle tag) and groups in ignored_groups are left out.
+        Deferred groups are keyed by the key they were deferred with, built or not, and only built without one.
+        """
+        return tuple((group, self._group_key(group, ignored_features)) for group in self.groups if group not in ignored_groups)
+
+    def _group_key(self, group: str, ignored_features: Collection[str]) -> Hashable:
+        key = self._deferred_keys.get(group)
+        if key is not None:
+            return key
+        self.materialize(group)
+        return frozenset(
+            (chunk.cid, frozenset(feature for feature in chunk.features if feature.tag not in ignored_features)
+             if isinstance(chunk, GroupedChunkInstance) else None, weight)
+            for chunk, weight in self._inputs[group].items()
+        )
 
     def _assert_group_registered(self, group: str):
         if group not in self.groups:
             raise ValueError(f'{group} is not in the list of supported groups: {self.groups}')
 
     def _add_chunk(self, chunk: cl.chunk, group: str, weight: float):
-        groupchunk = GroupedChunk.from_chunk(chunk, group)
-        self._inputs[group][groupchunk] = weight
+        if self._symbols is not None:
+            groupchunk = self._symbols.grouped_chunk(chunk.cid, group)
+        else:
+            groupchunk = GroupedChunk.from_chunk(chunk, group)
+        self._set(group, groupchunk, weight)
+
+    def _set(self, group: str, chunk: GroupedChunk, weight: float):
+        self._inputs[group][chunk] = weight
+        for key in [key for key in self._frozen if key[0] == group]:
+            del self._frozen[key]
+
+
+class StimulusView(Mapping[str, nd.NumDict]):
+    """A read-only mapping of a perception's groups to their stimulus. Deferred groups are built the first time they are read."""
+
+    def __init__(self, perception: GroupedStimulusInput, default=0.):
+        self._perception = perception
+        self._default = default
+
+    def __getitem__(self, group: str) -> nd.NumDict:
+        if group not in self._perception.groups:
+            raise KeyError(group)
+        return self._perception.group_stimulus(group, self._default)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._perception.groups)
+
+    def __len__(self) -> int:
+        return len(self._perception.groups)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class CurrentPerception:
+    """
+    Hands the perception of the current step to processes that read groups the stimulus buffer leaves out (i.e.,
+    deferred groups). It is updated by NamedStimuli.
+    """
+
+    def __init__(self):
+        self.view: Optional[StimulusView] = None
+
+    def update(self, perception: GroupedStimulusInput):
+        self.view = perception.view()
 
 
 class NamedStimuli(cl.Process):
@@ -117,25 +302,27 @@ class NamedStimuli(cl.Process):
     """
 
     _serves = cl.ConstructType.buffer
-    _stimuli: Dict[str, cl.Stimulus]
 
-    def __init__(self) -> None:
+    def __init__(self, current_perception: Optional[CurrentPerception] = None) -> None:
+        """
+        :param current_perception: Updated with every perception, so deferred groups can still be read. Deferred groups
+            are left out of the buffer.
+        """
         super().__init__()
+        self._current_perception = current_perception
+        self._stimulus = nd.NumDict(default=0.0)
 
     def input(self, named_stimuli: GroupedStimulusInput) -> None:
-        self._stimuli = {name: cl.Stimulus() for name in named_stimuli.groups}
-
-        for name, stimulus in named_stimuli.to_stimulus().items():
-            self._stimuli[name].input(stimulus)
+        if self._current_perception is not None:
+            self._current_perception.update(named_stimuli)
+            groups = named_stimuli.materialized_groups
+        else:
+            groups = named_stimuli.groups
+        # the groups are flattened once per perception rather than every time the buffer is read
+        self._stimulus = named_stimuli.flatten(groups)
 
     def call(self, inputs: Mapping[Any, nd.NumDict]) -> nd.NumDict:
-        result = nd.MutableNumDict(default=0.0)
-        for stimulus in self._stimuli.values():
-            stimulus_output = stimulus.call(nd.NumDict())
-            for symbol, weight in stimulus_output.items():
-                result[symbol] = weight
-
-        return result
+        return self._stimulus
 
 
 class AttentionFilter(cl.Wrapped[Pt]):
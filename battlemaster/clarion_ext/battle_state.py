@@ -0,0 +1,35 @@
+from abc import abstractmethod
+from typing import Iterator, Any, Type, TypeVar
+
+import pyClarion as cl
+
+T = TypeVar('T')
+
+
+class BattleScoped:
+    """
+    A process (or asset) that keeps state per battle. The mind serves every concurrent battle, so this state has to be
+    dropped once a battle is over or it grows for as long as the agent runs.
+    """
+    @abstractmethod
+    def forget_battle(self, battle_tag: str):
+        pass
+
+
+def find_battle_scoped(structure: cl.Structure) -> Iterator[BattleScoped]:
+    """Finds all processes in the structure (and its substructures) that keep per battle state, including wrapped bases"""
+    return find_processes(structure, BattleScoped)
+
+
+def find_processes(structure: cl.Structure, process_type: Type[T]) -> Iterator[T]:
+    """Finds all processes of the given type in the structure (and its substructures), including wrapped bases"""
+    for realizer in structure.values():
+        if isinstance(realizer, cl.Structure):
+            yield from find_processes(realizer, process_type)
+            continue
+
+        process: Any = realizer.process
+        while process is not None:
+            if isinstance(process, process_type):
+                yield process
+            process = getattr(process, 'base', None)
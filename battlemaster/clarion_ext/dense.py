@@ -0,0 +1,118 @@
+import logging
+from typing import Sequence, Mapping, Any, Optional, Hashable
+
+import numpy as np
+import pyClarion as cl
+from pyClarion import nd
+
+
+class DenseDomain:
+    """A fixed mapping of the symbols of a small domain (e.g., the drives) to indices, so activations can be vectors"""
+
+    def __init__(self, symbols: Sequence[Hashable]):
+        self.symbols = tuple(symbols)
+        self._indices = {symbol: i for i, symbol in enumerate(self.symbols)}
+        if len(self._indices) != len(self.symbols):
+            raise ValueError('The symbols of a dense domain must be unique')
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol: Hashable) -> bool:
+        return symbol in self._indices
+
+    def covers(self, d: nd.NumDict) -> bool:
+        return all(symbol in self._indices for symbol in d.keys())
+
+    def to_vector(self, d: nd.NumDict) -> np.ndarray:
+        vector = np.full(len(self.symbols), d.default, dtype=float)
+        for symbol, value in d.items():
+            vector[self._indices[symbol]] = value
+        return vector
+
+    def stack(self, ds: Sequence[nd.NumDict]) -> np.ndarray:
+        """Stacks activations (e.g., of several battles) into a matrix with a row per activation"""
+        return np.stack([self.to_vector(d) for d in ds]) if len(ds) > 0 else np.empty((0, len(self.symbols)))
+
+    def to_numdict(self, vector: np.ndarray, default: float = 0., keep: Optional[np.ndarray] = None) -> nd.NumDict:
+        """
+        The activations of the vector as a NumDict. Symbols at the default activation are left out unless keep (a mask
+        over the domain) is set for them.
+        """
+        keep = keep if keep is not None else np.zeros(len(self.symbols), dtype=bool)
+        return nd.NumDict({symbol: float(value) for symbol, value, kept in zip(self.symbols, vector, keep)
+                           if kept or value != default}, default=default)
+
+
+class DenseBottomUp(cl.Wrapped[cl.BottomUp]):
+    """
+    Computes the bottom-up activations of a base BottomUp over a small feature domain (e.g., drives to goals) as a
+    matrix product instead of walking the chunk definitions symbol by symbol.
+
+    The matrix is calibrated from the base itself on the first call, by probing it with the zero vector and with every
+    feature of the domain on its own, so the activations stay those of pyClarion's BottomUp. A last probe checks that
+    the base is linear in its input (the case when every dimension of the chunks holds a single feature, like drives); if
+    it isn't, the base keeps running as is. Inputs with features outside the domain are also left to the base.
+    """
+    _serves = cl.ConstructType.flow_bt
+
+    def __init__(self, base: cl.BottomUp, source: cl.Symbol, domain: DenseDomain, tolerance: float = 1e-9):
+        super().__init__(base=base)
+        self._source = source
+        self._domain = domain
+        self._tolerance = tolerance
+        self._calibrated = False
+        self._is_linear = True
+        self._chunks: Optional[DenseDomain] = None
+        self._weights = np.empty((0, len(domain)))
+        self._bias = np.empty(0)
+        self._default = 0.
+        self._always_present = np.empty(0, dtype=bool)
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+    @property
+    def chunks(self) -> Optional[DenseDomain]:
+        """The chunks activated, once calibrated"""
+        return self._chunks
+
+    def call(self, inputs: Mapping[Any, nd.NumDict]) -> nd.NumDict:
+        source = cl.expand_address(self.client, self._source)
+        strengths = inputs[source]
+        if not self._is_linear or not self._domain.covers(strengths):
+            return self.base.call(inputs)
+        if not self._calibrated:
+            self._calibrate(inputs, source)
+            if not self._is_linear:
+                return self.base.call(inputs)
+
+        activations = self._weights @ self._domain.to_vector(strengths) + self._bias
+        return self._chunks.to_numdict(activations, self._default, self._always_present)
+
+    def activate_batch(self, strengths: np.ndarray) -> np.ndarray:
+        """Activations of a batch of feature strengths (a row per battle, in the order of the domain), once calibrated"""
+        if not self._calibrated or not self._is_linear:
+            raise ValueError('Batches can only be activated once the layer is calibrated and linear')
+        return strengths @ self._weights.T + self._bias
+
+    def _calibrate(self, inputs: Mapping[Any, nd.NumDict], source: Any):
+        def probe(vector: np.ndarray) -> nd.NumDict:
+            probed_inputs = dict(inputs)
+            probed_inputs[source] = self._domain.to_numdict(vector)
+            return self.base.call(probed_inputs)
+
+        zero = probe(np.zeros(len(self._domain)))
+        unit_outputs = [probe(unit) for unit in np.eye(len(self._domain))]
+        self._chunks = DenseDomain(list(dict.fromkeys(symbol for output in [zero, *unit_outputs] for symbol in output.keys())))
+        self._default = zero.default
+        self._always_present = np.array([symbol in zero for symbol in self._chunks.symbols], dtype=bool)
+        self._bias = self._chunks.to_vector(zero)
+        self._weights = np.column_stack([self._chunks.to_vector(output) - self._bias for output in unit_outputs]) \
+            if len(unit_outputs) > 0 else np.empty((len(self._chunks), 0))
+        self._calibrated = True
+
+        check = np.linspace(0.1, 0.9, len(self._domain))
+        checked = probe(check)
+        self._is_linear = self._chunks.covers(checked) and \
+            np.allclose(self._chunks.to_vector(checked), self._weights @ check + self._bias, atol=self._tolerance)
+        if not self._is_linear:
+            self._logger.warning('The bottom-up activations are not linear in their features. Falling back to BottomUp')
@@ -1,10 +1,15 @@
-from typing import Mapping, Any
+from typing import Mapping, Any, Optional
 from enum import Enum
 import logging
+import typing
 
 import pyClarion as cl
 from pyClarion import nd
 
+from ..load import LoadMonitor
+from .attention import GroupedChunkInstance
+from .numdicts_ext import get_chunk_from_numdict
+
 
 class Effort(str, Enum):
     TRY_HARD = 'try_hard', 0
@@ -33,17 +38,35 @@ EFFORT_INTERFACE = cl.ParamSet.Interface(
 
 
 class DecideEffort(cl.Process):
+    """
+    Tries hard when losing. With a load monitor, a battle that wants to try hard is downgraded to autopilot while the
+    agent is under too much load to afford it.
+    """
     _serves = cl.ConstructType.features
 
-    def __init__(self, team_source: cl.Symbol, opponent_team_source: cl.Symbol):
-        super().__init__(expected=[team_source, opponent_team_source])
+    def __init__(self, team_source: cl.Symbol, opponent_team_source: cl.Symbol,
+                 battle_metadata_source: Optional[cl.Symbol] = None, load_monitor: Optional[LoadMonitor] = None):
+        if load_monitor is not None and battle_metadata_source is None:
+            raise ValueError('Shedding load requires the battle metadata source')
+        expected = [team_source, opponent_team_source]
+        if battle_metadata_source is not None:
+            expected.append(battle_metadata_source)
+        super().__init__(expected=expected)
         self._team_source = team_source
         self._opponent_team_source = opponent_team_source
+        self._battle_metadata_source = battle_metadata_source
+        self._load_monitor = load_monitor
+        self._logger = logging.getLogger(self.__class__.__name__)
 
     def call(self, inputs: Mapping[Any, nd.NumDict]) -> nd.NumDict:
         effort_to_activate = Effort.TRY_HARD.value if self._self_is_losing(inputs) else Effort.AUTOPILOT.value
+        if effort_to_activate == Effort.TRY_HARD.value and self._load_monitor is not None:
+            reason = self._load_monitor.shed_effort(self._get_battle_tag(inputs))
+            if reason is not None:
+                self._logger.debug("I'd try hard, but I'm under too much load (%s)", reason)
+                effort_to_activate = Effort.AUTOPILOT.value
         effort_to_activate_feature = cl.feature((EFFORT_INTERFACE.name, effort_to_activate))
-        self._logger.debug(f"I'm going to {effort_to_activate}")
+        self._logger.debug("I'm going to %s", effort_to_activate)
         return nd.NumDict({effort_to_activate_feature: 1.}, default=0.)
 
     def _self_is_losing(self, inputs: Mapping[Any, nd.NumDict]) -> bool:
@@ -53,10 +76,15 @@ class DecideEffort(cl.Process):
         usable_pokemon_count = self._count_fainted(team, False)
         opponent_usable_pokemon_count = 6 - self._count_fainted(opponent_team, True)
 
-        self._logger.debug(f"I have {usable_pokemon_count} usable Pokemon and my opponent has {opponent_usable_pokemon_count}")
+        self._logger.debug("I have %s usable Pokemon and my opponent has %s", usable_pokemon_count, opponent_usable_pokemon_count)
 
         return usable_pokemon_count < opponent_usable_pokemon_count
 
+    def _get_battle_tag(self, inputs: Mapping[Any, nd.NumDict]) -> str:
+        battle_perception: nd.NumDict = inputs[cl.expand_address(self.client, self._battle_metadata_source)]
+        battle_metadata = typing.cast(GroupedChunkInstance, get_chunk_from_numdict('metadata', battle_perception))
+        return battle_metadata.get_feature_value('tag')
+
     @staticmethod
     def _count_fainted(team: nd.NumDict, is_fainted: bool) -> int:
         count = 0
@@ -66,7 +94,3 @@ class DecideEffort(cl.Process):
                 count += 1
 
         return count
-
-    @property
-    def _logger(self):
-        return logging.getLogger(self.__class__.__name__)
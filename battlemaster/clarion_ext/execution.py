@@ -0,0 +1,40 @@
+from enum import Enum
+import typing
+from typing import Optional
+
+from pyClarion import nd
+
+from ..adapters.clarion_adapter import BattleConcept
+from .attention import GroupedChunkInstance
+from .numdicts_ext import filter_chunks_by_group, get_chunk_from_numdict
+
+
+class ExecutionProfile(str, Enum):
+    """
+    The kind of turn the mind is deciding. Each kind only needs part of the mind (e.g., nothing about moves matters on a
+    force switch), so processes can be gated to the profiles they can affect the outcome of. Team preview isn't one of
+    them, since it is answered by the player without the mind.
+    """
+    NORMAL = 'normal'
+    FORCE_SWITCH = 'force_switch'
+
+    def __str__(self) -> str:
+        return self.value
+
+
+def get_execution_profile(stimulus: nd.NumDict) -> ExecutionProfile:
+    """Reads the profile of the turn from the battle metadata in the stimulus. Defaults to NORMAL if there is none."""
+    battle_metadata = typing.cast(GroupedChunkInstance, get_chunk_from_numdict('metadata', filter_chunks_by_group(BattleConcept.BATTLE, stimulus)))
+    if battle_metadata is None:
+        return ExecutionProfile.NORMAL
+    if battle_metadata.get_feature_value('force_switch'):
+        return ExecutionProfile.FORCE_SWITCH
+    return ExecutionProfile.NORMAL
+
+
+def get_battle_tag(stimulus: nd.NumDict) -> Optional[str]:
+    """Reads the tag of the battle from the battle metadata in the stimulus. None if there is none."""
+    battle_metadata = typing.cast(GroupedChunkInstance, get_chunk_from_numdict('metadata', filter_chunks_by_group(BattleConcept.BATTLE, stimulus)))
+    if battle_metadata is None:
+        return None
+    return battle_metadata.get_feature_value('tag')
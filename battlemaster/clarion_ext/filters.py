@@ -1,10 +1,11 @@
-from typing import Mapping, Any, Union, List
+from typing import Mapping, Any, Union, List, Collection
 
 import pyClarion as cl
 from pyClarion import nd
 from pyClarion.base.realizers import Pt
 
 from battlemaster.clarion_ext.numdicts_ext import is_empty
+from battlemaster.clarion_ext.execution import ExecutionProfile, get_execution_profile
 
 
 class ReasoningPath(cl.Wrapped[Pt]):
@@ -53,6 +54,29 @@ class ReasoningPath(cl.Wrapped[Pt]):
         return False
 
 
+class ProfileGate(cl.Wrapped[Pt]):
+    """
+    Severs a propagator on turns whose execution profile it can't affect the outcome of (e.g., move reasoning on a force
+    switch). Like ReasoningPath, the base isn't called at all on those turns and the output is empty.
+    """
+
+    def __init__(self, base: Pt, stimulus_source: cl.Symbol, profiles: Collection[ExecutionProfile]) -> None:
+        """
+        :param base: The base Process instance.
+        :param stimulus_source: The stimulus buffer holding the battle metadata.
+        :param profiles: The execution profiles the base runs in.
+        """
+        super().__init__(base=base, expected=(stimulus_source,))
+        self._stimulus_source = stimulus_source
+        self.profiles = frozenset(profiles)
+
+    def call(self, inputs: Mapping[Any, nd.NumDict]) -> nd.NumDict:
+        stimulus = inputs[cl.expand_address(self.client, self._stimulus_source)]
+        if get_execution_profile(stimulus) not in self.profiles:
+            return nd.NumDict(default=0.)
+        return self.base.call(inputs)
+
+
 class SwitchIfEmpty(cl.Process):
     """
     If the the inputs from the primary sources are empty, returns the inputs from the alternative sources.
@@ -0,0 +1,150 @@
+from typing import NamedTuple, Optional, FrozenSet, Dict, Iterable, Mapping, Any
+
+from .attention import GroupedChunkInstance
+from .battle_state import BattleScoped
+
+_TEAM_SIZE = 6
+_MOVES_PER_POKEMON = 4
+# poke-env's item for an opponent's Pokemon whose item hasn't been revealed yet
+_UNKNOWN_ITEM = 'unknown_item'
+
+
+def is_revealed(value: Any) -> bool:
+    """Whether a perceived attribute of an opponent's Pokemon (e.g., its item) has been revealed"""
+    return value is not None and value != _UNKNOWN_ITEM
+
+
+class HiddenInformation(NamedTuple):
+    """How much of the opponent's team is still unknown"""
+    unknown_pokemon: int
+    unknown_moves: int
+    unknown_abilities: int
+    unknown_items: int
+
+    @property
+    def total_pokemon(self) -> int:
+        return _TEAM_SIZE
+
+    @property
+    def total_moves(self) -> int:
+        return self.total_pokemon * _MOVES_PER_POKEMON
+
+    @property
+    def total_abilities(self) -> int:
+        return self.total_pokemon
+
+    @property
+    def total_items(self) -> int:
+        return self.total_pokemon
+
+    @property
+    def total_unknown(self) -> int:
+        return self.unknown_pokemon + self.unknown_moves + self.unknown_abilities + self.unknown_items
+
+    @property
+    def total_possible(self) -> int:
+        return self.total_pokemon + self.total_moves + self.total_abilities + self.total_items
+
+
+class SpeciesKnowledge(NamedTuple):
+    """What has been revealed about one of the opponent's Pokemon"""
+    moves: FrozenSet[str] = frozenset()
+    ability: Optional[str] = None
+    item: Optional[str] = None
+
+    @property
+    def known_moves(self) -> int:
+        return min(len(self.moves), _MOVES_PER_POKEMON)
+
+    @property
+    def unknown_moves(self) -> int:
+        return _MOVES_PER_POKEMON - self.known_moves
+
+    @property
+    def is_ability_known(self) -> bool:
+        return self.ability is not None
+
+    @property
+    def is_item_known(self) -> bool:
+        return self.item is not None
+
+    @property
+    def is_complete(self) -> bool:
+        return self.unknown_moves == 0 and self.is_ability_known and self.is_item_known
+
+    def reveal(self, pokemon: GroupedChunkInstance) -> 'SpeciesKnowledge':
+        """This knowledge, with what the perceived Pokemon reveals on top of it"""
+        moves, ability, item = set(), self.ability, self.item
+        for feature in pokemon.features:
+            if not is_revealed(feature.val):
+                continue
+            if feature.tag == 'move':
+                moves.add(feature.val)
+            elif feature.tag == 'ability' and ability is None:
+                ability = feature.val
+            elif feature.tag == 'item' and item is None:
+                item = feature.val
+        return SpeciesKnowledge(self.moves if moves <= self.moves else self.moves | moves, ability, item)
+
+
+class _BattleKnowledge:
+    def __init__(self):
+        self.species: Dict[str, SpeciesKnowledge] = {}
+        self.known_moves = 0
+        self.known_abilities = 0
+        self.known_items = 0
+
+    def update(self, species: str, knowledge: SpeciesKnowledge):
+        previous = self.species.get(species, SpeciesKnowledge())
+        self.known_moves += knowledge.known_moves - previous.known_moves
+        self.known_abilities += knowledge.is_ability_known - previous.is_ability_known
+        self.known_items += knowledge.is_item_known - previous.is_item_known
+        self.species[species] = knowledge
+
+
+class HiddenInformationLedger(BattleScoped):
+    """
+    What has been revealed of the opponent's team, per battle. Revealed information only grows over a battle, so each
+    turn only adds what is new to what is already known: Pokemon that have nothing left to reveal aren't looked at again,
+    and the counts of what is known are kept as they change rather than recounted when read.
+
+    Information stays known once revealed, even after the Pokemon faints or its move runs out of PP.
+    """
+
+    def __init__(self):
+        self._battles: Dict[str, _BattleKnowledge] = {}
+
+    def observe(self, battle_tag: str, pokemon: Iterable[GroupedChunkInstance]):
+        """Adds what the perceived Pokemon of the opponent reveal"""
+        battle = self._battles.get(battle_tag)
+        if battle is None:
+            battle = self._battles[battle_tag] = _BattleKnowledge()
+        for pokemon_chunk in pokemon:
+            known = battle.species.get(pokemon_chunk.cid)
+            if known is not None and known.is_complete:
+                continue
+            revealed = (known if known is not None else SpeciesKnowledge()).reveal(pokemon_chunk)
+            if revealed != known:
+                battle.update(pokemon_chunk.cid, revealed)
+
+    def hidden_information(self, battle_tag: str) -> HiddenInformation:
+        battle = self._battles.get(battle_tag, _BattleKnowledge())
+        return HiddenInformation(
+            unknown_pokemon=_TEAM_SIZE - len(battle.species),
+            unknown_moves=_TEAM_SIZE * _MOVES_PER_POKEMON - battle.known_moves,
+            unknown_abilities=_TEAM_SIZE - battle.known_abilities,
+            unknown_items=_TEAM_SIZE - battle.known_items
+        )
+
+    def knowledge_of(self, battle_tag: str, species: str) -> SpeciesKnowledge:
+        """What is known about one of the opponent's Pokemon. Nothing is known about Pokemon that haven't been seen."""
+        battle = self._battles.get(battle_tag)
+        return battle.species.get(species, SpeciesKnowledge()) if battle is not None else SpeciesKnowledge()
+
+    def snapshot(self, battle_tag: str) -> Mapping[str, SpeciesKnowledge]:
+        """What is known about each of the opponent's Pokemon seen so far, by species"""
+        battle = self._battles.get(battle_tag)
+        return dict(battle.species) if battle is not None else {}
+
+    def forget_battle(self, battle_tag: str):
+        self._battles.pop(battle_tag, None)
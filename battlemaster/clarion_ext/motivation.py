@@ -2,7 +2,8 @@ import logging
 from abc import abstractmethod
 from enum import Enum
 import typing
-from typing import Mapping, Any, Dict, Callable, Hashable, Tuple, Optional
+from functools import cached_property
+from typing import Mapping, Any, Dict, Callable, Hashable, Tuple, Optional, Collection, List, Union
 import math
 
 import pyClarion as cl
@@ -11,7 +12,11 @@ from pyClarion import feature
 
 from ..adapters.clarion_adapter import BattleConcept
 from ..clarion_ext.attention import GroupedChunkInstance
-from .numdicts_ext import filter_chunks_by_group, get_chunk_from_numdict, get_only_value_from_numdict, is_empty
+from .battle_state import BattleScoped
+from .knowledge import HiddenInformationLedger
+from .sampling import BoltzmannSampler
+from .execution import ExecutionProfile, get_execution_profile
+from .numdicts_ext import group_chunks, get_chunk_from_numdict, get_only_value_from_numdict, is_empty
 
 
 class GoalType(str, Enum):
@@ -68,31 +73,31 @@ class GoalGateAdapter(cl.Process):
     def __init__(self, goal_source: cl.Symbol):
         super().__init__(expected=[goal_source])
         self._goal_source = goal_source
+        self._logger = logging.getLogger(self.__class__.__name__)
 
     def call(self, inputs: Mapping[Any, nd.NumDict]) -> nd.NumDict:
         goal_chunk: goal = get_only_value_from_numdict(inputs[cl.expand_address(self.client, self._goal_source)])
         goal_feature = cl.feature((GOAL_GATE_INTERFACE.name, goal_chunk.type.value))
-        self._logger.debug(f"My goal is to {goal_feature}")
+        self._logger.debug("My goal is to %s", goal_feature)
         return nd.NumDict({goal_feature: 1.}, default=0.)
 
-    @property
-    def _logger(self):
-        return logging.getLogger(self.__class__.__name__)
-
 
-class StickyBoltzmannSelector(cl.Process):
+class StickyBoltzmannSelector(cl.Process, BattleScoped):
     """
     An extension of pyClarion's BoltzmannSelector that requires strengths to be above a threshold of the previously
-    sampled emission's current strength.
+    sampled emission's current strength. With a sampler, the new goal is drawn from the battle's random stream and
+    emitted at its strength.
     """
     _serves = cl.ConstructType.terminus
 
-    def __init__(self, goal_source: cl.Symbol, battle_metadata_source: cl.Symbol, temperature: float, threshold: float):
+    def __init__(self, goal_source: cl.Symbol, battle_metadata_source: cl.Symbol, temperature: float, threshold: float,
+                 sampler: Optional[BoltzmannSampler] = None):
         super().__init__(expected=[goal_source, battle_metadata_source])
         self._goal_source = goal_source
         self._battle_metadata_source = battle_metadata_source
         self._temperature = temperature
         self._threshold = threshold
+        self._sampler = sampler
         self._previous_goals = {}
 
     def call(self, inputs: Mapping[Any, nd.NumDict]) -> nd.NumDict:
@@ -123,9 +128,18 @@ class StickyBoltzmannSelector(cl.Process):
         self._set_previous_goal(previous_goal_with_new_strength, inputs)
         return previous_goal_with_new_strength
 
+    def forget_battle(self, battle_tag: str):
+        self._previous_goals.pop(battle_tag, None)
+        if self._sampler is not None:
+            self._sampler.streams.forget_battle(battle_tag)
+
     def _sample_new_goal(self, inputs: Mapping[Any, nd.NumDict]):
         expanded_address = cl.expand_address(self.client, self._goal_source)
-        return nd.boltzmann(inputs[expanded_address], self._temperature)
+        if self._sampler is None:
+            return nd.boltzmann(inputs[expanded_address], self._temperature)
+        strengths = inputs[expanded_address]
+        drawn = self._sampler.sample(self._get_battle_tag(inputs), strengths)
+        return nd.NumDict({drawn: strengths[drawn]} if drawn is not None else {}, default=0.)
 
     def _get_previous_goal(self, inputs: Mapping[Any, nd.NumDict]) -> Optional[nd.NumDict]:
         battle_tag = self._get_battle_tag(inputs)
@@ -166,35 +180,116 @@ DRIVE_DOMAIN = cl.Domain(features=tuple([d for d in drive]))
 GroupedStimulus = Mapping[BattleConcept, nd.NumDict]
 
 
-class DriveStrength(cl.Process):
+class DriveStrength(cl.Process, BattleScoped):
     _serves = cl.ConstructType.features
 
-    def __init__(self, stimulus_source: cl.Symbol, personality_map: Dict[drive, Callable[[GroupedStimulus], float]]):
+    def __init__(self, stimulus_source: cl.Symbol,
+                 personality_map: Dict[drive, Union['DriveEvaluator', Callable[[GroupedStimulus], float]]],
+                 skipped_drives: Optional[Mapping[ExecutionProfile, Collection[drive]]] = None):
+        """
+        :param personality_map: How each drive is evaluated. DriveEvaluators share a DriveSummary of the turn, so the
+            features they read are only extracted once; any other callable is given the grouped stimulus.
+        :param skipped_drives: Drives that aren't evaluated (i.e., have no strength) in an execution profile
+        """
         super().__init__(expected=[stimulus_source])
         self._stimulus_source = stimulus_source
         self._drive_evaluations = personality_map
+        self._skipped_drives = skipped_drives if skipped_drives is not None else {}
 
     def call(self, inputs: Mapping[Any, nd.NumDict]) -> nd.NumDict:
         result = nd.MutableNumDict(default=0.)
         stimulus = inputs[cl.expand_address(self.client, self._stimulus_source)]
         grouped_stimulus = self._group_stimulus(stimulus)
+        summary = DriveSummary(grouped_stimulus)
+        skipped_drives = self._skipped_drives.get(get_execution_profile(grouped_stimulus[BattleConcept.BATTLE]), ())
         for drive in DRIVE_DOMAIN.features:
-            if drive in self._drive_evaluations:
-                result[drive] = self._drive_evaluations[drive](grouped_stimulus)
+            if drive in self._drive_evaluations and drive not in skipped_drives:
+                evaluation = self._drive_evaluations[drive]
+                if isinstance(evaluation, DriveEvaluator):
+                    result[drive] = evaluation.evaluate_summary(summary)
+                else:
+                    result[drive] = evaluation(grouped_stimulus)
 
         return result
 
+    def forget_battle(self, battle_tag: str):
+        for evaluation in self._drive_evaluations.values():
+            if isinstance(evaluation, BattleScoped):
+                evaluation.forget_battle(battle_tag)
+
     @staticmethod
     def _group_stimulus(stimulus: nd.NumDict) -> GroupedStimulus:
-        return {concept: filter_chunks_by_group(concept, stimulus) for concept in BattleConcept}
+        return group_chunks(list(BattleConcept), stimulus)
+
+
+class DriveSummary:
+    """
+    The features of a turn's stimulus that drives are evaluated from. Several drives read the same features (e.g., the
+    active Pokemon's HP), so each feature is extracted once, the first time an evaluator reads it, and shared by every
+    evaluator of the turn.
+    """
+
+    def __init__(self, stimulus: GroupedStimulus):
+        self.stimulus = stimulus
+
+    @cached_property
+    def can_do_damage(self) -> bool:
+        return not is_empty(self.stimulus[BattleConcept.AVAILABLE_MOVES])
+
+    @cached_property
+    def can_switch(self) -> bool:
+        return not is_empty(self.stimulus[BattleConcept.AVAILABLE_SWITCHES])
+
+    @cached_property
+    def is_force_switch(self) -> bool:
+        battle_metadata = typing.cast(GroupedChunkInstance, get_chunk_from_numdict('metadata', self.stimulus[BattleConcept.BATTLE]))
+        return bool(battle_metadata.get_feature_value('force_switch'))
+
+    @cached_property
+    def active_hp(self) -> Optional[Tuple[int, int]]:
+        """The HP and max HP of the active Pokemon, if there is one"""
+        active_pokemon_perception = self.stimulus[BattleConcept.ACTIVE_POKEMON]
+        if is_empty(active_pokemon_perception):
+            return None
+        active_pokemon = typing.cast(GroupedChunkInstance, get_only_value_from_numdict(active_pokemon_perception))
+        return active_pokemon.get_feature_value('hp'), active_pokemon.get_feature_value('max_hp')
+
+    @property
+    def active_hp_fraction(self) -> Optional[float]:
+        if self.active_hp is None:
+            return None
+        hp, max_hp = self.active_hp
+        return hp / max_hp
+
+    @cached_property
+    def opponent_hp_percentage(self) -> Optional[float]:
+        opponent_active_pokemon_perception = self.stimulus[BattleConcept.OPPONENT_ACTIVE_POKEMON]
+        if is_empty(opponent_active_pokemon_perception):
+            return None
+        opponent_active_pokemon = typing.cast(GroupedChunkInstance, get_only_value_from_numdict(opponent_active_pokemon_perception))
+        return opponent_active_pokemon.get_feature_value('hp_percentage')
+
+    @cached_property
+    def battle_tag(self) -> str:
+        battle_metadata = typing.cast(GroupedChunkInstance, get_chunk_from_numdict('metadata', self.stimulus[BattleConcept.BATTLE]))
+        return battle_metadata.get_feature_value('tag')
+
+    @cached_property
+    def opponent_pokemon(self) -> List[GroupedChunkInstance]:
+        """The opponent's active Pokemon (if any) followed by the rest of the opponent's team"""
+        return [*self.stimulus[BattleConcept.OPPONENT_ACTIVE_POKEMON].keys(), *self.stimulus[BattleConcept.OPPONENT_TEAM].keys()]
 
 
 class DriveEvaluator:
     '''
-    A method to evaluate a drive strength. A value between [0,5].
+    A method to evaluate a drive strength. A value between [0,5]. Evaluators read the features they need from the
+    turn's DriveSummary.
     '''
-    @abstractmethod
     def evaluate(self, stimulus: GroupedStimulus) -> float:
+        return self.evaluate_summary(DriveSummary(stimulus))
+
+    @abstractmethod
+    def evaluate_summary(self, summary: DriveSummary) -> float:
         pass
 
 
@@ -206,10 +301,6 @@ class GaussianTargetDriveEvaluator(DriveEvaluator):
     def __init__(self, target_percentage):
         self.target_percentage = target_percentage
 
-    @abstractmethod
-    def evaluate(self, stimulus: GroupedStimulus) -> float:
-        pass
-
     def calculate_drive_strength(self, current_percentage):
         max = self._normal_dist(self.target_percentage, self.target_percentage)
         normalized_multiplier = self._normal_dist(current_percentage, self.target_percentage) / max
@@ -220,43 +311,26 @@ class GaussianTargetDriveEvaluator(DriveEvaluator):
         return (1 / (sigma * math.sqrt(2 * math.pi))) * (math.exp(-0.5 * math.pow(((x - mean) / sigma), 2)))
 
 
-class InflictDamageAware:
-    def can_do_damage(self, stimulus: GroupedStimulus) -> bool:
-        return not is_empty(stimulus[BattleConcept.AVAILABLE_MOVES])
-
-
-class SwitchOutAware:
-    def can_switch(self, stimulus: GroupedStimulus) -> bool:
-        return not is_empty(stimulus[BattleConcept.AVAILABLE_SWITCHES])
+class DoDamageDriveEvaluator(DriveEvaluator):
+    def evaluate_summary(self, summary: DriveSummary) -> float:
+        return 5.0 if summary.can_do_damage else 0.
 
 
-class DoDamageDriveEvaluator(DriveEvaluator, InflictDamageAware):
-    def evaluate(self, stimulus: GroupedStimulus) -> float:
-        return 5.0 if self.can_do_damage(stimulus) else 0.
-
-
-class KoOpponentDriveEvaluator(DriveEvaluator, InflictDamageAware):
-    def evaluate(self, stimulus: GroupedStimulus) -> float:
-        if not self.can_do_damage(stimulus):
+class KoOpponentDriveEvaluator(DriveEvaluator):
+    def evaluate_summary(self, summary: DriveSummary) -> float:
+        if not summary.can_do_damage or summary.opponent_hp_percentage is None:
             return 0.
 
-        opponent_active_pokemon_perception = stimulus[BattleConcept.OPPONENT_ACTIVE_POKEMON]
-        opponent_active_pokemon = typing.cast(GroupedChunkInstance, get_only_value_from_numdict(opponent_active_pokemon_perception))
-        hp_percentage = opponent_active_pokemon.get_feature_value('hp_percentage')
-        return ((100 - hp_percentage) / 20) + 0.05
+        return ((100 - summary.opponent_hp_percentage) / 20) + 0.05
 
 
-class KeepPokemonAliveEvaluator(DriveEvaluator, SwitchOutAware):
-    def evaluate(self, stimulus: GroupedStimulus) -> float:
-        active_pokemon_perception = stimulus[BattleConcept.ACTIVE_POKEMON]
-        if is_empty(active_pokemon_perception) or not self.can_switch(stimulus):
+class KeepPokemonAliveEvaluator(DriveEvaluator):
+    def evaluate_summary(self, summary: DriveSummary) -> float:
+        if summary.active_hp is None or not summary.can_switch:
             return 0.
 
-        active_pokemon = typing.cast(GroupedChunkInstance, get_only_value_from_numdict(active_pokemon_perception))
-        hp = active_pokemon.get_feature_value('hp')
-        max_hp = active_pokemon.get_feature_value('max_hp')
-        hp_percentage = hp / max_hp
-        drive_multiplier = 1.0 - hp_percentage
+        hp, _ = summary.active_hp
+        drive_multiplier = 1.0 - summary.active_hp_fraction
 
         if hp == 1:
             return 5.
@@ -266,77 +340,43 @@ class KeepPokemonAliveEvaluator(DriveEvaluator, SwitchOutAware):
             return drive_multiplier * 5
 
 
-class KeepHealthyEvaluator(GaussianTargetDriveEvaluator, SwitchOutAware):
+class KeepHealthyEvaluator(GaussianTargetDriveEvaluator):
     '''
     The closer the Pokemon is to the target health percentage, the stronger this drive evaluates
     '''
     def __init__(self, target_percentage):
         super(KeepHealthyEvaluator, self).__init__(target_percentage)
 
-    def evaluate(self, stimulus: GroupedStimulus) -> float:
-        if not self.can_switch(stimulus):
+    def evaluate_summary(self, summary: DriveSummary) -> float:
+        if not summary.can_switch or summary.active_hp is None:
             return 0.
 
-        active_pokemon_perception = stimulus[BattleConcept.ACTIVE_POKEMON]
-        active_pokemon = typing.cast(GroupedChunkInstance, get_only_value_from_numdict(active_pokemon_perception))
-        hp = active_pokemon.get_feature_value('hp')
-        max_hp = active_pokemon.get_feature_value('max_hp')
-        hp_percentage = hp / max_hp
-
-        return self.calculate_drive_strength(hp_percentage)
+        return self.calculate_drive_strength(summary.active_hp_fraction)
 
 
 class KeepTypeAdvantageDriveEvaluator(DriveEvaluator):
-    def evaluate(self, stimulus: GroupedStimulus) -> float:
-        battle_metadata = typing.cast(GroupedChunkInstance, get_chunk_from_numdict('metadata', stimulus[BattleConcept.BATTLE]))
-        is_force_switch_turn = battle_metadata.get_feature_value('force_switch')
-        return 5.0 if is_force_switch_turn else 0.
+    def evaluate_summary(self, summary: DriveSummary) -> float:
+        return 5.0 if summary.is_force_switch else 0.
 
 
-class RevealHiddenInformationDriveEvaluator(DriveEvaluator):
-    def evaluate(self, stimulus: GroupedStimulus) -> float:
-        opponent_active_pokemon_perception: nd.NumDict = stimulus[BattleConcept.OPPONENT_ACTIVE_POKEMON]
-        opponent_team_perception: nd.NumDict = stimulus[BattleConcept.OPPONENT_TEAM]
-        total_pokemon_count, unknown_pokemon_count = self._count_unknown_pokemon(opponent_active_pokemon_perception, opponent_team_perception)
-        total_move_count, unknown_move_count = self._count_unknown_moves(total_pokemon_count, opponent_active_pokemon_perception, opponent_team_perception)
-        total_ability_count, unknown_ability_count = self._count_unknown_abilities(total_pokemon_count, opponent_active_pokemon_perception, opponent_team_perception)
-        total_item_count, unknown_item_count = self._count_unknown_items(total_pokemon_count, opponent_active_pokemon_perception, opponent_team_perception)
-
-        total_unknown_information_count = unknown_pokemon_count + unknown_move_count + unknown_ability_count + unknown_item_count
-        total_possible_information_count = total_pokemon_count + total_move_count + total_ability_count + total_item_count
-
-        return 5 * (total_unknown_information_count / total_possible_information_count)
-
-    def _count_unknown_pokemon(self, opponent_active_pokemon: nd.NumDict, opponent_team: nd.NumDict) -> Tuple[int, int]:
-        total_pokemon = 6
-        active_count = 0 if is_empty(opponent_active_pokemon) else 1
-        unknown_count = 6 - len(opponent_team) - active_count
-        return total_pokemon, unknown_count
-
-    def _count_unknown_moves(self, total_pokemon_count: int, opponent_active_pokemon: nd.NumDict, opponent_team: nd.NumDict) -> Tuple[int, int]:
-        total_possible_move_count = total_pokemon_count * 4
-        known_move_count = self._count_known_feature(opponent_active_pokemon, opponent_team, 'move')
-        return total_possible_move_count, total_possible_move_count - known_move_count
-
-    def _count_unknown_abilities(self, total_pokemon_count: int, opponent_active_pokemon: nd.NumDict, opponent_team: nd.NumDict) -> Tuple[int, int]:
-        total_possible_ability_count = total_pokemon_count * 1
-        known_ability_count = self._count_known_feature(opponent_active_pokemon, opponent_team, 'ability')
-        return total_possible_ability_count, total_possible_ability_count - known_ability_count
-
-    def _count_unknown_items(self, total_pokemon_count: int, opponent_active_pokemon: nd.NumDict, opponent_team: nd.NumDict) -> Tuple[int, int]:
-        total_possible_item_count = total_pokemon_count * 1
-        known_item_count = self._count_known_feature(opponent_active_pokemon, opponent_team, 'item')
-        return total_possible_item_count, total_possible_item_count - known_item_count
-
-    def _count_known_feature(self, opponent_active_pokemon: nd.NumDict, opponent_team: nd.NumDict, feature_name: str) -> int:
-        count = len(get_only_value_from_numdict(opponent_active_pokemon).get_feature(feature_name)) if not is_empty(opponent_active_pokemon) else 0
-        for pokemon_chunk in opponent_team:
-            is_fainted = pokemon_chunk.get_feature_value('fainted')
-            if not is_fainted:
-                features = pokemon_chunk.get_feature(feature_name)
-                count += len([feature for feature in features if feature.val is not None])
-
-        return count
+class RevealHiddenInformationDriveEvaluator(DriveEvaluator, BattleScoped):
+    '''
+    The more of the opponent's team is unknown, the stronger this drive evaluates. What has been revealed is kept in a
+    ledger per battle, which can be shared with other processes (e.g., mental simulation). Without observe, the ledger
+    is only read, since it is kept up to date elsewhere (e.g., by the MindAdapter from the turn's perception).
+    '''
+    def __init__(self, ledger: Optional[HiddenInformationLedger] = None, observe: bool = True):
+        self.ledger = ledger if ledger is not None else HiddenInformationLedger()
+        self._observe = observe
+
+    def evaluate_summary(self, summary: DriveSummary) -> float:
+        if self._observe:
+            self.ledger.observe(summary.battle_tag, summary.opponent_pokemon)
+        hidden_information = self.ledger.hidden_information(summary.battle_tag)
+        return 5 * (hidden_information.total_unknown / hidden_information.total_possible)
+
+    def forget_battle(self, battle_tag: str):
+        self.ledger.forget_battle(battle_tag)
 
 
 class ConstantDriveEvaluator(DriveEvaluator):
@@ -344,7 +384,7 @@ class ConstantDriveEvaluator(DriveEvaluator):
         super().__init__()
         self._strength = strength
 
-    def evaluate(self, stimulus: GroupedStimulus) -> float:
+    def evaluate_summary(self, summary: DriveSummary) -> float:
         return self._strength
 
 
@@ -1,4 +1,4 @@
-from typing import Optional, List
+from typing import Optional, List, Collection, Dict
 
 import pyClarion as cl
 from pyClarion import nd
@@ -48,6 +48,19 @@ def filter_chunks_by_group(group: str, d: nd.NumDict) -> nd.NumDict:
     return nd.NumDict(result, default=d.default)
 
 
+def group_chunks(groups: Collection[str], d: nd.NumDict) -> Dict[str, nd.NumDict]:
+    """Same as filtering the chunks of every group with filter_chunks_by_group, but in a single pass over d"""
+    # groups are matched by their string value, since str enums (e.g., BattleConcept) don't hash like their value
+    grouped = {str(group): {} for group in groups}
+    for chunk, weight in d.items():
+        if isinstance(chunk, GroupedChunk):
+            chunks = grouped.get(str(chunk.group))
+            if chunks is not None:
+                chunks[chunk] = weight
+
+    return {group: nd.NumDict(grouped[str(group)], default=d.default) for group in groups}
+
+
 def get_only_value_from_numdict(d: nd.NumDict):
     return next(iter(d))
 
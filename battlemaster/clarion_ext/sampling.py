@@ -0,0 +1,124 @@
+import hashlib
+from typing import Optional, Dict, Sequence, List, Hashable, Mapping, Any
+
+import numpy as np
+import pyClarion as cl
+from pyClarion import nd
+
+from .battle_state import BattleScoped
+from .execution import get_battle_tag
+
+
+class BattleRandomStreams(BattleScoped):
+    """
+    A NumPy random generator per battle. With a seed, each battle's generator is seeded from the seed and the battle's
+    tag, so a battle samples the same way regardless of the battles running beside it. Without one, every generator is
+    seeded from fresh entropy.
+    """
+
+    def __init__(self, seed: Optional[int] = None):
+        if seed is not None and seed < 0:
+            raise ValueError(f'The seed must not be negative, but got {seed}')
+        self.seed = seed
+        self._generators: Dict[Optional[str], np.random.Generator] = {}
+
+    def generator(self, battle_tag: Optional[str]) -> np.random.Generator:
+        generator = self._generators.get(battle_tag)
+        if generator is None:
+            generator = self._generators[battle_tag] = np.random.default_rng(self._seed_sequence(battle_tag))
+        return generator
+
+    def forget_battle(self, battle_tag: str):
+        self._generators.pop(battle_tag, None)
+
+    def _seed_sequence(self, battle_tag: Optional[str]) -> np.random.SeedSequence:
+        if self.seed is None:
+            return np.random.SeedSequence()
+        # hash() is salted per process, so the tag is digested instead to seed the same stream in every run
+        tag_digest = int.from_bytes(hashlib.blake2b(str(battle_tag).encode(), digest_size=8).digest(), 'little')
+        return np.random.SeedSequence([self.seed, tag_digest])
+
+
+def boltzmann(strengths: np.ndarray, temperature: float) -> np.ndarray:
+    """
+    The boltzmann distribution (i.e., the softmax of strengths / temperature) over the last axis. Strengths of -inf
+    (e.g., padding) get no probability.
+    """
+    scaled = strengths / temperature
+    weights = np.exp(scaled - np.max(scaled, axis=-1, keepdims=True))
+    return weights / np.sum(weights, axis=-1, keepdims=True)
+
+
+def draw(probabilities: np.ndarray, uniforms: np.ndarray) -> np.ndarray:
+    """Categorical draws: the index each row's cumulative probability first passes its uniform (in [0, 1)) at"""
+    cumulative = np.cumsum(probabilities, axis=-1)
+    # scaled by the row's total so rounding can't leave the uniform past the last index
+    indices = np.sum(cumulative <= uniforms[..., np.newaxis] * cumulative[..., -1:], axis=-1)
+    return np.minimum(indices, probabilities.shape[-1] - 1)
+
+
+class BoltzmannSampler:
+    """Samples a symbol from the boltzmann distribution over a battle's strengths, with the battle's random stream"""
+
+    def __init__(self, streams: BattleRandomStreams, temperature: float):
+        self.streams = streams
+        self.temperature = temperature
+
+    def sample(self, battle_tag: Optional[str], strengths: nd.NumDict) -> Optional[Hashable]:
+        """The sampled symbol. None if there are no strengths to sample from."""
+        return self.sample_many([battle_tag], [strengths])[0]
+
+    def sample_many(self, battle_tags: Sequence[Optional[str]], strengths: Sequence[nd.NumDict]) -> List[Optional[Hashable]]:
+        """
+        Samples a symbol for each battle at once. The strengths of every battle are padded into one matrix, so the
+        distributions and draws of all battles are computed together. Each battle still draws from its own stream.
+        """
+        if len(battle_tags) != len(strengths):
+            raise ValueError(f'Got {len(battle_tags)} battles but {len(strengths)} strengths to sample from')
+        symbols = [list(battle_strengths.keys()) for battle_strengths in strengths]
+        sampled_rows = [row for row, row_symbols in enumerate(symbols) if len(row_symbols) > 0]
+        sampled = [None] * len(strengths)
+        if len(sampled_rows) == 0:
+            return sampled
+
+        matrix = np.full((len(sampled_rows), max(len(symbols[row]) for row in sampled_rows)), -np.inf)
+        for i, row in enumerate(sampled_rows):
+            matrix[i, :len(symbols[row])] = list(strengths[row].values())
+        uniforms = np.array([self.streams.generator(battle_tags[row]).random() for row in sampled_rows])
+
+        for row, index in zip(sampled_rows, draw(boltzmann(matrix, self.temperature), uniforms)):
+            sampled[row] = symbols[row][index]
+        return sampled
+
+
+class SeededBoltzmannSelector(cl.Process, BattleScoped):
+    """
+    pyClarion's BoltzmannSelector, except the symbol is drawn from the battle's random stream rather than from global
+    randomness. Strengths are thresholded the same way and the drawn symbol is emitted at full strength.
+    """
+    _serves = cl.ConstructType.terminus
+
+    def __init__(self, source: cl.Symbol, stimulus_source: cl.Symbol, streams: BattleRandomStreams,
+                 temperature: float = 0.01, threshold: float = 0.25):
+        """
+        :param stimulus_source: The stimulus buffer holding the battle metadata.
+        """
+        super().__init__(expected=[source, stimulus_source])
+        self.source = source
+        self._stimulus_source = stimulus_source
+        self.temperature = temperature
+        self.threshold = threshold
+        self._sampler = BoltzmannSampler(streams, temperature)
+
+    @property
+    def streams(self) -> BattleRandomStreams:
+        return self._sampler.streams
+
+    def call(self, inputs: Mapping[Any, nd.NumDict]) -> nd.NumDict:
+        strengths = nd.threshold(inputs[cl.expand_address(self.client, self.source)], th=self.threshold, keep_default=True)
+        battle_tag = get_battle_tag(inputs[cl.expand_address(self.client, self._stimulus_source)])
+        drawn = self._sampler.sample(battle_tag, strengths)
+        return nd.NumDict({drawn: 1.} if drawn is not None else {}, default=0.)
+
+    def forget_battle(self, battle_tag: str):
+        self._sampler.streams.forget_battle(battle_tag)
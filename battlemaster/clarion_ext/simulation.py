@@ -1,49 +1,210 @@
-from typing import Mapping, Any, Optional
+import logging
+import multiprocessing
+from concurrent.futures import Executor, Future, TimeoutError, ProcessPoolExecutor
+from contextlib import nullcontext
+from time import monotonic
+from typing import Mapping, Any, Optional, Tuple, Iterator, Sequence, Dict
 
 import pyClarion as cl
 from pyClarion import nd
 from poke_engine.constants import SWITCH_STRING
 
 from ..adapters.clarion_adapter import BattleConcept
-from ..adapters.poke_engine_adapter import Simulator, BattleStimulusAdapter, OptionFilter
-from .numdicts_ext import filter_chunks_by_group, get_only_value_from_numdict
+from .attention import CurrentPerception, GroupedChunkInstance
+from .knowledge import HiddenInformationLedger, SpeciesKnowledge
+from .battle_state import BattleScoped
+from .execution import get_battle_tag
+from ..adapters.poke_engine_adapter import Simulator, BattleStimulusAdapter, OptionFilter, SearchStats
+from ..load import LoadMonitor
+from .numdicts_ext import group_chunks, get_chunk_from_numdict, get_only_value_from_numdict
 from .motivation import GoalType, goal
 
 
 class MentalSimulation(cl.Process):
+    """
+    Searches for the safest action towards the current goal. The activations of move_priority_sources and
+    switch_priority_sources (e.g., the mind's efficacy reasoning) decide which of the agent's options are searched first,
+    which lets the search prune more. With the current perception, the battle is read from it, including the groups the
+    stimulus buffer leaves out. With a ledger of hidden information, the opponent's Pokemon are only filled in with
+    likely attributes where nothing has been revealed yet.
+    """
     _serves = cl.ConstructType.flow_tt | cl.ConstructType.chunks
 
-    def __init__(self, stimulus_source: cl.Symbol, goal_source: cl.Symbol, simulator: Simulator):
-        super().__init__(expected=[stimulus_source, goal_source])
+    def __init__(self, stimulus_source: cl.Symbol, goal_source: cl.Symbol, simulator: Simulator,
+                 load_monitor: Optional[LoadMonitor] = None, move_priority_sources: Sequence[cl.Symbol] = (),
+                 switch_priority_sources: Sequence[cl.Symbol] = (), current_perception: Optional[CurrentPerception] = None,
+                 ledger: Optional[HiddenInformationLedger] = None):
+        super().__init__(expected=[stimulus_source, goal_source, *move_priority_sources, *switch_priority_sources])
         self._goal_source = goal_source
         self._stimulus_source = stimulus_source
         self._simulator = simulator
+        self._load_monitor = load_monitor
+        self._move_priority_sources = move_priority_sources
+        self._switch_priority_sources = switch_priority_sources
+        self._current_perception = current_perception
+        self._ledger = ledger
 
     def call(self, inputs: Mapping[Any, nd.NumDict]) -> nd.NumDict:
+        simulation, option_filter, option_priority = self._prepare_simulation(inputs)
+        with self._load_monitor.simulating() if self._load_monitor is not None else nullcontext():
+            action = self._simulator.pick_safest_move(simulation, option_filter, option_priority)
+        return self._to_activation(action)
+
+    def _prepare_simulation(self, inputs: Mapping[Any, nd.NumDict]) -> Tuple[BattleStimulusAdapter, OptionFilter, Dict[str, float]]:
         grouped_stimulus = self._group_stimulus(inputs)
         current_goal = self._get_goal(inputs)
+        simulation = BattleStimulusAdapter.from_stimulus(grouped_stimulus, self._get_opponent_knowledge(grouped_stimulus))
+        return simulation, self._get_option_filter(current_goal), self._get_option_priority(inputs)
+
+    def _get_opponent_knowledge(self, grouped_stimulus: Mapping[BattleConcept, nd.NumDict]) -> Optional[Mapping[str, SpeciesKnowledge]]:
+        if self._ledger is None:
+            return None
+        battle_metadata: GroupedChunkInstance = get_chunk_from_numdict('metadata', grouped_stimulus[BattleConcept.BATTLE])
+        # a copy, since the simulation may be searched on another thread or process
+        return self._ledger.snapshot(battle_metadata.get_feature_value('tag'))
 
-        simulation = BattleStimulusAdapter.from_stimulus(grouped_stimulus)
-        action = self._generate_and_test_for_best_move(simulation, current_goal)
-        return nd.NumDict({cl.chunk(action): 1.}, default=0.0) if action else nd.NumDict({}, default=0.0)
+    def _get_option_priority(self, inputs: Mapping[Any, nd.NumDict]) -> Dict[str, float]:
+        option_priority: Dict[str, float] = {}
+        for sources, to_option in ((self._move_priority_sources, lambda cid: cid),
+                                   (self._switch_priority_sources, lambda cid: f'{SWITCH_STRING} {cid}')):
+            for source in sources:
+                for action, activation in inputs[cl.expand_address(self.client, source)].items():
+                    option = to_option(action.cid)
+                    option_priority[option] = max(activation, option_priority.get(option, activation))
+        return option_priority
 
     def _group_stimulus(self, inputs: Mapping[Any, nd.NumDict]) -> Mapping[BattleConcept, nd.NumDict]:
+        if self._current_perception is not None and self._current_perception.view is not None:
+            return self._current_perception.view
         stimulus = inputs[cl.expand_address(self.client, self._stimulus_source)]
-        return {concept: filter_chunks_by_group(concept, stimulus) for concept in BattleConcept}
+        return group_chunks(list(BattleConcept), stimulus)
 
     def _get_goal(self, inputs: Mapping[Any, nd.NumDict]) -> goal:
         goal_input = inputs[cl.expand_address(self.client, self._goal_source)]
         return get_only_value_from_numdict(goal_input)
 
-    def _generate_and_test_for_best_move(self, simulation: BattleStimulusAdapter, current_goal: goal) -> Optional[str]:
-        option_filter = self._get_option_filter(current_goal)
-        action = self._simulator.pick_safest_move(simulation, option_filter)
+    @staticmethod
+    def _to_activation(action: Optional[str]) -> nd.NumDict:
         if not action:
-            return None
-        if not action.startswith(SWITCH_STRING):
-            return action
-        return action.split(SWITCH_STRING)[-1].strip()
+            return nd.NumDict({}, default=0.0)
+        if action.startswith(SWITCH_STRING):
+            action = action.split(SWITCH_STRING)[-1].strip()
+        return nd.NumDict({cl.chunk(action): 1.}, default=0.0)
 
     @staticmethod
     def _get_option_filter(current_goal: goal) -> OptionFilter:
         return OptionFilter.MOVES if current_goal.type == GoalType.MOVE else OptionFilter.SWITCHES
+
+
+class PendingSimulation:
+    """
+    Hands the search launched by LaunchSimulation over to the CollectSimulation later in the same step. Searches are
+    kept per battle, so a step that fails before collecting its search can't hand it to the step of another battle.
+    """
+
+    def __init__(self):
+        self._searches: Dict[Optional[str], Tuple[Future, float]] = {}
+
+    def put(self, battle_tag: Optional[str], future: Future, deadline: float):
+        self.forget(battle_tag)
+        self._searches[battle_tag] = future, deadline
+
+    def take(self, battle_tag: Optional[str]) -> Tuple[Optional[Future], float]:
+        return self._searches.pop(battle_tag, (None, 0.))
+
+    def forget(self, battle_tag: Optional[str]):
+        future, _ = self.take(battle_tag)
+        if future is not None:
+            future.cancel()
+
+
+def search_safest_move(simulator: Simulator, simulation: BattleStimulusAdapter, option_filter: OptionFilter,
+                       option_priority: Dict[str, float]) -> Tuple[Optional[str], SearchStats]:
+    """Runs on the executor. Returns the stats of the search along with its result, since the simulator may be a copy."""
+    return simulator.pick_safest_move(simulation, option_filter, option_priority), simulator.stats
+
+
+class LaunchSimulation(MentalSimulation):
+    """
+    Starts the search of a MentalSimulation on an executor as soon as the stimulus, goal and option priority are
+    available, so the rest of the step runs while it searches. Its output is always empty; the result is read by a
+    CollectSimulation. With a process pool, the simulation and simulator are pickled to the worker.
+    """
+
+    def __init__(self, stimulus_source: cl.Symbol, goal_source: cl.Symbol, simulator: Simulator, executor: Executor,
+                 pending: PendingSimulation, timeout: float, load_monitor: Optional[LoadMonitor] = None,
+                 move_priority_sources: Sequence[cl.Symbol] = (), switch_priority_sources: Sequence[cl.Symbol] = (),
+                 current_perception: Optional[CurrentPerception] = None, ledger: Optional[HiddenInformationLedger] = None):
+        super().__init__(stimulus_source, goal_source, simulator, load_monitor, move_priority_sources=move_priority_sources,
+                         switch_priority_sources=switch_priority_sources, current_perception=current_perception, ledger=ledger)
+        self._executor = executor
+        self._pending = pending
+        self._timeout = timeout
+
+    def call(self, inputs: Mapping[Any, nd.NumDict]) -> nd.NumDict:
+        simulation, option_filter, option_priority = self._prepare_simulation(inputs)
+        future = self._executor.submit(search_safest_move, self._simulator, simulation, option_filter, option_priority)
+        future.add_done_callback(self._merge_stats)
+        if self._load_monitor is not None:
+            self._load_monitor.simulation_started()
+            # a search that timed out keeps the executor busy until it is done
+            future.add_done_callback(lambda _: self._load_monitor.simulation_finished())
+        battle_tag = get_battle_tag(inputs[cl.expand_address(self.client, self._stimulus_source)])
+        self._pending.put(battle_tag, future, monotonic() + self._timeout)
+        return nd.NumDict({}, default=0.0)
+
+    def _merge_stats(self, future: Future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        _, stats = future.result()
+        # searches on a thread count in the simulator's own stats already
+        if stats is not self._simulator.stats:
+            self._simulator.stats.merge(stats)
+
+
+class CollectSimulation(cl.Process, BattleScoped):
+    """
+    Waits for the search a LaunchSimulation started for the battle earlier in the step, at most until its deadline. A
+    search that times out or fails has an empty activation, which leaves the decision to the mind's other reasoning paths.
+    """
+    _serves = cl.ConstructType.flow_tt | cl.ConstructType.chunks
+
+    def __init__(self, launch_source: cl.Symbol, stimulus_source: cl.Symbol, pending: PendingSimulation):
+        super().__init__(expected=[launch_source, stimulus_source])
+        self._stimulus_source = stimulus_source
+        self._pending = pending
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+    def call(self, inputs: Mapping[Any, nd.NumDict]) -> nd.NumDict:
+        battle_tag = get_battle_tag(inputs[cl.expand_address(self.client, self._stimulus_source)])
+        future, deadline = self._pending.take(battle_tag)
+        if future is None:
+            return nd.NumDict({}, default=0.0)
+
+        try:
+            action, _ = future.result(timeout=max(deadline - monotonic(), 0.))
+        except TimeoutError:
+            self._logger.warning("My mental simulation took too long. I'm deciding without it")
+            future.cancel()
+            return nd.NumDict({}, default=0.0)
+        except Exception:
+            self._logger.exception("My mental simulation failed. I'm deciding without it")
+            return nd.NumDict({}, default=0.0)
+        return MentalSimulation._to_activation(action)
+
+    def forget_battle(self, battle_tag: str):
+        self._pending.forget(battle_tag)
+
+
+def init_simulation_executor(workers: int) -> Iterator[Optional[Executor]]:
+    """Resource initializer for the container. Mental simulation runs within the mind's step when workers is 0."""
+    if workers <= 0:
+        yield None
+        return
+
+    # poke-env starts POKE_LOOP's thread on import, which makes forking unsafe
+    executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+    try:
+        yield executor
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -1,7 +1,7 @@
 import logging
 import logging.config
-from typing import Type, List
-import re
+from concurrent.futures import Executor
+from typing import Type, Optional
 
 from dependency_injector import containers, providers
 from poke_env import AccountConfiguration, ServerConfiguration
@@ -10,20 +10,18 @@ from poke_env.player import RandomPlayer, Player, SimpleHeuristicsPlayer
 from .mind import create_agent
 from .agents import BattleMasterPlayer, MaxDamagePlayer, ExpectiminimaxPlayer
 from .adapters.clarion_adapter import MindAdapter, PerceptionFactory
+from .adapters.decision_cache import DecisionCache
+from .tracing import DecisionTracer, init_tracer
+from .memory import init_memory_monitor
+from .load import LoadMonitor, init_load_monitor
+from .clarion_ext.simulation import init_simulation_executor
+from .adapters.search_cache import SearchCache
+from .adapters.poke_engine_adapter import Simulator
+from .speculation import init_speculator
+from .opening_book import init_opening_book
+from .logging_ext import ShowdownEventFilter
 
-
-class ShowdownEventFilter(logging.Filter):
-    def __init__(self, events_to_ignore: List[str] = []):
-        super().__init__()
-        regex = '|'.join(events_to_ignore)
-        self._record_regex = re.compile(f'\\|{regex}\\|')
-
-    def filter(self, record: logging.LogRecord) -> bool:
-        if record.levelno >= logging.WARN:
-            return True
-
-        log_message = record.getMessage()
-        return self._record_regex.search(log_message) is None
+_MAX_USERNAME_LENGTH = 18
 
 
 class PlayerSingleton(providers.Provider):
@@ -65,41 +63,89 @@ class PlayerSingleton(providers.Provider):
         return player
 
 
-def _get_showdown_config(config: providers.Configuration):
+def _get_showdown_config(config: providers.Configuration, shard: providers.Provider):
     showdown_settings = config.showdown
-    account_config = AccountConfiguration(showdown_settings.username(), showdown_settings.password())
-    server_config = ServerConfiguration(showdown_settings.server_url(), showdown_settings.auth_url())
+    account_config = providers.Callable(_shard_account, showdown_settings.username, showdown_settings.password, shard)
+    server_config = providers.Factory(ServerConfiguration, showdown_settings.server_url, showdown_settings.auth_url)
     return account_config, server_config
 
 
-def _configure_player(config: providers.Configuration) -> PlayerSingleton:
-    account_config, server_config = _get_showdown_config(config)
-    mind = _configure_mind()
+def _shard_account(username: str, password: Optional[str], shard: Optional[int]) -> AccountConfiguration:
+    """
+    Sharded benchmark workers run side by side, so each needs its own user. These users are not registered, which
+    means sharding requires a server with security disabled (see local-setup).
+    """
+    if shard is None:
+        return AccountConfiguration(username, password)
+    suffix = f' {shard}'
+    return AccountConfiguration(f'{username[:_MAX_USERNAME_LENGTH - len(suffix)]}{suffix}', None)
+
+
+def _benchmark_account(provides: Type, shard: Optional[int]) -> Optional[AccountConfiguration]:
+    if shard is None:
+        return None
+    return _shard_account(provides.__name__, None, shard)
+
+
+def _configure_player(config: providers.Configuration, shard: providers.Provider, tracer: providers.Provider,
+                      decision_cache: providers.Provider, load_monitor: providers.Provider,
+                      simulation_executor: providers.Provider, simulation_timeout: providers.Provider,
+                      simulator: providers.Provider, speculator: providers.Provider,
+                      dense_motivation: providers.Provider, seed: providers.Provider,
+                      opening_book: providers.Provider) -> PlayerSingleton:
+    account_config, server_config = _get_showdown_config(config, shard)
+    mind = _configure_mind(tracer, decision_cache, load_monitor, simulation_executor, simulation_timeout, simulator,
+                           dense_motivation, seed)
     return PlayerSingleton(
         BattleMasterPlayer,
         config,
         mind=mind,
+        tracer=tracer,
+        load_monitor=load_monitor,
+        speculator=speculator,
+        opening_book=opening_book,
         account_configuration=account_config,
         server_configuration=server_config,
         max_concurrent_battles=config.agent.max_concurrent_battles.as_int()()
     )
 
 
-def _configure_benchmark_player(config: providers.Configuration, provides: Type) -> PlayerSingleton:
-    _, server_config = _get_showdown_config(config)
+def _configure_benchmark_player(config: providers.Configuration, shard: providers.Provider, provides: Type) -> PlayerSingleton:
+    _, server_config = _get_showdown_config(config, shard)
     return PlayerSingleton(
         provides,
         config,
+        account_configuration=providers.Callable(_benchmark_account, provides, shard),
         server_configuration=server_config,
         max_concurrent_battles=config.agent.max_concurrent_battles.as_int()(),
         start_listening=False
     )
 
 
-def _configure_mind():
-    mind, stimulus = create_agent()
+def _configure_mind(tracer: providers.Provider, decision_cache: providers.Provider, load_monitor: providers.Provider,
+                    simulation_executor: providers.Provider, simulation_timeout: providers.Provider,
+                    simulator: providers.Provider, dense_motivation: providers.Provider,
+                    seed: providers.Provider) -> providers.Singleton:
+    return providers.Singleton(_create_mind_adapter, tracer, decision_cache, load_monitor, simulation_executor,
+                               simulation_timeout, simulator, dense_motivation, seed)
+
+
+def _create_mind_adapter(tracer: Optional[DecisionTracer], decision_cache: Optional[DecisionCache],
+                         load_monitor: Optional[LoadMonitor], simulation_executor: Optional[Executor],
+                         simulation_timeout: float, simulator: Simulator, dense_motivation: bool,
+                         seed: Optional[int]) -> MindAdapter:
+    mind, stimulus = create_agent(load_monitor, simulation_executor, simulation_timeout, simulator, dense_motivation, seed)
     factory = PerceptionFactory()
-    return providers.Object(MindAdapter(mind, stimulus, factory))
+    return MindAdapter(mind, stimulus, factory, tracer=tracer, decision_cache=decision_cache,
+                       ledger=mind.assets.hidden_information)
+
+
+def _create_decision_cache(max_size: int, per_battle: bool) -> Optional[DecisionCache]:
+    return DecisionCache(max_size, per_battle) if max_size > 0 else None
+
+
+def _create_search_cache(speculate: bool) -> Optional[SearchCache]:
+    return SearchCache() if speculate else None
 
 
 class Container(containers.DeclarativeContainer):
@@ -108,10 +154,60 @@ class Container(containers.DeclarativeContainer):
 
     logging = providers.Resource(logging.config.fileConfig, fname="logging.ini")
 
-    player = _configure_player(config)
+    # Index of the benchmark worker process this container lives in. None outside of sharded benchmarks.
+    shard = providers.Object(None)
+
+    # File to write per-turn decision spans to. Tracing is disabled when None.
+    trace_path = providers.Object(None)
+    tracer = providers.Resource(init_tracer, trace_path)
+
+    # Seconds between memory samples and how many allocation sites to report. Monitoring is disabled when None.
+    memory_interval = providers.Object(None)
+    memory_top = providers.Object(0)
+    memory_monitor = providers.Resource(init_memory_monitor, memory_interval, memory_top)
+
+    # Number of perceived states to cache decisions for and whether they are only reused within a battle. Disabled when 0.
+    decision_cache_size = providers.Object(0)
+    decision_cache_per_battle = providers.Object(True)
+    decision_cache = providers.Singleton(_create_decision_cache, decision_cache_size, decision_cache_per_battle)
+
+    # Worker processes mental simulation runs on, overlapping the rest of the mind's step, and how many seconds a step
+    # waits for it. Simulation runs within the step when 0.
+    simulation_workers = providers.Object(0)
+    simulation_timeout = providers.Object(5.)
+    simulation_executor = providers.Resource(init_simulation_executor, simulation_workers)
+
+    # Average decision latency (ms) past which battles start being downgraded to autopilot. Disabled when None.
+    load_target_ms = providers.Object(None)
+    load_monitor = providers.Resource(init_load_monitor, load_target_ms, simulation_workers)
+
+    # Whether to search the likely next positions while waiting for the opponent, filling a cache of searched positions
+    speculate = providers.Object(False)
+    search_cache = providers.Singleton(_create_search_cache, speculate)
+
+    # How many of the opponent's strongest options mental simulation searches. Every option is searched when None.
+    opponent_top_k = providers.Object(None)
+
+    # Searches positions for mental simulation and speculation alike, so speculated positions are cached under the
+    # options mental simulation searches
+    simulator = providers.Singleton(Simulator, search_cache, opponent_top_k=opponent_top_k)
+    speculator = providers.Resource(init_speculator, search_cache, simulator)
+
+    # Whether goals are activated from drives as vectors rather than symbol by symbol
+    dense_motivation = providers.Object(False)
+
+    # Seed of the random stream each battle samples goals and actions from. Streams are seeded from fresh entropy when None.
+    seed = providers.Object(None)
+
+    # File of the opening book the first turns of battles are answered from. Battles are opened by the mind when None.
+    opening_book_path = providers.Object(None)
+    opening_book = providers.Resource(init_opening_book, opening_book_path)
+
+    player = _configure_player(config, shard, tracer, decision_cache, load_monitor, simulation_executor, simulation_timeout,
+                               simulator, speculator, dense_motivation, seed, opening_book)
     benchmark_agents = providers.Dict(
-        random=_configure_benchmark_player(config, RandomPlayer),
-        max_damage=_configure_benchmark_player(config, MaxDamagePlayer),
-        simple_heuristic=_configure_benchmark_player(config, SimpleHeuristicsPlayer),
-        exp_minmax=_configure_benchmark_player(config, ExpectiminimaxPlayer)
+        random=_configure_benchmark_player(config, shard, RandomPlayer),
+        max_damage=_configure_benchmark_player(config, shard, MaxDamagePlayer),
+        simple_heuristic=_configure_benchmark_player(config, shard, SimpleHeuristicsPlayer),
+        exp_minmax=_configure_benchmark_player(config, shard, ExpectiminimaxPlayer)
     )
@@ -0,0 +1,139 @@
+from functools import lru_cache
+from typing import Sequence, Tuple, Dict, Optional
+
+import numpy as np
+from poke_env.data import GenData
+from poke_env.environment import Battle, Move, Pokemon, PokemonType, MoveCategory
+from poke_env.stats import compute_raw_stats
+
+_CATEGORIES = {category.name: index for index, category in enumerate(MoveCategory)}
+_PHYSICAL = _CATEGORIES[MoveCategory.PHYSICAL.name]
+_STAB = 1.5
+# random battle sets: 84 EVs and 31 IVs in every stat, with a neutral nature
+_ASSUMED_EVS = [84] * 6
+_ASSUMED_IVS = [31] * 6
+_ASSUMED_NATURE = 'serious'
+
+
+class MoveTable:
+    """
+    The base power, type and category of every move of a generation as arrays indexed by move, along with the type
+    chart as a matrix, so the moves of a turn are scored with array operations rather than move by move.
+    """
+
+    def __init__(self, gen: int = 9):
+        data = GenData.from_gen(gen)
+        self.types = list(PokemonType)
+        self._type_indices = {pokemon_type: index for index, pokemon_type in enumerate(self.types)}
+        # the column of a missing second type, which every type is neutral against
+        self._no_type = len(self.types)
+
+        self._move_indices = {move_id: index for index, move_id in enumerate(data.moves)}
+        # a row per move: base power, type and category, so a turn's moves are read with a single lookup
+        self._moves = np.array([(entry.get('basePower', 0), self.index_of_type(PokemonType.from_name(entry['type'])),
+                                 _CATEGORIES[entry['category'].upper()]) for entry in data.moves.values()], dtype=float)
+        self.type_chart = self._build_type_chart(data.type_chart)
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def for_gen(gen: int) -> 'MoveTable':
+        return MoveTable(gen)
+
+    def lookup(self, moves: Sequence[Move]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        The base power, type and category of each move. Moves that aren't plain moves of the table (e.g., dynamax moves,
+        whose base power depends on the base move) are read from the move itself.
+        """
+        indices = [self._move_indices.get(move.id, -1) if type(move) is Move else -1 for move in moves]
+        rows = self._moves[indices]
+        if -1 in indices:
+            for i, index in enumerate(indices):
+                if index < 0:
+                    move = moves[i]
+                    rows[i] = (move.base_power, self.index_of_type(move.type), _CATEGORIES[move.category.name])
+        return rows[:, 0], rows[:, 1].astype(np.intp), rows[:, 2].astype(np.intp)
+
+    def effectiveness_by_type(self, type_1: PokemonType, type_2: Optional[PokemonType]) -> np.ndarray:
+        """
+        The damage multiplier of every type (in the order of types) on a Pokemon of the given types, like
+        PokemonType.damage_multiplier
+        """
+        if type_1 == PokemonType.THREE_QUESTION_MARKS:
+            return np.ones(len(self.types))
+        second_type = self.index_of_type(type_2) if type_2 is not None else self._no_type
+        return self.type_chart[:, self.index_of_type(type_1)] * self.type_chart[:, second_type]
+
+    def effectiveness(self, move_types: np.ndarray, type_1: PokemonType, type_2: Optional[PokemonType]) -> np.ndarray:
+        """The damage multiplier of each move type on a Pokemon of the given types"""
+        return self.effectiveness_by_type(type_1, type_2)[move_types]
+
+    def index_of_type(self, pokemon_type: PokemonType) -> int:
+        return self._type_indices[pokemon_type]
+
+    def _build_type_chart(self, type_chart: Dict[str, Dict[str, float]]) -> np.ndarray:
+        """Multipliers of attacking types (rows) on defending types (columns). The unknown type is neutral both ways."""
+        chart = np.ones((len(self.types), len(self.types) + 1))
+        for attacker in self.types:
+            for defender in self.types:
+                if attacker == PokemonType.THREE_QUESTION_MARKS or defender == PokemonType.THREE_QUESTION_MARKS:
+                    continue
+                chart[self.index_of_type(attacker), self.index_of_type(defender)] = type_chart.get(defender.name, {}).get(attacker.name, 1.)
+        return chart
+
+
+class DamageScorer:
+    """
+    Scores all of a turn's moves at once. By default a move's score is its base power times its effectiveness on the
+    opponent's active Pokemon and its same-type attack bonus. With use_stats, the score is the damage of the move by
+    the damage formula (without the random roll, critical hits, abilities or items) from both Pokemon's stats and
+    boosts. The opponent's stats are unknown, so they are assumed from its base stats with a random battle spread.
+    """
+
+    def __init__(self, use_stats: bool = False, gen: int = 9):
+        self.use_stats = use_stats
+        self._gen = gen
+        self._table = MoveTable.for_gen(gen)
+
+    def score(self, battle: Battle, moves: Sequence[Move]) -> np.ndarray:
+        if len(moves) == 0:
+            return np.empty(0)
+        attacker, defender = battle.active_pokemon, battle.opponent_active_pokemon
+        base_power, move_types, categories = self._table.lookup(moves)
+        # the multiplier of every type is computed first, then read for each move
+        stab_by_type = np.ones(len(self._table.types))
+        for pokemon_type in attacker.types:
+            if pokemon_type is not None:
+                stab_by_type[self._table.index_of_type(pokemon_type)] = _STAB
+        # the same types Pokemon.damage_multiplier reads
+        multiplier = (self._table.effectiveness_by_type(defender._type_1, defender._type_2) * stab_by_type)[move_types]
+
+        if not self.use_stats:
+            return base_power * multiplier
+
+        is_physical = categories == _PHYSICAL
+        attack = np.where(is_physical, *self._attacking_stats(attacker))
+        defense = np.where(is_physical, *self._defending_stats(defender))
+        damage = (np.floor(2 * attacker.level / 5) + 2) * base_power * attack / defense / 50 + 2
+        return np.where(base_power > 0, damage * multiplier, 0.)
+
+    def _attacking_stats(self, pokemon: Pokemon) -> Tuple[float, float]:
+        stats = self._stats(pokemon)
+        return (stats['atk'] * _boost_multiplier(pokemon.boosts['atk']),
+                stats['spa'] * _boost_multiplier(pokemon.boosts['spa']))
+
+    def _defending_stats(self, pokemon: Pokemon) -> Tuple[float, float]:
+        stats = self._stats(pokemon)
+        return (stats['def'] * _boost_multiplier(pokemon.boosts['def']),
+                stats['spd'] * _boost_multiplier(pokemon.boosts['spd']))
+
+    def _stats(self, pokemon: Pokemon) -> Dict[str, float]:
+        stats = pokemon.stats
+        if stats is not None and all(stats.get(stat) is not None for stat in ('atk', 'def', 'spa', 'spd')):
+            return stats
+        _, atk, def_, spa, spd, _ = compute_raw_stats(pokemon.species, _ASSUMED_EVS, _ASSUMED_IVS, pokemon.level,
+                                                      _ASSUMED_NATURE, GenData.from_gen(self._gen))
+        return {'atk': atk, 'def': def_, 'spa': spa, 'spd': spd}
+
+
+def _boost_multiplier(boost: int) -> float:
+    return (2 + boost) / 2 if boost >= 0 else 2 / (2 - boost)
@@ -0,0 +1,73 @@
+import asyncio
+import multiprocessing
+import queue
+from multiprocessing.process import BaseProcess
+from typing import List, Dict
+
+from poke_env.player import Player
+from poke_env.data import to_id_str
+
+from .containers import Container
+from .benchmarking import BenchmarkResult, start_listening, tally_results
+
+_READY_POLL_SECONDS = 1.
+
+
+async def play_isolated_baselines(agent: Player, baseline_names: List[str], number_battles: int) -> List[BenchmarkResult]:
+    """
+    Plays number_battles against each baseline like play_baselines, but hosts the baselines in a process of their own,
+    with their own POKE_LOOP, so expensive baselines (e.g., exp_minmax) don't compete with the agent for its thread and
+    skew its timings. Once the baselines are logged in, the process sends their usernames back and the baselines
+    challenge the agent, which accepts them.
+    """
+    await agent.ps_client.wait_for_login()
+
+    # poke-env starts POKE_LOOP's thread on import, which makes forking unsafe
+    context = multiprocessing.get_context('spawn')
+    ready = context.Queue()
+    process = context.Process(target=_host_baselines, name='baselines',
+                              args=(baseline_names, to_id_str(agent.username), number_battles, ready))
+    process.start()
+
+    loop = asyncio.get_running_loop()
+    try:
+        usernames = await loop.run_in_executor(None, _wait_until_ready, ready, process)
+        await agent.accept_challenges(list(usernames.values()), number_battles * len(usernames), None)
+    except BaseException:
+        # the baselines would otherwise wait on challenges that are never accepted
+        process.terminate()
+        raise
+    finally:
+        await loop.run_in_executor(None, process.join)
+
+    return tally_results(agent, usernames)
+
+
+def _wait_until_ready(ready: multiprocessing.Queue, process: BaseProcess,
+                     poll_seconds: float = _READY_POLL_SECONDS) -> Dict[str, str]:
+    """The usernames of the hosted baselines by benchmark name, once they are logged in"""
+    while True:
+        try:
+            return ready.get(timeout=poll_seconds)
+        except queue.Empty:
+            if not process.is_alive():
+                raise RuntimeError(f'The baselines process exited with code {process.exitcode} before logging in')
+
+
+def _host_baselines(baseline_names: List[str], opponent: str, number_battles: int, ready: multiprocessing.Queue):
+    container = Container()
+    container.init_resources()
+    try:
+        benchmark_agents = container.benchmark_agents()
+        baselines = {name: benchmark_agents[name] for name in baseline_names}
+        asyncio.run(_challenge(baselines, opponent, number_battles, ready))
+    finally:
+        container.shutdown_resources()
+
+
+async def _challenge(baselines: Dict[str, Player], opponent: str, number_battles: int, ready: multiprocessing.Queue):
+    await asyncio.gather(*[start_listening(baseline) for baseline in baselines.values()])
+    ready.put({name: baseline.username for name, baseline in baselines.items()})
+    # the baselines challenge the agent concurrently. Each keeps to the one outgoing challenge Showdown allows a user at a
+    # time, since send_challenges waits for each battle to start before sending the next challenge.
+    await asyncio.gather(*[baseline.send_challenges(opponent, number_battles) for baseline in baselines.values()])
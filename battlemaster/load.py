@@ -0,0 +1,139 @@
+import logging
+import random
+import re
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import Optional, Dict, Iterator
+
+_TIME_LEFT_PATTERN = re.compile(r'Time left: (\d+) sec')
+
+
+class LoadMonitor:
+    """
+    A load signal shared by every battle the agent plays: how many mental simulations are in flight, a moving average
+    of how long decisions take and the time left on the turn timer of each battle. When the agent is under pressure,
+    battles that want to try hard are downgraded to autopilot instead of all launching expensive searches together.
+
+    Shedding is gradual: past target_ms, the share of downgraded decisions grows linearly with the average latency until
+    every decision is downgraded at twice target_ms. Battles whose turn timer is below min_time_left seconds and
+    decisions made while max_simulations are already in flight are always downgraded.
+    """
+
+    def __init__(self, target_ms: float, max_simulations: int = 1, min_time_left: int = 20, smoothing: float = 0.2,
+                 rng: Optional[random.Random] = None):
+        if target_ms <= 0:
+            raise ValueError('The target latency must be positive')
+        self.target_ms = target_ms
+        self.max_simulations = max_simulations
+        self.min_time_left = min_time_left
+        self._smoothing = smoothing
+        self._rng = rng if rng is not None else random.Random()
+        self._lock = threading.Lock()
+        self._simulations = 0
+        self._latency_ms: Optional[float] = None
+        self._time_left: Dict[str, int] = {}
+        self._downgrades: Counter = Counter()
+        self._logger = logging.getLogger(f"{__name__}")
+
+    @property
+    def simulations(self) -> int:
+        return self._simulations
+
+    @property
+    def latency_ms(self) -> Optional[float]:
+        """Exponentially weighted moving average of the latency of decisions. None until a decision is recorded."""
+        return self._latency_ms
+
+    @property
+    def downgrades(self) -> Counter:
+        """Number of decisions downgraded to autopilot by reason ('simulations', 'timer' or 'latency')"""
+        with self._lock:
+            return Counter(self._downgrades)
+
+    @contextmanager
+    def simulating(self) -> Iterator[None]:
+        self.simulation_started()
+        try:
+            yield
+        finally:
+            self.simulation_finished()
+
+    def simulation_started(self):
+        with self._lock:
+            self._simulations += 1
+
+    def simulation_finished(self):
+        """Called once a simulation is done, which may be from another thread for simulations running in the background"""
+        with self._lock:
+            self._simulations -= 1
+
+    def record_latency(self, seconds: float):
+        latency_ms = seconds * 1000
+        with self._lock:
+            if self._latency_ms is None:
+                self._latency_ms = latency_ms
+            else:
+                self._latency_ms += self._smoothing * (latency_ms - self._latency_ms)
+
+    def record_time_left(self, battle_tag: str, inactive_message: str):
+        """Reads the time left on the turn timer from a Showdown inactive message (e.g., "Time left: 150 sec this turn")"""
+        match = _TIME_LEFT_PATTERN.search(inactive_message)
+        if match is not None:
+            self._time_left[battle_tag] = int(match.group(1))
+
+    def time_left(self, battle_tag: str) -> Optional[int]:
+        return self._time_left.get(battle_tag)
+
+    def forget_battle(self, battle_tag: str):
+        self._time_left.pop(battle_tag, None)
+
+    def shed_effort(self, battle_tag: str) -> Optional[str]:
+        """
+        Decides whether a battle that wants to try hard has to settle for autopilot and returns why (None if it can try
+        hard). Downgrades are counted.
+        """
+        reason = self._reason_to_shed(battle_tag)
+        if reason is not None:
+            with self._lock:
+                self._downgrades[reason] += 1
+        return reason
+
+    def log_downgrades(self):
+        downgrades = self.downgrades
+        if len(downgrades) == 0:
+            self._logger.info('No decisions were downgraded to autopilot under load')
+            return
+        reasons = ', '.join(f'{reason}: {count}' for reason, count in downgrades.most_common())
+        self._logger.info(f'Downgraded {sum(downgrades.values())} decisions to autopilot under load ({reasons})')
+
+    def _reason_to_shed(self, battle_tag: str) -> Optional[str]:
+        if self._simulations >= self.max_simulations:
+            return 'simulations'
+
+        time_left = self._time_left.get(battle_tag)
+        if time_left is not None and time_left < self.min_time_left:
+            return 'timer'
+
+        latency_ms = self._latency_ms
+        if latency_ms is not None and latency_ms > self.target_ms:
+            overload = (latency_ms - self.target_ms) / self.target_ms
+            if self._rng.random() < overload:
+                return 'latency'
+        return None
+
+
+def init_load_monitor(target_ms: Optional[float], simulation_workers: int = 0) -> Iterator[Optional[LoadMonitor]]:
+    """
+    Resource initializer for the container. Load shedding is disabled when no target latency is given. As many
+    simulations can be in flight as there are workers to run them, or one when they run within the mind's step.
+    """
+    if target_ms is None:
+        yield None
+        return
+
+    monitor = LoadMonitor(target_ms, max_simulations=max(simulation_workers, 1))
+    try:
+        yield monitor
+    finally:
+        monitor.log_downgrades()
@@ -0,0 +1,64 @@
+import copy
+import logging
+import logging.handlers
+import queue
+from typing import List, Optional, TextIO
+
+
+class ShowdownEventFilter(logging.Filter):
+    """
+    Drops INFO/DEBUG records of Showdown messages that contain one of the given events (e.g., '|request|'). The raw
+    message is matched against precomputed line prefixes, so the record is never formatted just to be filtered out.
+    """
+    def __init__(self, events_to_ignore: List[str] = []):
+        super().__init__()
+        self._line_prefixes = tuple(f'|{event}|' for event in events_to_ignore if event)
+        self._inner_line_prefixes = tuple(f'\n{prefix}' for prefix in self._line_prefixes)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARN or not self._line_prefixes:
+            return True
+
+        if isinstance(record.args, tuple) and record.args:
+            return not any(self._is_ignored(argument) for argument in record.args if isinstance(argument, str))
+        return not self._is_ignored(str(record.msg))
+
+    def _is_ignored(self, message: str) -> bool:
+        if message.startswith(self._line_prefixes):
+            return True
+        return any(prefix in message for prefix in self._inner_line_prefixes)
+
+
+class QueuedStreamHandler(logging.handlers.QueueHandler):
+    """
+    A stream handler that hands records to a background thread, which formats and writes them. Logging from POKE_LOOP
+    then only costs rendering the message and a queue put. The message is rendered before the record is queued, since
+    the objects passed as arguments (e.g., a search's state) may be mutated right after they are logged.
+    """
+    def __init__(self, stream: Optional[TextIO] = None):
+        super().__init__(queue.SimpleQueue())
+        self._target = logging.StreamHandler(stream)
+        self._listener = logging.handlers.QueueListener(self.queue, self._target)
+        self._listener.start()
+
+    def setFormatter(self, fmt: Optional[logging.Formatter]):
+        super().setFormatter(fmt)
+        self._target.setFormatter(fmt)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # like QueueHandler.prepare, but the layout of the record is still left to the background thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                formatter = self._target.formatter if self._target.formatter is not None else logging.Formatter()
+                record.exc_text = formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def close(self):
+        if self._listener._thread is not None:
+            self._listener.stop()
+        self._target.close()
+        super().close()
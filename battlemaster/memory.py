@@ -0,0 +1,102 @@
+import logging
+import os
+import resource
+import threading
+import tracemalloc
+from typing import Optional, List, Iterator
+
+_PROC_STATM = '/proc/self/statm'
+_IGNORED_TRACES = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+)
+
+
+def resident_set_size() -> int:
+    """Current RSS of this process in bytes. Falls back to the peak RSS where /proc is unavailable."""
+    try:
+        with open(_PROC_STATM) as statm:
+            resident_pages = int(statm.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if os.uname().sysname == 'Darwin' else max_rss * 1024
+
+
+class MemorySample:
+    def __init__(self, rss: int, top_growth: List[tracemalloc.StatisticDiff]):
+        self.rss = rss
+        self.top_growth = top_growth
+
+
+class MemoryMonitor:
+    """
+    Periodically samples the RSS of the process from a background thread. If tracemalloc_top is greater than 0, also
+    traces allocations and reports the tracemalloc_top source lines whose allocations grew the most since the last
+    sample. Tracing allocations slows the agent down noticeably, so it should only be used to hunt leaks.
+    """
+
+    def __init__(self, interval: float, tracemalloc_top: int = 0):
+        self._interval = interval
+        self._tracemalloc_top = tracemalloc_top
+        self._previous_rss: Optional[int] = None
+        self._previous_snapshot: Optional[tracemalloc.Snapshot] = None
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='memory-monitor', daemon=True)
+        self._logger = logging.getLogger(f"{__name__}")
+
+    def start(self):
+        if self._tracemalloc_top > 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self._log(self.sample())
+        if self._tracemalloc_top > 0:
+            tracemalloc.stop()
+
+    def sample(self) -> MemorySample:
+        return MemorySample(resident_set_size(), self._sample_growth())
+
+    def _sample_growth(self) -> List[tracemalloc.StatisticDiff]:
+        if self._tracemalloc_top <= 0 or not tracemalloc.is_tracing():
+            return []
+
+        snapshot = tracemalloc.take_snapshot().filter_traces(_IGNORED_TRACES)
+        previous_snapshot, self._previous_snapshot = self._previous_snapshot, snapshot
+        if previous_snapshot is None:
+            return []
+        return snapshot.compare_to(previous_snapshot, 'lineno')[:self._tracemalloc_top]
+
+    def _run(self):
+        while not self._stopped.wait(self._interval):
+            self._log(self.sample())
+
+    def _log(self, sample: MemorySample):
+        growth = sample.rss - self._previous_rss if self._previous_rss is not None else 0
+        self._previous_rss = sample.rss
+        self._logger.info(f'RSS {self._to_mib(sample.rss):.1f} MiB ({self._to_mib(growth):+.1f} MiB)')
+        for statistic in sample.top_growth:
+            self._logger.info(f'  {statistic}')
+
+    @staticmethod
+    def _to_mib(size: int) -> float:
+        return size / (1024 * 1024)
+
+
+def init_memory_monitor(interval: Optional[float], tracemalloc_top: int = 0) -> Iterator[Optional[MemoryMonitor]]:
+    """Resource initializer for the container. Monitoring is disabled when no interval is given."""
+    if interval is None:
+        yield None
+        return
+
+    monitor = MemoryMonitor(interval, tracemalloc_top)
+    monitor.start()
+    try:
+        yield monitor
+    finally:
+        monitor.stop()
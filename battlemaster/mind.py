@@ -1,4 +1,5 @@
-from typing import Tuple
+from concurrent.futures import Executor
+from typing import Tuple, Optional
 import re
 
 import pyClarion as cl
@@ -6,7 +7,7 @@ from pyClarion import chunk, feature, buffer, subsystem, chunks
 from pyClarion import nd
 from poke_env import gen_data
 
-from .clarion_ext.attention import NamedStimuli, AttentionFilter
+from .clarion_ext.attention import NamedStimuli, AttentionFilter, CurrentPerception
 from .clarion_ext.pokemon_efficacy import EffectiveMoves, EffectiveSwitches, DefensiveSwitches
 from .clarion_ext.effort import DecideEffort, Effort, EFFORT_INTERFACE
 from .clarion_ext.working_memory import (
@@ -14,19 +15,30 @@ from .clarion_ext.working_memory import (
     MS_OUT_WM_INTERFACE, MsWmSource,
     MCS_OUT_WM_INTERFACE, McsWmSource
 )
-from .clarion_ext.simulation import MentalSimulation
-from .clarion_ext.filters import ReasoningPath, SwitchIfEmpty
+from .clarion_ext.simulation import MentalSimulation, LaunchSimulation, CollectSimulation, PendingSimulation
+from .clarion_ext.filters import ReasoningPath, SwitchIfEmpty, ProfileGate
+from .clarion_ext.execution import ExecutionProfile
+from .clarion_ext.dense import DenseBottomUp, DenseDomain
+from .clarion_ext.knowledge import HiddenInformationLedger
+from .clarion_ext.sampling import BattleRandomStreams, SeededBoltzmannSelector
 from .clarion_ext.motivation import (
     goal, GoalType, StickyBoltzmannSelector,
     drive, DriveStrength, GoalGateAdapter, GOAL_GATE_INTERFACE,
     DoDamageDriveEvaluator, KoOpponentDriveEvaluator, KeepPokemonAliveEvaluator, KeepHealthyEvaluator,
-    ConstantDriveEvaluator, KeepTypeAdvantageDriveEvaluator, RevealHiddenInformationDriveEvaluator
+    ConstantDriveEvaluator, KeepTypeAdvantageDriveEvaluator, RevealHiddenInformationDriveEvaluator, DRIVE_DOMAIN
 )
 from .adapters.clarion_adapter import BattleConcept
 from .adapters.poke_engine_adapter import Simulator
+from .load import LoadMonitor
 
 pokemon_database = gen_data.GenData.from_gen(9)
 
+# Drives that can only be satisfied by using a move, so they have no strength on turns without available moves
+_MOVE_DRIVES = (drive('do_damage'), drive('ko_opponent'))
+_SKIPPED_DRIVES = {
+    ExecutionProfile.FORCE_SWITCH: _MOVE_DRIVES,
+}
+
 
 def _define_goals() -> cl.Chunks:
     goal_chunks = cl.Chunks()
@@ -114,17 +126,45 @@ def _define_pokemon_chunks() -> cl.Chunks:
     return pokemon_chunks
 
 
-def create_agent() -> Tuple[cl.Structure, cl.Construct]:
+def _gate_simulation(simulation: cl.Process) -> ReasoningPath:
+    return ReasoningPath(
+        base=simulation,
+        controllers=[cl.buffer("mcs_effort_gate")],
+        interfaces=[EFFORT_INTERFACE],
+        pidxs=[Effort.TRY_HARD.index])
+
+
+def _gate_move_reasoning(reasoning: cl.Process) -> ProfileGate:
+    # there are no moves to choose from on a force switch
+    return ProfileGate(base=reasoning, stimulus_source=buffer("stimulus"), profiles=[ExecutionProfile.NORMAL])
+
+
+def create_agent(load_monitor: Optional[LoadMonitor] = None, simulation_executor: Optional[Executor] = None,
+                 simulation_timeout: float = 5., simulator: Optional[Simulator] = None, dense_motivation: bool = False,
+                 seed: Optional[int] = None) -> Tuple[cl.Structure, cl.Construct]:
+    """
+    Builds the mind. With a simulation executor, mental simulation runs on the executor, overlapping the rest of the
+    step, and is given up on (i.e., has no activation) after simulation_timeout seconds. Mental simulation searches with
+    the given simulator (e.g., one with a search cache or that only searches the opponent's k strongest options), or
+    with a default Simulator. With dense_motivation, goals are activated from drives as vectors.
+    Goals and actions are sampled from a random stream per battle, which is reproducible with a seed.
+    """
     goal_chunks = _define_goals()
     move_chunks = _define_move_chunks()
     pokemon_chunks = _define_pokemon_chunks()
 
-    agent = cl.Structure(name=cl.agent('btlMaster'))
+    # mental simulation reads the perception groups the stimulus buffer leaves out from here
+    current_perception = CurrentPerception()
+    # what the opponent has revealed, counted by the drive to reveal more and read by mental simulation. The MindAdapter
+    # keeps it up to date from every turn's perception, including turns the mind is skipped on.
+    hidden_information = HiddenInformationLedger()
+    agent = cl.Structure(name=cl.agent('btlMaster'), assets=cl.Assets(hidden_information=hidden_information))
+    random_streams = BattleRandomStreams(seed)
 
     with agent:
         stimulus = cl.Construct(
             name=buffer("stimulus"),
-            process=NamedStimuli()
+            process=NamedStimuli(current_perception)
         )
 
         ms = cl.Structure(
@@ -132,18 +172,18 @@ def create_agent() -> Tuple[cl.Structure, cl.Construct]:
             assets=cl.Assets(
                 goal_chunks=goal_chunks,
                 personality={
-                    drive('keep_pokemon_alive'): KeepPokemonAliveEvaluator().evaluate,
-                    #drive('have_more_pokemon_than_opponent'): ConstantDriveEvaluator(2.5).evaluate,
-                    drive('ko_opponent'): KoOpponentDriveEvaluator().evaluate,
-                    drive('do_damage'): DoDamageDriveEvaluator().evaluate,
-                    drive('keep_healthy'): KeepHealthyEvaluator(0.8).evaluate,
-                    #drive('buff_self'): ConstantDriveEvaluator(1.0).evaluate,
-                    #drive('debuff_opponent'): ConstantDriveEvaluator(1.0).evaluate,
-                    #drive('prevent_opponent_buff'): ConstantDriveEvaluator(2.0).evaluate,
-                    drive('keep_type_advantage'): KeepTypeAdvantageDriveEvaluator().evaluate,
-                    drive('prevent_type_disadvantage'): ConstantDriveEvaluator(2.5).evaluate,
-                    drive('have_super_effective_move_available'): ConstantDriveEvaluator(1.0).evaluate,
-                    drive('reveal_hidden_information'): RevealHiddenInformationDriveEvaluator().evaluate
+                    drive('keep_pokemon_alive'): KeepPokemonAliveEvaluator(),
+                    #drive('have_more_pokemon_than_opponent'): ConstantDriveEvaluator(2.5),
+                    drive('ko_opponent'): KoOpponentDriveEvaluator(),
+                    drive('do_damage'): DoDamageDriveEvaluator(),
+                    drive('keep_healthy'): KeepHealthyEvaluator(0.8),
+                    #drive('buff_self'): ConstantDriveEvaluator(1.0),
+                    #drive('debuff_opponent'): ConstantDriveEvaluator(1.0),
+                    #drive('prevent_opponent_buff'): ConstantDriveEvaluator(2.0),
+                    drive('keep_type_advantage'): KeepTypeAdvantageDriveEvaluator(),
+                    drive('prevent_type_disadvantage'): ConstantDriveEvaluator(2.5),
+                    drive('have_super_effective_move_available'): ConstantDriveEvaluator(1.0),
+                    drive('reveal_hidden_information'): RevealHiddenInformationDriveEvaluator(hidden_information, observe=False)
                 }
             )
         )
@@ -185,7 +225,7 @@ def create_agent() -> Tuple[cl.Structure, cl.Construct]:
             assets=cl.Assets(
                 move_chunks=move_chunks,
                 pokemon_chunks=pokemon_chunks,
-                mental_simulator=Simulator())
+                mental_simulator=simulator if simulator is not None else Simulator())
         )
 
         cl.Construct(
@@ -199,8 +239,11 @@ def create_agent() -> Tuple[cl.Structure, cl.Construct]:
         acs = cl.Structure(name=subsystem("acs"))
 
         with ms:
-            cl.Construct(name=cl.features('drive_strengths'), process=DriveStrength(stimulus_source=buffer("stimulus"), personality_map=ms.assets.personality))
-            cl.Construct(name=cl.flow_bt('goal_activations'), process=cl.BottomUp(source=cl.features('drive_strengths'), chunks=ms.assets.goal_chunks))
+            cl.Construct(name=cl.features('drive_strengths'), process=DriveStrength(stimulus_source=buffer("stimulus"), personality_map=ms.assets.personality, skipped_drives=_SKIPPED_DRIVES))
+            goal_activations = cl.BottomUp(source=cl.features('drive_strengths'), chunks=ms.assets.goal_chunks)
+            if dense_motivation:
+                goal_activations = DenseBottomUp(base=goal_activations, source=cl.features('drive_strengths'), domain=DenseDomain(DRIVE_DOMAIN.features))
+            cl.Construct(name=cl.flow_bt('goal_activations'), process=goal_activations)
             cl.Construct(name=cl.chunks('goals'), process=cl.MaxNodes(sources=[cl.flow_bt('goal_activations')]))
             cl.Construct(name=cl.terminus('drives_out'), process=cl.ThresholdSelector(source=cl.features("drive_strengths"), threshold=0.001))
             cl.Construct(name=cl.terminus('goals_out'), process=cl.ThresholdSelector(source=chunks("goals"), threshold=0.001))
@@ -216,7 +259,7 @@ def create_agent() -> Tuple[cl.Structure, cl.Construct]:
             cl.Construct(name=cl.features('drives_in'), process=cl.MaxNodes(sources=[buffer("wm_ms_out")]))
             cl.Construct(name=cl.chunks('goals_in'), process=cl.MaxNodes(sources=[buffer("wm_ms_out")]))
             #cl.Construct(name=cl.terminus('goal_out'), process=StickyBoltzmannSelector(goal_source=cl.chunks('goals_in'), battle_metadata_source=cl.chunks('battle_metadata_in'), temperature=0.05, threshold=0.5))
-            cl.Construct(name=cl.terminus('goal_out'), process=cl.BoltzmannSelector(source=cl.chunks('goals_in'), temperature=0.05, threshold=0.01))
+            cl.Construct(name=cl.terminus('goal_out'), process=SeededBoltzmannSelector(source=cl.chunks('goals_in'), stimulus_source=buffer("stimulus"), streams=random_streams, temperature=0.05, threshold=0.01))
 
             cl.Construct(name=cl.terminus('wm_write'), process=cl.Constants(nd.NumDict({feature(('wm', ('w', 0)), McsWmSource.GOAL.value): 1.0, feature(("wm", ("r", 0)), "read"): 1.0}, default=0.0)))
 
@@ -227,7 +270,7 @@ def create_agent() -> Tuple[cl.Structure, cl.Construct]:
 
             cl.Construct(name=cl.chunks("self_team_in"), process=AttentionFilter(base=cl.MaxNodes(sources=[buffer("stimulus")]), attend_to=[BattleConcept.TEAM, BattleConcept.ACTIVE_POKEMON]))
             cl.Construct(name=cl.chunks("opponent_team_in"), process=AttentionFilter(base=cl.MaxNodes(sources=[buffer("stimulus")]), attend_to=[BattleConcept.OPPONENT_TEAM, BattleConcept.OPPONENT_ACTIVE_POKEMON]))
-            cl.Construct(name=cl.features('effort'), process=DecideEffort(team_source=cl.chunks('self_team_in'), opponent_team_source=cl.chunks('opponent_team_in')))
+            cl.Construct(name=cl.features('effort'), process=DecideEffort(team_source=cl.chunks('self_team_in'), opponent_team_source=cl.chunks('opponent_team_in'), battle_metadata_source=cl.chunks('battle_metadata_in'), load_monitor=load_monitor))
             cl.Construct(name=cl.features('effort_gate_write'), process=cl.Constants(nd.NumDict({cl.feature(('effort', 'w'), 'clrupd'): 1.0}, default=0.0)))
             cl.Construct(name=cl.features('effort_main'), process=cl.MaxNodes(sources=[cl.features('effort'), cl.features('effort_gate_write')]))
             cl.Construct(name=cl.terminus('effort_gate_control'), process=cl.ActionSelector(source=cl.features('effort_main'), interface=EFFORT_INTERFACE, temperature=0.01))
@@ -236,18 +279,30 @@ def create_agent() -> Tuple[cl.Structure, cl.Construct]:
             cl.Construct(name=cl.chunks('goal_in'), process=cl.MaxNodes(sources=[buffer("wm_mcs_out")]))
 
             cl.Construct(name=cl.chunks("opponent_type_in"), process=AttentionFilter(base=cl.MaxNodes(sources=[buffer("stimulus")]), attend_to=[BattleConcept.ACTIVE_OPPONENT_TYPE]))
-            cl.Construct(name=cl.chunks("available_moves_in"), process=AttentionFilter(base=cl.MaxNodes(sources=[buffer("stimulus")]), attend_to=[BattleConcept.AVAILABLE_MOVES]))
+            cl.Construct(name=cl.chunks("available_moves_in"), process=_gate_move_reasoning(AttentionFilter(base=cl.MaxNodes(sources=[buffer("stimulus")]), attend_to=[BattleConcept.AVAILABLE_MOVES])))
             cl.Construct(name=cl.chunks("available_switches_in"), process=AttentionFilter(base=cl.MaxNodes(sources=[buffer("stimulus")]), attend_to=[BattleConcept.AVAILABLE_SWITCHES]))
-            cl.Construct(name=cl.flow_tt("effective_available_moves"), process=EffectiveMoves(type_source=cl.chunks("opponent_type_in"), move_source=cl.chunks("available_moves_in"), move_chunks=nacs.assets.move_chunks))
+            cl.Construct(name=cl.flow_tt("effective_available_moves"),
+                         process=_gate_move_reasoning(EffectiveMoves(type_source=cl.chunks("opponent_type_in"), move_source=cl.chunks("available_moves_in"), move_chunks=nacs.assets.move_chunks)))
             cl.Construct(name=cl.flow_tt("effective_available_switches"), process=EffectiveSwitches(type_source=cl.chunks("opponent_type_in"), switch_source=cl.chunks("available_switches_in"), pokemon_chunks=nacs.assets.pokemon_chunks))
             cl.Construct(name=cl.flow_tt("defensive_available_switches"), process=DefensiveSwitches(type_source=cl.chunks("opponent_type_in"), switch_source=cl.chunks("available_switches_in"), pokemon_chunks=nacs.assets.pokemon_chunks))
 
+            if simulation_executor is not None:
+                # searches in the background while the rest of the step runs and is collected by generate_and_test. It
+                # launches after the efficacy reasoning, whose options it searches first
+                pending_simulation = PendingSimulation()
+                cl.Construct(name=cl.chunks('launch_generate_and_test'),
+                             process=_gate_simulation(LaunchSimulation(stimulus_source=cl.buffer('stimulus'), goal_source=cl.chunks('goal_in'), simulator=nacs.assets.mental_simulator,
+                                                                       executor=simulation_executor, pending=pending_simulation, timeout=simulation_timeout, load_monitor=load_monitor,
+                                                                       move_priority_sources=[cl.flow_tt("effective_available_moves")],
+                                                                       switch_priority_sources=[cl.flow_tt("effective_available_switches"), cl.flow_tt("defensive_available_switches")],
+                                                                       current_perception=current_perception, ledger=hidden_information)))
+
             cl.Construct(name=cl.flow_tt("moves_that_forward_goal"),
-                         process=ReasoningPath(
+                         process=_gate_move_reasoning(ReasoningPath(
                              base=cl.Repeater(source=cl.flow_tt("effective_available_moves")),
                              controllers=[cl.buffer("mcs_effort_gate"), cl.buffer('mcs_goal_gate')],
                              interfaces=[EFFORT_INTERFACE, GOAL_GATE_INTERFACE],
-                             pidxs=[Effort.AUTOPILOT.index, GoalType.MOVE.index]))
+                             pidxs=[Effort.AUTOPILOT.index, GoalType.MOVE.index])))
             cl.Construct(name=cl.flow_tt("effective_switches_that_forward_goal"),
                          process=ReasoningPath(
                              base=cl.Repeater(source=cl.flow_tt("effective_available_switches")),
@@ -261,12 +316,15 @@ def create_agent() -> Tuple[cl.Structure, cl.Construct]:
                              interfaces=[EFFORT_INTERFACE, GOAL_GATE_INTERFACE],
                              pidxs=[Effort.AUTOPILOT.index, GoalType.SWITCH.index]))
 
-            cl.Construct(name=cl.chunks("generate_and_test"),
-                         process=ReasoningPath(
-                             base=MentalSimulation(stimulus_source=cl.buffer('stimulus'), goal_source=cl.chunks('goal_in'), simulator=nacs.assets.mental_simulator),
-                             controllers=[cl.buffer("mcs_effort_gate")],
-                             interfaces=[EFFORT_INTERFACE],
-                             pidxs=[Effort.TRY_HARD.index]))
+            if simulation_executor is None:
+                # searches the options the efficacy reasoning favors first
+                generate_and_test = MentalSimulation(stimulus_source=cl.buffer('stimulus'), goal_source=cl.chunks('goal_in'), simulator=nacs.assets.mental_simulator, load_monitor=load_monitor,
+                                                     move_priority_sources=[cl.flow_tt("effective_available_moves")],
+                                                     switch_priority_sources=[cl.flow_tt("effective_available_switches"), cl.flow_tt("defensive_available_switches")],
+                                                     current_perception=current_perception, ledger=hidden_information)
+            else:
+                generate_and_test = CollectSimulation(launch_source=cl.chunks('launch_generate_and_test'), stimulus_source=cl.buffer('stimulus'), pending=pending_simulation)
+            cl.Construct(name=cl.chunks("generate_and_test"), process=_gate_simulation(generate_and_test))
 
             cl.Construct(name=cl.chunks("goal_achieving_effective_actions"), process=cl.MaxNodes(sources=[cl.flow_tt("moves_that_forward_goal"), cl.flow_tt("effective_switches_that_forward_goal"), cl.flow_tt("defensive_switches_that_forward_goal"), cl.chunks("generate_and_test")]))
             cl.Construct(name=cl.flow_tt('actions_to_pick_from'), process=SwitchIfEmpty(primary_sources=[cl.chunks("goal_achieving_effective_actions")], alternative_sources=[cl.flow_tt("effective_available_moves"), cl.flow_tt("effective_available_switches"), cl.flow_tt("defensive_available_switches")]))
@@ -277,6 +335,6 @@ def create_agent() -> Tuple[cl.Structure, cl.Construct]:
         with acs:
             cl.Construct(name=cl.chunks('wm_in'), process=cl.MaxNodes(sources=[buffer("wm_nacs_out")]))
             cl.Construct(name=cl.chunks("out"), process=cl.MaxNodes(sources=[cl.chunks("wm_in")]))
-            cl.Construct(name=cl.terminus("choose_move"), process=cl.BoltzmannSelector(source=cl.chunks("out"), temperature=0.2, threshold=0.))
+            cl.Construct(name=cl.terminus("choose_move"), process=SeededBoltzmannSelector(source=cl.chunks("out"), stimulus_source=buffer("stimulus"), streams=random_streams, temperature=0.2, threshold=0.))
 
     return agent, stimulus
@@ -0,0 +1,138 @@
+import gzip
+import json
+import logging
+from collections import defaultdict
+from typing import NamedTuple, Optional, Dict, Tuple, Iterable, Iterator, List, Callable
+
+from poke_env.data import to_id_str
+from poke_env.environment import AbstractBattle, Battle
+from poke_engine.constants import SWITCH_STRING
+
+from .adapters.poke_engine_adapter import Simulator, BattleSimulationAdapter
+
+_FORMAT_VERSION = 1
+
+
+class BookEntry(NamedTuple):
+    """The option to open with (a move id, or the species to switch to) and its payoff against the best reply"""
+    option: str
+    payoff: float
+
+
+class OpeningBook:
+    """
+    Precomputed first decisions, keyed by our lead and the opponent's lead (by species). The first turn of a battle
+    is answered from the book rather than by the mind, which would otherwise search it from scratch in every battle.
+    At team preview, the book leads with the Pokemon whose openings pay off the most against the opponent's team.
+
+    Books are built offline (see build_opening_book) and saved as gzipped JSON, one row per matchup.
+    """
+
+    def __init__(self, entries: Optional[Dict[Tuple[str, str], BookEntry]] = None):
+        self._entries: Dict[Tuple[str, str], BookEntry] = dict(entries or {})
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, lead: str, opponent_lead: str, entry: BookEntry):
+        self._entries[to_id_str(lead), to_id_str(opponent_lead)] = entry
+
+    def get(self, lead: str, opponent_lead: str) -> Optional[BookEntry]:
+        return self._entries.get((to_id_str(lead), to_id_str(opponent_lead)))
+
+    def opening(self, battle: Battle, is_available: Callable[[str], bool] = lambda option: True) -> Optional[str]:
+        """
+        The book's option for the first turn of the battle, if it has one for both leads and the option is available
+        (e.g., the lead may have other moves than the one the book was built with). Only options that are returned
+        count as hits.
+        """
+        if battle.turn > 1 or battle.force_switch or battle.active_pokemon is None or battle.opponent_active_pokemon is None:
+            return None
+        entry = self.get(battle.active_pokemon.species, battle.opponent_active_pokemon.species)
+        if entry is None or not is_available(entry.option):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry.option
+
+    def team_order(self, battle: AbstractBattle) -> Optional[str]:
+        """
+        A team preview order leading with the Pokemon of ours whose openings have the best average payoff against the
+        opponent's team, with the rest of the team in its current order. None when the book has no opening for the team.
+        """
+        team = list(battle.team.values())
+        # until they are revealed, the opponent's team is the one shown at team preview
+        opponents = [pokemon.species for pokemon in battle.opponent_team.values()]
+        best_lead, best_payoff = None, None
+        for index, pokemon in enumerate(team):
+            entries = [entry for entry in (self.get(pokemon.species, opponent) for opponent in opponents) if entry is not None]
+            if not entries:
+                continue
+            payoff = sum(entry.payoff for entry in entries) / len(entries)
+            if best_payoff is None or payoff > best_payoff:
+                best_lead, best_payoff = index, payoff
+
+        if best_lead is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        order = [best_lead] + [index for index in range(len(team)) if index != best_lead]
+        return '/team ' + ''.join(str(index + 1) for index in order)
+
+    def save(self, path: str):
+        rows = [[lead, opponent_lead, entry.option, entry.payoff] for (lead, opponent_lead), entry in self._entries.items()]
+        with gzip.open(path, 'wt', encoding='utf-8') as file:
+            json.dump({'version': _FORMAT_VERSION, 'entries': rows}, file, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, path: str) -> 'OpeningBook':
+        with gzip.open(path, 'rt', encoding='utf-8') as file:
+            content = json.load(file)
+        if content.get('version') != _FORMAT_VERSION:
+            raise ValueError(f'Expected an opening book of version {_FORMAT_VERSION}, but {path} is of version {content.get("version")}')
+        return cls({(lead, opponent_lead): BookEntry(option, payoff) for lead, opponent_lead, option, payoff in content['entries']})
+
+    def log_stats(self):
+        logger = logging.getLogger(f"{__name__}")
+        lookups = self.hits + self.misses
+        logger.info(f'Opening book ({len(self)} matchups): {self.hits} / {lookups} openings and team previews answered from the book')
+
+
+def build_opening_book(battles: Iterable[Battle], simulator: Optional[Simulator] = None) -> OpeningBook:
+    """
+    Searches the first turn of every battle for its safest option. Battles with the same leads but different sets
+    (e.g., other moves or items) can disagree, in which case the option chosen most often is kept, with its average
+    payoff.
+    """
+    simulator = simulator if simulator is not None else Simulator()
+    payoffs: Dict[Tuple[str, str], Dict[str, List[float]]] = defaultdict(lambda: defaultdict(list))
+    for battle in battles:
+        safest = simulator.pick_safest_option(BattleSimulationAdapter.from_battle(battle))
+        if safest is None:
+            continue
+        option, payoff = safest
+        if option.startswith(SWITCH_STRING):
+            option = option.split(SWITCH_STRING)[-1].strip()
+        key = to_id_str(battle.active_pokemon.species), to_id_str(battle.opponent_active_pokemon.species)
+        payoffs[key][option].append(payoff)
+
+    book = OpeningBook()
+    for (lead, opponent_lead), payoffs_by_option in payoffs.items():
+        option, option_payoffs = max(payoffs_by_option.items(), key=lambda item: (len(item[1]), sum(item[1]) / len(item[1])))
+        book.add(lead, opponent_lead, BookEntry(option, sum(option_payoffs) / len(option_payoffs)))
+    return book
+
+
+def init_opening_book(path: Optional[str]) -> Iterator[Optional[OpeningBook]]:
+    """Resource initializer for the container. Battles are opened by the mind when no book is given."""
+    if path is None:
+        yield None
+        return
+
+    book = OpeningBook.load(path)
+    try:
+        yield book
+    finally:
+        book.log_stats()
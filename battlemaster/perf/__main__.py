@@ -0,0 +1,80 @@
+import argparse
+import sys
+from argparse import Namespace
+
+from .results import save_results, load_medians, compare, format_results, format_comparisons
+from .snapshots import load_snapshots, save_snapshot, SNAPSHOT_DIRECTORY
+from .suite import MicroBenchmark
+from .stress import StressTest, format_stress_reports, states_to_save
+from .synthetic import SyntheticBattleGenerator
+from ..opening_book import build_opening_book
+
+
+def _parse_command_line_args() -> Namespace:
+    parser = argparse.ArgumentParser(prog='python -m battlemaster.perf',
+                                     description='Time the stages of a decision on recorded battle snapshots (no server needed)')
+    parser.add_argument("--snapshots", metavar='DIR', default=SNAPSHOT_DIRECTORY, help='Directory of battle snapshots to replay')
+    parser.add_argument("--repeat", type=int, default=20, help='How many times each benchmark is timed per snapshot')
+    parser.add_argument("--output", metavar='PATH', help='Save the results as JSON to this file')
+    parser.add_argument("--baseline", metavar='PATH', help='Compare against results previously saved with --output')
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help='How much slower (e.g., 0.2 for 20%%) than the baseline a benchmark may be before it counts as a regression')
+
+    stress_group = parser.add_argument_group('stress test', 'Run N synthetic states through every stage instead of timing the snapshots')
+    stress_group.add_argument("--synthetic", metavar='N', type=int, help='Generate N random battle states')
+    stress_group.add_argument("--seed", type=int, default=0, help='Seed of the generated states')
+    stress_group.add_argument("--slowest", metavar='K', type=int, default=10, help='Report the K slowest states of every stage')
+    stress_group.add_argument("--save-slow", metavar='DIR', help='Save the slowest and failing states as snapshots to this directory')
+    stress_group.add_argument("--slow-ms", type=float, help='With --save-slow, only save states slower than this')
+
+    book_group = parser.add_argument_group('opening book', 'Search N synthetic first turns (seeded by --seed) and save them as an opening book')
+    book_group.add_argument("--build-opening-book", metavar='PATH', help='Save the opening book to this file')
+    book_group.add_argument("--openings", metavar='N', type=int, default=1000, help='How many first turns to search')
+    return parser.parse_args()
+
+
+def _stress_test(cli_args: Namespace):
+    reports = StressTest(cli_args.slowest).run(SyntheticBattleGenerator(cli_args.seed).generate_many(cli_args.synthetic))
+    print(format_stress_reports(reports))
+
+    if cli_args.save_slow:
+        for snapshot in states_to_save(reports, cli_args.slow_ms).values():
+            save_snapshot(snapshot, cli_args.save_slow)
+
+
+def _build_opening_book(cli_args: Namespace):
+    openings = SyntheticBattleGenerator(cli_args.seed).generate_openings(cli_args.openings)
+    book = build_opening_book(snapshot.to_battle() for snapshot in openings)
+    book.save(cli_args.build_opening_book)
+    print(f'Saved an opening book of {len(book)} matchups to {cli_args.build_opening_book}')
+
+
+if __name__ == "__main__":
+    cli_args = _parse_command_line_args()
+
+    if cli_args.build_opening_book is not None:
+        _build_opening_book(cli_args)
+        sys.exit(0)
+
+    if cli_args.synthetic is not None:
+        _stress_test(cli_args)
+        sys.exit(0)
+
+    micro_benchmark = MicroBenchmark(load_snapshots(cli_args.snapshots), cli_args.repeat)
+    results = micro_benchmark.run()
+    print(format_results(results))
+    if micro_benchmark.skipped:
+        print(f'Skipped snapshots no benchmark applies to: {", ".join(micro_benchmark.skipped)}')
+    print()
+    for ordering, stats in micro_benchmark.search_stats.items():
+        print(f'Safest-move search ({ordering} options): {stats}')
+
+    if cli_args.output:
+        save_results(results, cli_args.output, cli_args.repeat)
+
+    if cli_args.baseline:
+        comparisons = compare(results, load_medians(cli_args.baseline), cli_args.tolerance)
+        print()
+        print(format_comparisons(comparisons))
+        if any(comparison.regressed for comparison in comparisons):
+            sys.exit(1)
@@ -0,0 +1,108 @@
+import json
+import platform
+import statistics
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Iterable
+
+
+class Timing:
+    """Durations (in milliseconds) of repeated calls of one benchmark on one scenario"""
+
+    def __init__(self, samples_ms: List[float]):
+        if len(samples_ms) == 0:
+            raise ValueError('A timing needs at least one sample')
+        self.runs = len(samples_ms)
+        self.median_ms = statistics.median(samples_ms)
+        self.mean_ms = statistics.fmean(samples_ms)
+        self.min_ms = min(samples_ms)
+        self.max_ms = max(samples_ms)
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            'runs': self.runs,
+            'median_ms': self.median_ms,
+            'mean_ms': self.mean_ms,
+            'min_ms': self.min_ms,
+            'max_ms': self.max_ms,
+        }
+
+
+# benchmark -> scenario -> timing
+BenchmarkResults = Dict[str, Dict[str, Timing]]
+
+
+class Comparison:
+    """How the median of a benchmark on a scenario moved relative to the baseline"""
+
+    def __init__(self, benchmark: str, scenario: str, baseline_ms: float, current_ms: float, tolerance: float):
+        self.benchmark = benchmark
+        self.scenario = scenario
+        self.baseline_ms = baseline_ms
+        self.current_ms = current_ms
+        self.tolerance = tolerance
+
+    @property
+    def ratio(self) -> float:
+        return self.current_ms / self.baseline_ms if self.baseline_ms > 0 else 1.
+
+    @property
+    def regressed(self) -> bool:
+        return self.ratio > 1 + self.tolerance
+
+
+def save_results(results: BenchmarkResults, path: str, repeat: int):
+    document = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'repeat': repeat,
+        'results': {benchmark: {scenario: timing.to_json() for scenario, timing in timings.items()}
+                    for benchmark, timings in results.items()},
+    }
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(document, file, indent=2)
+        file.write('\n')
+
+
+def load_medians(path: str) -> Dict[str, Dict[str, float]]:
+    """Loads the median of every benchmark and scenario from results saved with save_results"""
+    with open(path, encoding='utf-8') as file:
+        document = json.load(file)
+    return {benchmark: {scenario: timing['median_ms'] for scenario, timing in timings.items()}
+            for benchmark, timings in document['results'].items()}
+
+
+def compare(results: BenchmarkResults, baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[Comparison]:
+    """
+    Compares the medians of the results against the baseline. A benchmark regressed on a scenario if it is more than
+    tolerance (e.g., 0.2 for 20%) slower. Benchmarks or scenarios missing from either side are not compared.
+    """
+    comparisons = []
+    for benchmark, timings in results.items():
+        for scenario, timing in timings.items():
+            baseline_ms: Optional[float] = baseline.get(benchmark, {}).get(scenario)
+            if baseline_ms is not None:
+                comparisons.append(Comparison(benchmark, scenario, baseline_ms, timing.median_ms, tolerance))
+    return comparisons
+
+
+def format_results(results: BenchmarkResults) -> str:
+    header = ('benchmark', 'scenario', 'runs', 'median ms', 'min ms', 'max ms')
+    rows = [(benchmark, scenario, str(timing.runs), f'{timing.median_ms:.3f}', f'{timing.min_ms:.3f}', f'{timing.max_ms:.3f}')
+            for benchmark, timings in results.items() for scenario, timing in timings.items()]
+    return format_table(header, rows)
+
+
+def format_comparisons(comparisons: Iterable[Comparison]) -> str:
+    header = ('benchmark', 'scenario', 'baseline ms', 'current ms', 'change', '')
+    rows = [(comparison.benchmark, comparison.scenario, f'{comparison.baseline_ms:.3f}', f'{comparison.current_ms:.3f}',
+             f'{comparison.ratio - 1:+.1%}', 'REGRESSED' if comparison.regressed else '')
+            for comparison in comparisons]
+    return format_table(header, rows)
+
+
+def format_table(header: tuple, rows: List[tuple]) -> str:
+    widths = [max(len(row[column]) for row in [header, *rows]) for column in range(len(header))]
+    lines = [' | '.join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip() for row in [header, *rows]]
+    lines.insert(1, '-+-'.join('-' * width for width in widths))
+    return '\n'.join(lines)
@@ -0,0 +1,70 @@
+import json
+import logging
+import os
+from typing import List, Dict, Any
+
+from poke_env.environment import Battle
+from poke_env.player import Player
+
+SNAPSHOT_DIRECTORY = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, 'data', 'snapshots')
+
+
+class BattleSnapshot:
+    """
+    A battle frozen at the moment the agent has to decide, stored as the Showdown protocol messages received so far
+    plus the pending request. Replaying them rebuilds a real Battle without a server.
+    """
+
+    def __init__(self, name: str, description: str, battle_tag: str, username: str, messages: List[str],
+                 request: Dict[str, Any]):
+        self.name = name
+        self.description = description
+        self.battle_tag = battle_tag
+        self.username = username
+        self.messages = messages
+        self.request = request
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> 'BattleSnapshot':
+        return cls(data['name'], data.get('description', ''), data['battle_tag'], data['username'], data['messages'],
+                   data['request'])
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'description': self.description,
+            'battle_tag': self.battle_tag,
+            'username': self.username,
+            'messages': self.messages,
+            'request': self.request,
+        }
+
+    def to_battle(self) -> Battle:
+        battle = Battle(self.battle_tag, self.username, logging.getLogger(f"{__name__}"), gen=9)
+        for message in self.messages:
+            split_message = message.split('|')
+            # the same messages Player keeps from the battle
+            if len(split_message) <= 1 or split_message[1] in Player.MESSAGES_TO_IGNORE:
+                continue
+            battle.parse_message(split_message)
+        battle.parse_request(self.request)
+        return battle
+
+
+def load_snapshots(directory: str = SNAPSHOT_DIRECTORY) -> List[BattleSnapshot]:
+    snapshots = []
+    for file_name in sorted(os.listdir(directory)):
+        if not file_name.endswith('.json'):
+            continue
+        with open(os.path.join(directory, file_name), encoding='utf-8') as file:
+            snapshots.append(BattleSnapshot.from_json(json.load(file)))
+    return snapshots
+
+
+def save_snapshot(snapshot: BattleSnapshot, directory: str = SNAPSHOT_DIRECTORY) -> str:
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{snapshot.name}.json')
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(snapshot.to_json(), file, indent=2, ensure_ascii=False)
+        file.write('\n')
+    return path
@@ -0,0 +1,131 @@
+import heapq
+import logging
+from collections import Counter
+from time import perf_counter
+from typing import Iterable, Dict, List, Callable, Any, Tuple, Optional
+
+from poke_env.environment import Battle
+
+from .. import mind as battle_mind
+from ..adapters.clarion_adapter import MindAdapter, PerceptionFactory
+from ..adapters.poke_engine_adapter import Simulator, BattleSimulationAdapter
+from .results import format_table
+from .snapshots import BattleSnapshot
+
+
+class StageReport:
+    """Throughput of one stage over many states, with the slowest states and the states it failed on"""
+
+    def __init__(self, name: str, slowest: int):
+        self.name = name
+        self.states = 0
+        self.total_seconds = 0.
+        self.errors: Counter = Counter()
+        self.failed: Dict[str, BattleSnapshot] = {}
+        self._slowest = slowest
+        # min-heap of (ms, sequence, snapshot) holding the slowest states seen so far
+        self._heap: List[Tuple[float, int, BattleSnapshot]] = []
+
+    @property
+    def states_per_second(self) -> float:
+        return self.states / self.total_seconds if self.total_seconds > 0 else 0.
+
+    @property
+    def mean_ms(self) -> float:
+        return self.total_seconds * 1000 / self.states if self.states > 0 else 0.
+
+    @property
+    def slowest(self) -> List[Tuple[float, BattleSnapshot]]:
+        return [(ms, snapshot) for ms, _, snapshot in sorted(self._heap, reverse=True)]
+
+    def record(self, snapshot: BattleSnapshot, seconds: float):
+        self.states += 1
+        self.total_seconds += seconds
+        entry = (seconds * 1000, self.states, snapshot)
+        if len(self._heap) < self._slowest:
+            heapq.heappush(self._heap, entry)
+        elif entry > self._heap[0]:
+            heapq.heapreplace(self._heap, entry)
+
+    def record_error(self, snapshot: BattleSnapshot, error: Exception):
+        key = f'{type(error).__name__}: {error}'
+        self.errors[key] += 1
+        self.failed.setdefault(key, snapshot)
+
+
+class StressTest:
+    """
+    Feeds many battle states (e.g., from SyntheticBattleGenerator) through perception, the mind and the poke-engine
+    adapters to measure throughput and find the states that make a stage slow or fail. Stages are independent: a state
+    that breaks one stage is still run through the others.
+    """
+
+    def __init__(self, slowest: int = 10):
+        self._slowest = slowest
+        self._logger = logging.getLogger(f"{__name__}")
+
+    def run(self, snapshots: Iterable[BattleSnapshot]) -> List[StageReport]:
+        factory = PerceptionFactory()
+        simulator = Simulator()
+        # seeded, so every run of the benchmarks samples the same goals and actions
+        agent, stimulus = battle_mind.create_agent(seed=0)
+        mind = MindAdapter(agent, stimulus, factory)
+
+        stages: Dict[str, Callable[[Battle], Any]] = {
+            'perception_factory.map': factory.map,
+            'mind_adapter.perceive': mind.perceive,
+            'simulation_adapter.convert_opponent_pokemon': self._convert_opponent_team,
+            'simulation_adapter.from_battle': BattleSimulationAdapter.from_battle,
+            'simulator.pick_safest_move': lambda battle: simulator.pick_safest_move(BattleSimulationAdapter.from_battle(battle)),
+        }
+        reports = {name: StageReport(name, self._slowest) for name in stages}
+
+        for snapshot in snapshots:
+            battle = snapshot.to_battle()
+            for name, stage in stages.items():
+                start = perf_counter()
+                try:
+                    stage(battle)
+                except Exception as e:
+                    self._logger.debug('%s failed on %s', name, snapshot.name, exc_info=True)
+                    reports[name].record_error(snapshot, e)
+                    continue
+                reports[name].record(snapshot, perf_counter() - start)
+            mind.forget(battle.battle_tag)
+
+        return list(reports.values())
+
+    @staticmethod
+    def _convert_opponent_team(battle: Battle):
+        for pokemon in battle.opponent_team.values():
+            BattleSimulationAdapter._convert_opponent_pokemon(pokemon)
+
+
+def format_stress_reports(reports: Iterable[StageReport]) -> str:
+    reports = list(reports)
+    header = ('stage', 'states', 'errors', 'states/s', 'mean ms', 'slowest ms')
+    rows = [(report.name, str(report.states), str(sum(report.errors.values())), f'{report.states_per_second:.1f}',
+             f'{report.mean_ms:.3f}', f'{report.slowest[0][0]:.3f}' if report.slowest else '-')
+            for report in reports]
+    lines = [format_table(header, rows)]
+
+    for report in reports:
+        if report.slowest:
+            lines.append(f'\nSlowest states for {report.name}:')
+            lines += [f'  {ms:.3f} ms  {snapshot.name}' for ms, snapshot in report.slowest]
+        if report.errors:
+            lines.append(f'\nErrors in {report.name}:')
+            lines += [f'  {count}x {error} (e.g., {report.failed[error].name})' for error, count in report.errors.most_common()]
+    return '\n'.join(lines)
+
+
+def states_to_save(reports: Iterable[StageReport], slow_ms: Optional[float] = None) -> Dict[str, BattleSnapshot]:
+    """The slowest states of every stage (only those over slow_ms, if given) and one failing state per error"""
+    snapshots = {}
+    for report in reports:
+        for ms, snapshot in report.slowest:
+            if slow_ms is None or ms >= slow_ms:
+                snapshots[snapshot.name] = snapshot
+        for snapshot in report.failed.values():
+            snapshots[snapshot.name] = snapshot
+    return snapshots
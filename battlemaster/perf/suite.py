@@ -0,0 +1,118 @@
+from functools import wraps
+from time import perf_counter
+from typing import Callable, List, Dict, Any
+
+from poke_env.environment import Battle
+
+from .. import mind as battle_mind
+from ..agents import BattleMasterPlayer
+from ..adapters.clarion_adapter import MindAdapter, PerceptionFactory
+from ..adapters.poke_engine_adapter import Simulator, BattleSimulationAdapter, SearchStats
+from ..clarion_ext.battle_state import find_processes
+from ..clarion_ext.pokemon_efficacy import EffectiveMoves, EffectiveSwitches, DefensiveSwitches
+from .results import Timing, BenchmarkResults
+from .snapshots import BattleSnapshot
+
+_EFFICACY_PROCESSES = (EffectiveMoves, EffectiveSwitches, DefensiveSwitches)
+
+
+def _has_active_pokemon(battle: Battle) -> bool:
+    return battle.active_pokemon is not None and battle.opponent_active_pokemon is not None
+
+
+class MicroBenchmark:
+    """
+    Times the stages of a decision separately on recorded battle snapshots, without a server. Every benchmark is
+    called repeat times per snapshot after warmup calls that are not timed. The efficacy processes are timed while
+    they run as part of the mind's step, since they need the mind to feed them their inputs. Team preview snapshots
+    are timed through the player's teampreview, which is what answers them; snapshots no benchmark applies to are
+    listed in skipped.
+    """
+
+    def __init__(self, snapshots: List[BattleSnapshot], repeat: int = 20, warmup: int = 2):
+        self._snapshots = snapshots
+        self._repeat = repeat
+        self._warmup = warmup
+        # how well the safest-move searches were pruned, with and without ordering the options
+        self.search_stats: Dict[str, SearchStats] = {}
+        self.skipped: List[str] = []
+
+    def run(self) -> BenchmarkResults:
+        factory = PerceptionFactory()
+        simulator = Simulator()
+        unordered_simulator = Simulator(order_options=False)
+        self.search_stats = {'ordered': simulator.stats, 'unordered': unordered_simulator.stats}
+        # seeded, so every run of the benchmarks samples the same goals and actions
+        agent, stimulus = battle_mind.create_agent(seed=0)
+        mind = MindAdapter(agent, stimulus, factory)
+        player = BattleMasterPlayer(mind, start_listening=False)
+        efficacy_samples = self._instrument_efficacy(agent)
+
+        field_benchmarks: Dict[str, Callable[[Battle], Any]] = {
+            'perception_factory.map': factory.map,
+            'mind_adapter.perceive': mind.perceive,
+            'simulation_adapter.from_battle': BattleSimulationAdapter.from_battle,
+            'simulator.pick_safest_move': lambda battle: simulator.pick_safest_move(BattleSimulationAdapter.from_battle(battle)),
+            'simulator.pick_safest_move.unordered': lambda battle: unordered_simulator.pick_safest_move(BattleSimulationAdapter.from_battle(battle)),
+        }
+        team_preview_benchmarks: Dict[str, Callable[[Battle], Any]] = {
+            'player.teampreview': player.teampreview,
+        }
+
+        results: BenchmarkResults = {name: {} for name in [*field_benchmarks, *team_preview_benchmarks]}
+        self.skipped = []
+        for snapshot in self._snapshots:
+            battle = snapshot.to_battle()
+            if battle.teampreview:
+                benchmarks = team_preview_benchmarks
+            elif _has_active_pokemon(battle):
+                benchmarks = field_benchmarks
+            else:
+                self.skipped.append(snapshot.name)
+                continue
+            for name, benchmark in benchmarks.items():
+                for samples in efficacy_samples.values():
+                    samples.clear()
+                results[name][snapshot.name] = Timing(self._time(benchmark, battle))
+                if name == 'mind_adapter.perceive':
+                    self._collect_efficacy(efficacy_samples, snapshot.name, results)
+
+        return results
+
+    def _time(self, benchmark: Callable[[Battle], Any], battle: Battle) -> List[float]:
+        for _ in range(self._warmup):
+            benchmark(battle)
+
+        samples = []
+        for _ in range(self._repeat):
+            start = perf_counter()
+            benchmark(battle)
+            samples.append((perf_counter() - start) * 1000)
+        return samples
+
+    def _collect_efficacy(self, efficacy_samples: Dict[str, List[float]], scenario: str, results: BenchmarkResults):
+        for name, samples in efficacy_samples.items():
+            # drop the calls made during warmup
+            timed_samples = samples[-self._repeat:]
+            if len(timed_samples) > 0:
+                results.setdefault(name, {})[scenario] = Timing(timed_samples)
+
+    @classmethod
+    def _instrument_efficacy(cls, agent) -> Dict[str, List[float]]:
+        efficacy_samples: Dict[str, List[float]] = {}
+        for process in find_processes(agent, _EFFICACY_PROCESSES):
+            samples = efficacy_samples.setdefault(f'pokemon_efficacy.{type(process).__name__}', [])
+            process.call = cls._timed(process.call, samples)
+        return efficacy_samples
+
+    @staticmethod
+    def _timed(call: Callable, samples: List[float]) -> Callable:
+        @wraps(call)
+        def timed_call(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return call(*args, **kwargs)
+            finally:
+                samples.append((perf_counter() - start) * 1000)
+        return timed_call
+
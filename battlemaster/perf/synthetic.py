@@ -0,0 +1,251 @@
+import random
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+
+from poke_env.data import GenData, to_id_str
+
+from .snapshots import BattleSnapshot
+
+_USERNAME = 'BattleMaster'
+_OPPONENT_USERNAME = 'Opponent'
+_TEAM_SIZE = 6
+_EXCLUDED_FORMES = ('Mega', 'Gmax', 'Totem', 'Primal')
+_ITEMS = ['leftovers', 'lifeorb', 'choicescarf', 'choicespecs', 'choiceband', 'heavydutyboots', 'focussash',
+          'assaultvest', 'rockyhelmet', 'sitrusberry', 'boosterenergy', 'expertbelt']
+_TYPES = ['Normal', 'Fire', 'Water', 'Electric', 'Grass', 'Ice', 'Fighting', 'Poison', 'Ground', 'Flying', 'Psychic',
+          'Bug', 'Rock', 'Ghost', 'Dragon', 'Dark', 'Steel', 'Fairy']
+_STATUSES = ['brn', 'par', 'psn', 'tox', 'slp', 'frz']
+_BOOSTABLE_STATS = ['atk', 'def', 'spa', 'spd', 'spe', 'accuracy', 'evasion']
+_SIDE_CONDITIONS = ['move: Stealth Rock', 'Spikes', 'move: Toxic Spikes', 'move: Sticky Web', 'Reflect',
+                    'move: Light Screen', 'move: Aurora Veil', 'move: Tailwind']
+_WEATHERS = ['RainDance', 'SunnyDay', 'Sandstorm', 'Snow']
+_FIELDS = ['move: Electric Terrain', 'move: Grassy Terrain', 'move: Psychic Terrain', 'move: Misty Terrain',
+           'move: Trick Room']
+
+
+class _Pokemon:
+    def __init__(self, species: Dict[str, Any], level: int, gender: Optional[str], moves: List[str], ability: str,
+                 item: str, tera_type: str):
+        self.name = species['name']
+        self.species = species
+        self.level = level
+        self.gender = gender
+        self.moves = moves
+        self.ability = ability
+        self.item = item
+        self.tera_type = tera_type
+        self.max_hp = self._hp_stat(species['baseStats']['hp'], level)
+        self.stats = {stat: self._stat(species['baseStats'][stat], level) for stat in ('atk', 'def', 'spa', 'spd', 'spe')}
+
+    @property
+    def details(self) -> str:
+        return f'{self.name}, L{self.level}' + (f', {self.gender}' if self.gender else '')
+
+    def ident(self, player: str, active: bool = False) -> str:
+        return f'{player}{"a" if active else ""}: {self.name}'
+
+    # 31 IVs and 84 EVs in every stat with a neutral nature, like random battles
+    @staticmethod
+    def _hp_stat(base: int, level: int) -> int:
+        return (2 * base + 31 + 21) * level // 100 + level + 10
+
+    @staticmethod
+    def _stat(base: int, level: int) -> int:
+        return (2 * base + 31 + 21) * level // 100 + 5
+
+
+class SyntheticBattleGenerator:
+    """
+    Builds random but valid battle snapshots from GenData: random species and movesets on both sides, with random HP,
+    statuses, boosts, side conditions, weather and terrain. A snapshot is fully determined by the seed and its index,
+    so a state that turns out to be slow or to break something can be regenerated or saved to the snapshot corpus.
+    """
+
+    def __init__(self, seed: int = 0, gen_data: Optional[GenData] = None):
+        self._seed = seed
+        self._gen_data = gen_data if gen_data is not None else GenData.from_gen(9)
+        # cosmetic formes (e.g., every Vivillon pattern) share their name, which identifies a Pokemon in battle
+        species_by_name: Dict[str, Tuple[Dict[str, Any], List[str]]] = {}
+        for species_id, species in self._gen_data.pokedex.items():
+            if species['name'] in species_by_name or not self._is_playable(species):
+                continue
+            moves = self._learnable_moves(species_id, species)
+            if len(moves) >= 4:
+                species_by_name[species['name']] = (species, moves)
+        self._species = list(species_by_name.values())
+
+    def generate_many(self, count: int) -> Iterator[BattleSnapshot]:
+        for index in range(count):
+            yield self.generate(index)
+
+    def generate(self, index: int) -> BattleSnapshot:
+        rng = random.Random(f'{self._seed}:{index}')
+        battle_tag = f'battle-gen9randombattle-synthetic-{self._seed}-{index}'
+
+        team = self._random_team(rng, _TEAM_SIZE)
+        opponents = self._random_team(rng, rng.randint(1, _TEAM_SIZE))
+        turn = len(opponents) + rng.randint(0, 20)
+
+        force_switch = rng.random() < 0.15
+        team_hp = [0 if rng.random() < 0.3 else rng.randint(1, pokemon.max_hp) for pokemon in team]
+        team_hp[0] = 0 if force_switch else rng.randint(1, team[0].max_hp)
+        team_statuses = [rng.choice(_STATUSES) if rng.random() < 0.2 and hp > 0 else '' for hp in team_hp]
+
+        messages = self._header()
+        messages += self._opponent_switches(rng, opponents)
+        messages += self._active_pokemon(rng, team[0], team_hp[0], team_statuses[0], opponents[-1])
+        messages += self._field(rng, turn)
+        messages += ['|upkeep', f'|turn|{turn}']
+
+        request = self._request(rng, team, team_hp, team_statuses, force_switch)
+        return BattleSnapshot(f'synthetic-{self._seed}-{index}', f'Synthetic state {index} generated with seed {self._seed}',
+                              battle_tag, _USERNAME, messages, request)
+
+    def generate_openings(self, count: int) -> Iterator[BattleSnapshot]:
+        for index in range(count):
+            yield self.generate_opening(index)
+
+    def generate_opening(self, index: int) -> BattleSnapshot:
+        """The first turn of a battle: both leads are out at full HP with full PP on an empty field"""
+        rng = random.Random(f'{self._seed}:opening:{index}')
+        battle_tag = f'battle-gen9randombattle-synthetic-opening-{self._seed}-{index}'
+
+        team = self._random_team(rng, _TEAM_SIZE)
+        lead, opponent = team[0], self._random_team(rng, 1)[0]
+
+        messages = self._header()
+        messages += [f'|switch|{lead.ident("p1", active=True)}|{lead.details}|{lead.max_hp}/{lead.max_hp}',
+                     f'|switch|{opponent.ident("p2", active=True)}|{opponent.details}|100/100',
+                     '|turn|1']
+
+        request = self._request(rng, team, [pokemon.max_hp for pokemon in team], [''] * _TEAM_SIZE, force_switch=False)
+        for move in request['active'][0]['moves']:
+            move['pp'] = move['maxpp']
+        return BattleSnapshot(f'synthetic-opening-{self._seed}-{index}',
+                              f'Synthetic opening {index} generated with seed {self._seed}',
+                              battle_tag, _USERNAME, messages, request)
+
+    @staticmethod
+    def _is_playable(species: Dict[str, Any]) -> bool:
+        forme = species.get('forme') or ''
+        return (species.get('num', 0) > 0 and not species.get('battleOnly')
+                and not forme.startswith(_EXCLUDED_FORMES) and ':' not in species['name'])
+
+    def _learnable_moves(self, species_id: str, species: Dict[str, Any]) -> List[str]:
+        learnset = self._gen_data.learnset.get(species_id) or self._gen_data.learnset.get(species.get('baseSpecies', ''), {})
+        return [move for move in learnset.get('learnset', {})
+                if move in self._gen_data.moves and self._is_usable_move(self._gen_data.moves[move])]
+
+    @staticmethod
+    def _is_usable_move(move: Dict[str, Any]) -> bool:
+        return move.get('isNonstandard') is None and not move.get('isZ') and not move.get('isMax')
+
+    def _random_team(self, rng: random.Random, size: int) -> List[_Pokemon]:
+        # species clause: no species twice on the same side
+        return [self._random_pokemon(rng, species, learnable_moves) for species, learnable_moves in rng.sample(self._species, size)]
+
+    @staticmethod
+    def _random_pokemon(rng: random.Random, species: Dict[str, Any], learnable_moves: List[str]) -> _Pokemon:
+        gender = species.get('gender') or rng.choice(['M', 'F'])
+        return _Pokemon(species, level=rng.randint(70, 95), gender=None if gender == 'N' else gender,
+                        moves=rng.sample(learnable_moves, 4),
+                        ability=to_id_str(rng.choice(list(species['abilities'].values()))),
+                        item=rng.choice(_ITEMS), tera_type=rng.choice(_TYPES))
+
+    @staticmethod
+    def _header() -> List[str]:
+        return [
+            '|init|battle',
+            f'|player|p1|{_USERNAME}|1|',
+            f'|player|p2|{_OPPONENT_USERNAME}|2|',
+            f'|teamsize|p1|{_TEAM_SIZE}',
+            f'|teamsize|p2|{_TEAM_SIZE}',
+            '|gen|9',
+            '|tier|[Gen 9] Random Battle',
+            '|start',
+        ]
+
+    @staticmethod
+    def _opponent_switches(rng: random.Random, opponents: List[_Pokemon]) -> List[str]:
+        messages = []
+        for turn, pokemon in enumerate(opponents, start=1):
+            ident = pokemon.ident('p2', active=True)
+            messages.append(f'|switch|{ident}|{pokemon.details}|100/100')
+            if pokemon is opponents[-1]:
+                hp = rng.randint(1, 100)
+                messages.append(f'|-damage|{ident}|{hp}/100')
+                if rng.random() < 0.25:
+                    messages.append(f'|-status|{ident}|{rng.choice(_STATUSES)}')
+                messages += SyntheticBattleGenerator._boosts(rng, ident)
+            else:
+                # the opponent's Pokemon revealed earlier fainted or were switched out
+                if rng.random() < 0.5:
+                    messages.append(f'|faint|{ident}')
+                messages.append(f'|turn|{turn}')
+        return messages
+
+    @classmethod
+    def _active_pokemon(cls, rng: random.Random, pokemon: _Pokemon, hp: int, status: str, opponent: _Pokemon) -> List[str]:
+        ident = pokemon.ident('p1', active=True)
+        messages = [f'|switch|{ident}|{pokemon.details}|{pokemon.max_hp}/{pokemon.max_hp}']
+        if hp == 0:
+            messages += [f'|move|{opponent.ident("p2", active=True)}|Tackle|{ident}', f'|-damage|{ident}|0 fnt', f'|faint|{ident}']
+            return messages
+
+        messages.append(f'|-damage|{ident}|{hp}/{pokemon.max_hp}')
+        if status:
+            messages.append(f'|-status|{ident}|{status}')
+        messages += cls._boosts(rng, ident)
+        return messages
+
+    @staticmethod
+    def _boosts(rng: random.Random, ident: str) -> List[str]:
+        messages = []
+        for stat in rng.sample(_BOOSTABLE_STATS, rng.randint(0, 2)):
+            stages = rng.choice([-2, -1, 1, 2, 6])
+            messages.append(f'|{"-boost" if stages > 0 else "-unboost"}|{ident}|{stat}|{abs(stages)}')
+        return messages
+
+    @staticmethod
+    def _field(rng: random.Random, turn: int) -> List[str]:
+        messages = []
+        for side, username in (('p1', _USERNAME), ('p2', _OPPONENT_USERNAME)):
+            for condition in rng.sample(_SIDE_CONDITIONS, rng.randint(0, 3)):
+                layers = rng.randint(1, 3) if condition == 'Spikes' else 1
+                messages += [f'|-sidestart|{side}: {username}|{condition}'] * layers
+        if rng.random() < 0.3:
+            messages.append(f'|-weather|{rng.choice(_WEATHERS)}')
+        if rng.random() < 0.3:
+            messages.append(f'|-fieldstart|{rng.choice(_FIELDS)}')
+        return messages
+
+    def _request(self, rng: random.Random, team: List[_Pokemon], team_hp: List[int], team_statuses: List[str],
+                 force_switch: bool) -> Dict[str, Any]:
+        side = {
+            'name': _USERNAME,
+            'id': 'p1',
+            'pokemon': [self._side_pokemon(pokemon, hp, status, active=index == 0)
+                        for index, (pokemon, hp, status) in enumerate(zip(team, team_hp, team_statuses))],
+        }
+        if force_switch:
+            return {'forceSwitch': [True], 'side': side, 'noCancel': True, 'rqid': rng.randint(1, 100)}
+
+        active = {'moves': [self._request_move(rng, move) for move in team[0].moves]}
+        if rng.random() < 0.5:
+            active['canTerastallize'] = team[0].tera_type
+        return {'active': [active], 'side': side, 'rqid': rng.randint(1, 100)}
+
+    @staticmethod
+    def _side_pokemon(pokemon: _Pokemon, hp: int, status: str, active: bool) -> Dict[str, Any]:
+        condition = '0 fnt' if hp == 0 else f'{hp}/{pokemon.max_hp}' + (f' {status}' if status else '')
+        return {
+            'ident': pokemon.ident('p1'), 'details': pokemon.details, 'condition': condition, 'active': active,
+            'stats': pokemon.stats, 'moves': pokemon.moves, 'baseAbility': pokemon.ability, 'item': pokemon.item,
+            'pokeball': 'pokeball', 'ability': pokemon.ability, 'commanding': False, 'reviving': False,
+            'teraType': pokemon.tera_type, 'terastallized': '',
+        }
+
+    def _request_move(self, rng: random.Random, move_id: str) -> Dict[str, Any]:
+        move = self._gen_data.moves[move_id]
+        max_pp = move['pp'] * 8 // 5 if not move.get('noPPBoosts') else move['pp']
+        return {'move': move['name'], 'id': move_id, 'pp': rng.randint(1, max_pp), 'maxpp': max_pp,
+                'target': move['target'], 'disabled': False}
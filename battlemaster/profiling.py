@@ -0,0 +1,112 @@
+import asyncio
+import cProfile
+import logging
+import os
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from types import FrameType
+from typing import Optional, Iterator
+
+from poke_env.concurrency import POKE_LOOP
+
+
+class StackSampler:
+    """
+    Samples the call stack of a thread at a fixed interval and counts identical stacks. The counts are written in the
+    collapsed format ("outer;inner;leaf count") that flamegraph.pl, speedscope and similar tools read.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self._thread_id = thread_id
+        self._interval = interval
+        self._stacks: Counter = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    @property
+    def stacks(self) -> Counter:
+        return self._stacks
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def sample(self):
+        frame = sys._current_frames().get(self._thread_id)
+        if frame is not None:
+            self._stacks[self._collapse(frame)] += 1
+
+    def write_collapsed(self, path: str):
+        with open(path, 'w', encoding='utf-8') as file:
+            for stack, count in self._stacks.most_common():
+                file.write(f'{stack} {count}\n')
+
+    def _run(self):
+        while not self._stopped.wait(self._interval):
+            self.sample()
+
+    @staticmethod
+    def _collapse(frame: Optional[FrameType]) -> str:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+            frame = frame.f_back
+        return ';'.join(reversed(stack))
+
+
+class LoopProfiler:
+    """
+    Profiles the thread of an event loop rather than the calling thread. poke-env runs every battle (and so
+    choose_move and the whole mind) on POKE_LOOP's thread while the main thread only waits, so a profiler started on
+    the main thread sees none of the agent's cost. cProfile only profiles the thread that enables it, which is why it
+    is enabled from within the loop.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop = POKE_LOOP, sample_interval: float = 0.005):
+        self._loop = loop
+        self._sample_interval = sample_interval
+        self._profile = cProfile.Profile()
+        self._sampler: Optional[StackSampler] = None
+
+    def start(self):
+        thread_id = asyncio.run_coroutine_threadsafe(self._enable(), self._loop).result()
+        self._sampler = StackSampler(thread_id, self._sample_interval)
+        self._sampler.start()
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self._disable(), self._loop).result()
+        self._sampler.stop()
+
+    def dump(self, path_prefix: str):
+        """Writes <path_prefix>.pstats (for pstats/snakeviz) and <path_prefix>.collapsed (for flame graphs)"""
+        self._profile.dump_stats(f'{path_prefix}.pstats')
+        self._sampler.write_collapsed(f'{path_prefix}.collapsed')
+
+    async def _enable(self) -> int:
+        self._profile.enable()
+        return threading.get_ident()
+
+    async def _disable(self):
+        self._profile.disable()
+
+
+@contextmanager
+def profile_loop(output_dir: str, run_name: str, loop: asyncio.AbstractEventLoop = POKE_LOOP) -> Iterator[LoopProfiler]:
+    os.makedirs(output_dir, exist_ok=True)
+    path_prefix = os.path.join(output_dir, f'{run_name}-{datetime.now().strftime("%Y%m%d-%H%M%S")}')
+
+    profiler = LoopProfiler(loop)
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        profiler.dump(path_prefix)
+        logging.getLogger(f"{__name__}").info(f'Wrote profile to {path_prefix}.pstats and {path_prefix}.collapsed')
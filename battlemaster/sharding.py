@@ -0,0 +1,73 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from contextlib import nullcontext
+from typing import List, Dict, Optional, Any
+
+from dependency_injector import providers
+from dependency_injector.wiring import Provide, inject
+from poke_env.player import Player
+
+from .containers import Container
+from .benchmarking import BenchmarkResult, play_baselines, merge_results, split_battles
+from .profiling import profile_loop
+
+
+def run_sharded_benchmark(number_battles: int, baseline_names: List[str], workers: int,
+                          trace_path: Optional[str] = None, profile_dir: Optional[str] = None,
+                          overrides: Optional[Dict[str, Any]] = None) -> List[BenchmarkResult]:
+    """
+    Splits the benchmark among worker processes, each with its own mind, Showdown users and POKE_LOOP, so throughput
+    scales with cores instead of being bound to one by the GIL. Results of every worker are merged into one report.
+    When tracing, every worker writes its spans to its own file (e.g., spans.jsonl becomes spans-0.jsonl, ...). When
+    profiling, every worker writes its own profile (benchmark-shard0-*, ...) to profile_dir. overrides maps names of
+    container providers to the values every worker's container should use (e.g., {'decision_cache_size': 512}).
+    """
+    logger = logging.getLogger(f"{__name__}")
+    shard_sizes = split_battles(number_battles, workers)
+    logger.info(f"Splitting {number_battles} battles among {len(shard_sizes)} workers: {shard_sizes}")
+
+    # poke-env starts POKE_LOOP's thread on import, which makes forking unsafe
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(len(shard_sizes)) as pool:
+        shard_results = pool.starmap(_run_shard, [(shard, size, baseline_names, _shard_path(trace_path, shard), profile_dir, overrides)
+                                                  for shard, size in enumerate(shard_sizes)])
+
+    return merge_results(shard_results)
+
+
+def _shard_path(path: Optional[str], shard: int) -> Optional[str]:
+    if path is None:
+        return None
+    root, extension = os.path.splitext(path)
+    return f'{root}-{shard}{extension}'
+
+
+def _run_shard(shard: int, number_battles: int, baseline_names: List[str], trace_path: Optional[str],
+               profile_dir: Optional[str] = None, overrides: Optional[Dict[str, Any]] = None) -> List[BenchmarkResult]:
+    container = Container()
+    container.shard.override(providers.Object(shard))
+    container.trace_path.override(providers.Object(trace_path))
+    for name, value in (overrides or {}).items():
+        getattr(container, name).override(providers.Object(value))
+    container.init_resources()
+    container.wire(modules=[__name__])
+
+    profiling = profile_loop(profile_dir, f'benchmark-shard{shard}') if profile_dir else nullcontext()
+    try:
+        with profiling:
+            return asyncio.run(_play_shard(number_battles, baseline_names))
+    finally:
+        container.unwire()
+        container.shutdown_resources()
+
+
+@inject
+async def _play_shard(number_battles: int, baseline_names: List[str],
+                      agent: Player = Provide[Container.player],
+                      benchmark_agents: Dict[str, Player] = Provide[Container.benchmark_agents]) -> List[BenchmarkResult]:
+    logger = logging.getLogger(f"{__name__}")
+    logger.info(f"Worker {agent.username} is playing {number_battles} battles against {', '.join(baseline_names)}")
+    baselines = {name: benchmark_agents[name] for name in baseline_names}
+    return await play_baselines(agent, baselines, number_battles)
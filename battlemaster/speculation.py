@@ -0,0 +1,94 @@
+import logging
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Dict, Mapping, Optional, Iterator
+
+from poke_env.environment import Move, Pokemon
+from poke_env.player import BattleOrder
+from poke_engine.constants import SWITCH_STRING
+from pyClarion import nd
+
+from .adapters.clarion_adapter import BattleConcept
+from .adapters.poke_engine_adapter import Simulator, BattleStimulusAdapter
+from .adapters.search_cache import SearchCache
+from .clarion_ext.knowledge import SpeciesKnowledge
+
+
+class Speculator:
+    """
+    Uses the time the opponent spends thinking: once an order is sent, the positions most likely to follow it are
+    searched in the background and added to the search cache, so the mind's mental simulation next turn can be served
+    from it. The position is read from the perception like mental simulation reads it, with what the opponent has
+    revealed so far, so the positions speculated from it are keyed like the one perceived next turn. Only the latest speculation of a battle is kept queued; a battle's queued speculation is dropped once its
+    next decision starts.
+    """
+
+    def __init__(self, simulator: Simulator, cache: SearchCache, executor: Executor):
+        self._simulator = simulator
+        self._cache = cache
+        self._executor = executor
+        self._pending: Dict[str, Future] = {}
+        self.speculations = 0
+        self._logger = logging.getLogger(f"{__name__}")
+
+    def speculate(self, battle_tag: str, perception: Mapping[BattleConcept, nd.NumDict], order: BattleOrder,
+                  opponent_knowledge: Optional[Mapping[str, SpeciesKnowledge]] = None):
+        option = self._to_option(order)
+        if option is None:
+            return
+
+        self.cancel(battle_tag)
+        # converted right away, since the perception is only valid until the battle's next message
+        simulation = BattleStimulusAdapter.from_stimulus(perception, opponent_knowledge)
+        future = self._executor.submit(self._simulator.speculate, simulation, option)
+        future.add_done_callback(self._add_to_cache)
+        self._pending[battle_tag] = future
+        self.speculations += 1
+
+    def cancel(self, battle_tag: str):
+        """Drops the battle's speculation if it hasn't started yet. A running speculation still fills the cache."""
+        future = self._pending.pop(battle_tag, None)
+        if future is not None:
+            future.cancel()
+
+    def log_stats(self):
+        lookups = self._cache.hits + self._cache.misses
+        hit_rate = self._cache.hits / lookups if lookups > 0 else 0.
+        self._logger.info(f'Speculated {self.speculations} times. The search cache served {self._cache.hits} / {lookups} '
+                          f'searches ({hit_rate:.1%}) and holds {len(self._cache)} positions')
+
+    def _add_to_cache(self, future: Future):
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            self._logger.debug('Speculative search failed', exc_info=error)
+            return
+        self._cache.update(future.result())
+
+    @staticmethod
+    def _to_option(order: BattleOrder) -> Optional[str]:
+        if isinstance(order.order, Move):
+            return order.order.id
+        if isinstance(order.order, Pokemon):
+            return f'{SWITCH_STRING} {order.order.species}'
+        return None
+
+
+def init_speculator(cache: Optional[SearchCache], simulator: Simulator) -> Iterator[Optional[Speculator]]:
+    """
+    Resource initializer for the container. Speculation is disabled without a search cache. Speculative searches run
+    on a single background thread, which mostly has the CPU to itself while the agent waits for its opponents. The
+    simulator should be the one mental simulation searches with, so speculated positions are searched (and cached)
+    with the same options.
+    """
+    if cache is None:
+        yield None
+        return
+
+    executor = ThreadPoolExecutor(1, thread_name_prefix='speculation')
+    speculator = Speculator(simulator, cache, executor)
+    try:
+        yield speculator
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        speculator.log_stats()
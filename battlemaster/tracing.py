@@ -0,0 +1,156 @@
+import json
+import logging
+import queue
+import threading
+from functools import wraps
+from time import perf_counter, time
+from typing import Dict, Optional, Any, Callable, TextIO, Iterator
+
+
+class TurnSpan:
+    """Timings and outcome of a single decision (one call to choose_move)"""
+
+    def __init__(self, battle_tag: str, turn: int):
+        self.battle_tag = battle_tag
+        self.turn = turn
+        self.started_at = time()
+        self.perceive_ms: Optional[float] = None
+        self.step_ms: Dict[str, float] = {}
+        self.goal: Optional[str] = None
+        self.effort: Optional[str] = None
+        self.action: Optional[str] = None
+        self.order: Optional[str] = None
+        self.fallback = False
+        self.cached = False
+        self.fast_path = False
+        self.book = False
+        self.total_ms: Optional[float] = None
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            'battle_tag': self.battle_tag,
+            'turn': self.turn,
+            'started_at': self.started_at,
+            'total_ms': self.total_ms,
+            'perceive_ms': self.perceive_ms,
+            'step_ms': self.step_ms,
+            'goal': self.goal,
+            'effort': self.effort,
+            'action': self.action,
+            'order': self.order,
+            'fallback': self.fallback,
+            'cached': self.cached,
+            'fast_path': self.fast_path,
+            'book': self.book,
+        }
+
+
+class SpanWriter:
+    """
+    Writes spans as JSON lines from a background thread so that serialization and file IO stay off of POKE_LOOP. Lines
+    are flushed once buffer_size spans are pending or every flush_interval seconds, whichever comes first.
+    """
+    _CLOSE = object()
+
+    def __init__(self, path: str, buffer_size: int = 64, flush_interval: float = 1.0):
+        self._path = path
+        self._buffer_size = buffer_size
+        self._flush_interval = flush_interval
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name='span-writer', daemon=True)
+        self._thread.start()
+
+    def write(self, span: TurnSpan):
+        self._queue.put(span)
+
+    def close(self):
+        self._queue.put(self._CLOSE)
+        self._thread.join()
+
+    def _run(self):
+        with open(self._path, 'a', encoding='utf-8') as file:
+            pending = 0
+            while True:
+                try:
+                    span = self._queue.get(timeout=self._flush_interval)
+                except queue.Empty:
+                    file.flush()
+                    pending = 0
+                    continue
+
+                if span is self._CLOSE:
+                    break
+                self._write_line(file, span)
+                pending += 1
+                if pending >= self._buffer_size:
+                    file.flush()
+                    pending = 0
+
+    @staticmethod
+    def _write_line(file: TextIO, span: TurnSpan):
+        try:
+            file.write(json.dumps(span.to_json(), default=str))
+            file.write('\n')
+        except (TypeError, ValueError) as e:
+            logging.getLogger(f"{__name__}").warning(f'Could not serialize span for {span.battle_tag}: {e}')
+
+
+class DecisionTracer:
+    """
+    Collects one span per turn. choose_move runs synchronously on POKE_LOOP, so there is at most one span being
+    recorded at a time.
+    """
+
+    def __init__(self, writer: SpanWriter):
+        self._writer = writer
+        self._current: Optional[TurnSpan] = None
+        self._start_time = 0.
+
+    @property
+    def current(self) -> Optional[TurnSpan]:
+        return self._current
+
+    def start(self, battle_tag: str, turn: int) -> TurnSpan:
+        self._current = TurnSpan(battle_tag, turn)
+        self._start_time = perf_counter()
+        return self._current
+
+    def finish(self, order: Optional[str], fallback: bool):
+        span = self._current
+        if span is None:
+            return
+        span.order = order
+        span.fallback = fallback
+        span.total_ms = (perf_counter() - self._start_time) * 1000
+        self._current = None
+        self._writer.write(span)
+
+    def instrument(self, subsystems: Dict[str, Any]):
+        """Times the step of each of the given subsystems (e.g., {'ms': mind[cl.subsystem('ms')]}) into the current span"""
+        for name, subsystem in subsystems.items():
+            subsystem.step = self._timed(name, subsystem.step)
+
+    def _timed(self, name: str, step: Callable) -> Callable:
+        @wraps(step)
+        def timed_step(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return step(*args, **kwargs)
+            finally:
+                span = self._current
+                if span is not None:
+                    span.step_ms[name] = span.step_ms.get(name, 0.) + (perf_counter() - start) * 1000
+        return timed_step
+
+
+def init_tracer(path: Optional[str]) -> Iterator[Optional[DecisionTracer]]:
+    """Resource initializer for the container. Tracing is disabled when no path is given."""
+    if path is None:
+        yield None
+        return
+
+    writer = SpanWriter(path)
+    try:
+        yield DecisionTracer(writer)
+    finally:
+        writer.close()
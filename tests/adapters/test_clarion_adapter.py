@@ -12,8 +12,11 @@ from poke_env.environment import (
 from battlemaster.adapters.clarion_adapter import (
     MindAdapter, BattleConcept, PerceptionFactory, GroupedStimulusInput
 )
+from battlemaster.adapters.decision_cache import DecisionCache
 from battlemaster.clarion_ext.attention import GroupedChunkInstance
+from battlemaster.clarion_ext.knowledge import HiddenInformationLedger, SpeciesKnowledge
 from battlemaster.clarion_ext.numdicts_ext import get_chunk_from_numdict
+from battlemaster.clarion_ext.sampling import BattleRandomStreams
 
 
 class TestMindAdapter:
@@ -55,6 +58,21 @@ class TestMindAdapter:
         chosen_action = mind_adapter.choose_action()
 
         assert chosen_action is "snore"
+    def test_observe_notes_reveals_without_stepping_mind(self, perception_factory: PerceptionFactory, battle: Battle):
+        battle.battle_tag = 'battle-1'
+        perception_factory.map_opponent_pokemon.return_value = [
+            GroupedChunkInstance('beldum', BattleConcept.OPPONENT_ACTIVE_POKEMON, [cl.feature('move', 'takedown')])
+        ]
+        mind = Mock(spec=cl.Structure)
+        ledger = HiddenInformationLedger()
+        mind_adapter = MindAdapter(mind, Mock(spec=cl.Construct), perception_factory, ledger=ledger)
+
+        mind_adapter.observe(battle)
+
+        assert ledger.knowledge_of('battle-1', 'beldum') == SpeciesKnowledge(frozenset({'takedown'}))
+        assert mind_adapter.opponent_knowledge('battle-1') == {'beldum': SpeciesKnowledge(frozenset({'takedown'}))}
+        mind.step.assert_not_called()
+
 
     @staticmethod
     def _given_no_chosen_move(acs_terminus):
@@ -65,6 +83,101 @@ class TestMindAdapter:
         acs_terminus.output = nd.NumDict({cl.chunk(move_name): 1.0})
 
 
+class TestMindAdapterDecisionCache:
+    @pytest.fixture
+    def battle(self) -> Battle:
+        battle = Mock(spec=Battle)
+        battle.battle_tag = 'battle-1'
+        return battle
+
+    @pytest.fixture
+    def perception_factory(self) -> PerceptionFactory:
+        factory = Mock(spec=PerceptionFactory)
+        factory.map.side_effect = lambda battle: self._perception(battle.turn)
+        return factory
+
+    @pytest.fixture
+    def structure(self) -> Dict:
+        acs_terminus = Mock(spec=cl.Construct)
+        acs_terminus.output = nd.NumDict({cl.chunk('tackle'): 1.0})
+        acs_terminus.process = Mock(threshold=0., temperature=0.2, streams=Mock(wraps=BattleRandomStreams(seed=0)))
+        acs_out = Mock(spec=cl.Construct)
+        acs_out.output = nd.NumDict({cl.chunk('tackle'): 1.0})
+        goal_terminus = Mock(spec=cl.Construct)
+        goal_terminus.output = nd.NumDict({cl.chunk('deal_damage'): 1.0})
+        effort_gate = Mock(spec=cl.Construct)
+        effort_gate.output = nd.NumDict()
+        return {
+            cl.subsystem('acs'): {cl.terminus('choose_move'): acs_terminus, cl.chunks('out'): acs_out},
+            cl.subsystem('mcs'): {cl.terminus('goal_out'): goal_terminus},
+            cl.buffer('mcs_effort_gate'): effort_gate,
+        }
+
+    @pytest.fixture
+    def mind(self, structure: Dict) -> cl.Structure:
+        mind = Mock(spec=cl.Structure)
+        mind.step = Mock()
+        mind.__getitem__ = Mock()
+        mind.__getitem__.side_effect = structure.__getitem__
+        return mind
+
+    @pytest.fixture
+    def cache(self) -> DecisionCache:
+        return DecisionCache(per_battle=True)
+
+    @pytest.fixture
+    def mind_adapter(self, mind: cl.Structure, perception_factory: PerceptionFactory, cache: DecisionCache) -> MindAdapter:
+        return MindAdapter(mind, Mock(spec=cl.Construct), perception_factory, decision_cache=cache)
+
+    def test_repeated_state_skips_mind(self, mind_adapter: MindAdapter, mind, battle: Battle):
+        battle.turn = 1
+        mind_adapter.perceive(battle)
+        battle.turn = 2
+        mind_adapter.perceive(battle)
+
+        mind.step.assert_called_once()
+        assert mind_adapter.choose_action() == 'tackle'
+        assert mind_adapter.current_goal() == 'deal_damage'
+
+    def test_cache_hit_samples_from_battle_stream(self, mind_adapter: MindAdapter, structure: Dict, battle: Battle):
+        streams = structure[cl.subsystem('acs')][cl.terminus('choose_move')].process.streams
+        battle.turn = 1
+        mind_adapter.perceive(battle)
+        battle.turn = 2
+        mind_adapter.perceive(battle)
+
+        streams.generator.assert_called_once_with('battle-1')
+
+    def test_perception_feeds_ledger(self, mind, perception_factory: PerceptionFactory, battle: Battle):
+        ledger = HiddenInformationLedger()
+        mind_adapter = MindAdapter(mind, Mock(spec=cl.Construct), perception_factory, ledger=ledger)
+        battle.turn = 1
+
+        mind_adapter.perceive(battle)
+
+        assert ledger.knowledge_of('battle-1', 'beldum') == SpeciesKnowledge(frozenset({'takedown'}))
+        perception_factory.map_opponent_pokemon.assert_not_called()
+
+    def test_forget_drops_cached_decisions(self, mind_adapter: MindAdapter, mind, battle: Battle, cache: DecisionCache):
+        battle.turn = 1
+        mind_adapter.perceive(battle)
+        mind_adapter.forget(battle.battle_tag)
+        mind_adapter.perceive(battle)
+
+        assert mind.step.call_count == 2
+        assert len(cache) == 1
+
+    @staticmethod
+    def _perception(turn: int) -> GroupedStimulusInput:
+        perception = GroupedStimulusInput([concept for concept in BattleConcept])
+        perception.add_chunk_instance_to_group(cl.chunk('metadata'), BattleConcept.BATTLE,
+                                               [cl.feature('tag', 'battle-1'), cl.feature('turn', turn)])
+        perception.add_chunks_to_group([cl.chunk('tackle')], BattleConcept.AVAILABLE_MOVES)
+        perception.add_chunk_instance_to_group(cl.chunk('beldum'), BattleConcept.OPPONENT_ACTIVE_POKEMON,
+                                               [cl.feature('move', 'takedown')])
+        return perception
+
+
 class TestPerceptionFactory:
     @pytest.fixture
     def factory(self) -> PerceptionFactory:
@@ -206,6 +319,22 @@ class TestPerceptionFactory:
         assert 'punching bag' == player.get_feature_value('role')
         assert player.get_feature_value('rating') is None
 
+    def test_deferred_players_are_perceived_as_they_were(self, factory: PerceptionFactory, battle):
+        perception = factory.map(battle)
+        battle.opponent_rating = 1500
+
+        player = typing.cast(GroupedChunkInstance, get_chunk_from_numdict('opponent', perception.to_stimulus()[BattleConcept.PLAYERS]))
+        assert player.get_feature_value('rating') is None
+
+    def test_same_position_against_another_opponent_has_same_key(self, factory: PerceptionFactory, battle):
+        perception = factory.map(battle)
+        battle.opponent_username = 'someone else'
+        other_perception = factory.map(battle)
+
+        assert perception.canonical_key(ignored_groups=[BattleConcept.PLAYERS]) == other_perception.canonical_key(ignored_groups=[BattleConcept.PLAYERS])
+        assert BattleConcept.PLAYERS not in perception.materialized_groups
+        assert BattleConcept.WEATHER not in perception.materialized_groups
+
     def test_side_conditions_in_perception(self, perception: GroupedStimulusInput):
         perceived_conditions = perception.to_stimulus()[BattleConcept.SIDE_CONDITIONS]
         assert 2 == len(perceived_conditions)
@@ -259,6 +388,12 @@ class TestPerceptionFactory:
         assert 1 == len(opponent_active_pokemon_perception.get_feature('move'))
         assert 'closecombat' == opponent_active_pokemon_perception.get_feature_value('move')
 
+    def test_opponent_pokemon_alone(self, factory: PerceptionFactory, battle):
+        opponent_pokemon = factory.map_opponent_pokemon(battle)
+
+        assert ['staraptor', 'tornadus'] == [pokemon.cid for pokemon in opponent_pokemon]
+        assert 'closecombat' == opponent_pokemon[0].get_feature_value('move')
+
     def test_benched_pokemon_in_opponent_team(self, opponent_team_perception: nd.NumDict):
         assert 1 == len(opponent_team_perception)
         assert cl.chunk('tornadus') in opponent_team_perception
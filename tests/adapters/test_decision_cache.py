@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from battlemaster.adapters.decision_cache import DecisionCache, CachedDecision
+
+
+def decision(*actions: str) -> CachedDecision:
+    return CachedDecision(list(actions), [1. / len(actions)] * len(actions), 'deal_damage', 'autopilot')
+
+
+class TestCachedDecision:
+    def test_sample_from_distribution(self):
+        cached = CachedDecision(['tackle', 'ember'], [0., 1.], None, None)
+
+        assert cached.sample(np.random.default_rng(0)) == 'ember'
+
+    def test_sample_without_actions(self):
+        assert CachedDecision([], [], None, None).sample(np.random.default_rng(0)) is None
+
+
+class TestDecisionCache:
+    def test_miss_then_hit(self):
+        cache = DecisionCache(max_size=2)
+        cached = decision('tackle')
+
+        assert cache.get('battle-1', 'state') is None
+        cache.put('battle-1', 'state', cached)
+
+        assert cache.get('battle-1', 'state') is cached
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_evicts_least_recently_used(self):
+        cache = DecisionCache(max_size=2)
+        cache.put('battle-1', 'a', decision('tackle'))
+        cache.put('battle-1', 'b', decision('ember'))
+        cache.get('battle-1', 'a')
+        cache.put('battle-1', 'c', decision('surf'))
+
+        assert len(cache) == 2
+        assert cache.get('battle-1', 'a') is not None
+        assert cache.get('battle-1', 'b') is None
+
+    def test_per_battle_entries_are_not_shared(self):
+        cache = DecisionCache(per_battle=True)
+        cache.put('battle-1', 'state', decision('tackle'))
+
+        assert cache.get('battle-2', 'state') is None
+
+    def test_global_entries_are_shared(self):
+        cache = DecisionCache(per_battle=False)
+        cache.put('battle-1', 'state', decision('tackle'))
+
+        assert cache.get('battle-2', 'state') is not None
+
+    def test_forget_drops_battle_entries(self):
+        cache = DecisionCache(per_battle=True)
+        cache.put('battle-1', 'state', decision('tackle'))
+        cache.put('battle-2', 'state', decision('ember'))
+
+        cache.forget('battle-1')
+
+        assert cache.get('battle-1', 'state') is None
+        assert cache.get('battle-2', 'state') is not None
+
+    def test_forget_after_eviction(self):
+        cache = DecisionCache(max_size=1, per_battle=True)
+        cache.put('battle-1', 'a', decision('tackle'))
+        cache.put('battle-2', 'b', decision('ember'))
+
+        cache.forget('battle-1')
+
+        assert len(cache) == 1
+
+    def test_requires_room(self):
+        with pytest.raises(ValueError):
+            DecisionCache(max_size=0)
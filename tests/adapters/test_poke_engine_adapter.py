@@ -0,0 +1,67 @@
+import pytest
+from poke_engine.constants import SWITCH_STRING
+
+from battlemaster.adapters.poke_engine_adapter import Simulator, SearchStats, OptionFilter
+
+
+class TestSimulatorOptionOrder:
+    def test_user_options_ordered_by_priority(self):
+        simulator = Simulator()
+
+        user_options, _ = simulator._order_options(['tackle', 'thunderbolt', f'{SWITCH_STRING} pikachu'], ['ember'],
+                                                   OptionFilter.NO_FILTER, {f'{SWITCH_STRING} pikachu': 2., 'tackle': 1.})
+
+        assert user_options == [f'{SWITCH_STRING} pikachu', 'tackle', 'thunderbolt']
+
+    def test_options_without_priority_ordered_by_power(self):
+        simulator = Simulator()
+
+        user_options, opponent_options = simulator._order_options(['tackle', f'{SWITCH_STRING} pikachu', 'thunderbolt'],
+                                                                  [f'{SWITCH_STRING} charmander', 'ember', 'flamethrower'],
+                                                                  OptionFilter.NO_FILTER)
+
+        assert user_options == ['thunderbolt', 'tackle', f'{SWITCH_STRING} pikachu']
+        assert opponent_options == ['flamethrower', 'ember', f'{SWITCH_STRING} charmander']
+
+    def test_unordered_keeps_engine_order(self):
+        simulator = Simulator(order_options=False)
+
+        user_options, opponent_options = simulator._order_options(['tackle', 'thunderbolt'], ['ember', 'flamethrower'],
+                                                                  OptionFilter.NO_FILTER)
+
+        assert user_options == ['tackle', 'thunderbolt']
+        assert opponent_options == ['ember', 'flamethrower']
+
+    def test_opponent_top_k(self):
+        simulator = Simulator(opponent_top_k=1)
+
+        _, opponent_options = simulator._order_options(['tackle'], ['ember', 'flamethrower'], OptionFilter.NO_FILTER)
+
+        assert opponent_options == ['flamethrower']
+
+    def test_reject_empty_top_k(self):
+        with pytest.raises(ValueError):
+            Simulator(opponent_top_k=0)
+
+
+class TestSearchStats:
+    def test_pruned_share(self):
+        stats = SearchStats()
+        stats.record({('tackle', 'ember'): 1., ('tackle', 'flamethrower'): 0.5, ('surf', 'ember'): 2.},
+                     ['tackle', 'surf'], ['ember', 'flamethrower'])
+
+        assert (stats.searches, stats.pairs_searched, stats.pairs_possible) == (1, 3, 4)
+        assert stats.pruned == pytest.approx(0.25)
+
+    def test_nothing_pruned_without_searches(self):
+        assert SearchStats().pruned == 0.
+
+    def test_merge(self):
+        stats = SearchStats()
+        other = SearchStats()
+        other.record({('tackle', 'ember'): 1.}, ['tackle', 'surf'], ['ember'])
+
+        stats.merge(other)
+        stats.merge(other)
+
+        assert (stats.searches, stats.pairs_searched, stats.pairs_possible) == (2, 2, 4)
@@ -0,0 +1,81 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from battlemaster.adapters.search_cache import SearchCache
+
+
+def _given_pokemon(species: str, hp: float, maxhp: float = 300, moves=('tackle',)) -> SimpleNamespace:
+    """Like a poke-engine Pokemon, with the attributes its position is keyed by"""
+    return SimpleNamespace(id=species, hp=hp, maxhp=maxhp, status=None, item='leftovers', ability='intimidate',
+                           terastallized=False, types=['normal'], attack_boost=0, defense_boost=0,
+                           special_attack_boost=0, special_defense_boost=0, speed_boost=0, accuracy_boost=0,
+                           evasion_boost=0, volatile_status=set(), moves=[{'id': move} for move in moves])
+
+
+def _given_state(user_hp: float = 300, opponent_hp: float = 300, wish=(0, 0)) -> SimpleNamespace:
+    """Like a poke-engine State"""
+    user = SimpleNamespace(active=_given_pokemon('snorlax', user_hp), reserve={'pikachu': _given_pokemon('pikachu', 100, 100)},
+                           side_conditions={'stealthrock': 1, 'spikes': 0}, wish=wish, future_sight=(0, 0))
+    opponent = SimpleNamespace(active=_given_pokemon('charizard', opponent_hp, moves=('ember', 'fly')), reserve={},
+                               side_conditions={}, wish=(0, 0), future_sight=(0, 0))
+    return SimpleNamespace(user=user, opponent=opponent, weather=None, field=None, trick_room=False)
+
+
+class TestSearchCache:
+    def test_miss_then_hit(self):
+        cache = SearchCache(max_size=2)
+        key = SearchCache.key(_given_state(), ['tackle'], ['ember'])
+        scores = {('tackle', 'ember'): 1.}
+
+        assert cache.get(key) is None
+        cache.put(key, scores)
+
+        assert cache.get(key) is scores
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_key_is_by_position_and_options(self):
+        state = _given_state()
+        assert SearchCache.key(state, ['tackle'], ['ember']) == SearchCache.key(state, ('tackle',), ('ember',))
+        assert SearchCache.key(state, ['tackle', 'surf'], ['ember']) == SearchCache.key(state, ['surf', 'tackle'], ['ember'])
+        assert SearchCache.key(state, ['tackle'], ['ember']) != SearchCache.key(state, ['tackle', 'surf'], ['ember'])
+        assert SearchCache.key(state, ['tackle'], ['ember']) != SearchCache.key(_given_state(opponent_hp=150), ['tackle'], ['ember'])
+
+    def test_speculated_position_is_hit_by_next_turn(self):
+        cache = SearchCache()
+        # the engine expects a hit for 23.4% and sets up a wish, which the next turn's perception doesn't carry
+        speculated = _given_state(user_hp=300, opponent_hp=229.8, wish=(2, 150))
+        cache.put(SearchCache.key(speculated, ['tackle'], ['ember', 'fly']), {('tackle', 'ember'): 1.})
+        # the next turn is rebuilt from the perception, with the opponent's HP rounded to a percentage
+        perceived = _given_state(user_hp=300, opponent_hp=0.77 * 300)
+
+        assert cache.get(SearchCache.key(perceived, ['tackle'], ['fly', 'ember'])) == {('tackle', 'ember'): 1.}
+
+    def test_fainted_pokemon_is_not_rounded_away(self):
+        assert SearchCache.key(_given_state(opponent_hp=1), [], []) != SearchCache.key(_given_state(opponent_hp=0), [], [])
+
+    def test_evicts_least_recently_used(self):
+        cache = SearchCache(max_size=2)
+        cache.put('a', {})
+        cache.put('b', {})
+        cache.get('a')
+        cache.put('c', {})
+
+        assert len(cache) == 2
+        assert cache.get('b') is None
+        assert cache.get('a') is not None
+
+    def test_update_from_other_threads(self):
+        cache = SearchCache(max_size=100)
+        threads = [threading.Thread(target=cache.update, args=({(i, j): {} for j in range(10)},)) for i in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(cache) == 50
+
+    def test_reject_empty_cache(self):
+        with pytest.raises(ValueError):
+            SearchCache(max_size=0)
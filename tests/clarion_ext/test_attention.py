@@ -1,3 +1,4 @@
+import pickle
 from typing import Mapping, Any
 from unittest.mock import Mock
 
@@ -5,7 +6,9 @@ import pytest
 import pyClarion as cl
 from pyClarion import nd
 
-from battlemaster.clarion_ext.attention import NamedStimuli, AttentionFilter, GroupedChunk, GroupedChunkInstance, GroupedStimulusInput
+from battlemaster.clarion_ext.attention import (
+    NamedStimuli, AttentionFilter, GroupedChunk, GroupedChunkInstance, GroupedStimulusInput, SymbolTable, CurrentPerception
+)
 
 
 class TestGroupedChunk:
@@ -44,6 +47,13 @@ class TestGroupedChunk:
         assert grouped_chunk2 not in {grouped_chunk1: 1.}
 
 
+    def test_pickled_with_hash_of_unpickling_process(self):
+        grouped_chunk = pickle.loads(pickle.dumps(GroupedChunk('foo', 'a')))
+
+        assert grouped_chunk.group == 'a'
+        assert grouped_chunk in {cl.chunk('foo'): 1.}
+
+
 class TestGroupedChunkInstance:
     def test_constructing(self):
         chunk = cl.chunk('foo')
@@ -82,7 +92,52 @@ class TestGroupedChunkInstance:
         assert grouped_chunk2 not in {grouped_chunk1: 1.}
 
 
+class TestSymbolTable:
+    def test_equal_features_are_shared(self):
+        symbols = SymbolTable()
+
+        assert symbols.feature('hp', 100) is symbols.feature('hp', 100)
+        assert symbols.feature('hp', 100) == cl.feature('hp', 100)
+        assert symbols.feature('hp', 100) is not symbols.feature('hp', 50)
+
+    def test_values_of_different_types_are_not_shared(self):
+        symbols = SymbolTable()
+
+        assert symbols.feature('active', True) is not symbols.feature('active', 1)
+
+    def test_unhashable_values_are_not_interned(self):
+        symbols = SymbolTable()
+
+        assert symbols.feature('moves', ['tackle']) is not symbols.feature('moves', ['tackle'])
+        assert len(symbols) == 0
+
+    def test_equal_chunks_are_shared(self):
+        symbols = SymbolTable()
+
+        assert symbols.chunk('pikachu') is symbols.chunk('pikachu')
+        assert symbols.grouped_chunk('pikachu', 'team') is symbols.grouped_chunk('pikachu', 'team')
+        assert symbols.grouped_chunk('pikachu', 'team') is not symbols.grouped_chunk('pikachu', 'opponent_team')
+
+    def test_cleared_once_full(self):
+        symbols = SymbolTable(max_size=2)
+        first = symbols.feature('turn', 1)
+        symbols.feature('turn', 2)
+        symbols.feature('turn', 3)
+
+        assert len(symbols) == 1
+        assert symbols.feature('turn', 1) is not first
+
+
 class TestGroupedStimulusInput:
+    def test_add_chunk_interned(self):
+        symbols = SymbolTable()
+        input1 = GroupedStimulusInput(['foo'], symbols)
+        input1.add_chunk_to_group(cl.chunk('bar'), 'foo')
+        input2 = GroupedStimulusInput(['foo'], symbols)
+        input2.add_chunk_to_group(cl.chunk('bar'), 'foo')
+
+        assert self._get_first_chunk(input1) is self._get_first_chunk(input2)
+
     def test_add_chunk(self):
         input = GroupedStimulusInput(['foo'])
         input.add_chunk_to_group(cl.chunk('bar'), 'foo')
@@ -109,24 +164,117 @@ class TestGroupedStimulusInput:
         with pytest.raises(ValueError):
             input.add_chunk_instance_to_group(cl.chunk('bar'), 'does not exist', [])
 
+    def test_canonical_key_ignores_insertion_order(self):
+        input1 = GroupedStimulusInput(['foo', 'bar'])
+        input1.add_chunk_to_group(cl.chunk('a'), 'foo')
+        input1.add_chunk_instance_to_group(cl.chunk('b'), 'bar', [cl.feature('x', 1), cl.feature('y', 2)])
+        input2 = GroupedStimulusInput(['foo', 'bar'])
+        input2.add_chunk_instance_to_group(cl.chunk('b'), 'bar', [cl.feature('y', 2), cl.feature('x', 1)])
+        input2.add_chunk_to_group(cl.chunk('a'), 'foo')
+
+        assert input1.canonical_key() == input2.canonical_key()
+        assert hash(input1.canonical_key()) == hash(input2.canonical_key())
+
+    def test_canonical_key_differs_by_feature(self):
+        input1 = GroupedStimulusInput(['foo'])
+        input1.add_chunk_instance_to_group(cl.chunk('a'), 'foo', [cl.feature('hp', 100)])
+        input2 = GroupedStimulusInput(['foo'])
+        input2.add_chunk_instance_to_group(cl.chunk('a'), 'foo', [cl.feature('hp', 50)])
+
+        assert input1.canonical_key() != input2.canonical_key()
+
+    def test_canonical_key_differs_by_group(self):
+        input1 = GroupedStimulusInput(['foo', 'bar'])
+        input1.add_chunk_to_group(cl.chunk('a'), 'foo')
+        input2 = GroupedStimulusInput(['foo', 'bar'])
+        input2.add_chunk_to_group(cl.chunk('a'), 'bar')
+
+        assert input1.canonical_key() != input2.canonical_key()
+
+    def test_canonical_key_leaves_out_ignored_features(self):
+        input1 = GroupedStimulusInput(['foo'])
+        input1.add_chunk_instance_to_group(cl.chunk('metadata'), 'foo', [cl.feature('turn', 3), cl.feature('wait', False)])
+        input2 = GroupedStimulusInput(['foo'])
+        input2.add_chunk_instance_to_group(cl.chunk('metadata'), 'foo', [cl.feature('turn', 9), cl.feature('wait', False)])
+
+        assert input1.canonical_key(['turn']) == input2.canonical_key(['turn'])
+        assert input1.canonical_key() != input2.canonical_key()
+
+    def test_deferred_group_built_once_when_read(self):
+        input = GroupedStimulusInput(['foo', 'bar'])
+        build = Mock(side_effect=lambda: input.add_chunk_to_group(cl.chunk('baz'), 'bar'))
+        input.defer_group('bar', build)
+
+        assert input.materialized_groups == ['foo']
+        build.assert_not_called()
+
+        view = input.view()
+        assert cl.chunk('baz') in view['bar']
+        assert cl.chunk('baz') in input.to_stimulus()['bar']
+        build.assert_called_once()
+
+    def test_canonical_key_builds_deferred_groups(self):
+        input1 = GroupedStimulusInput(['foo'])
+        input1.add_chunk_to_group(cl.chunk('a'), 'foo')
+        input2 = GroupedStimulusInput(['foo'])
+        input2.defer_group('foo', lambda: input2.add_chunk_to_group(cl.chunk('a'), 'foo'))
+
+        assert input1.canonical_key() == input2.canonical_key()
+
+    def test_canonical_key_keys_deferred_group_by_its_key(self):
+        input1 = GroupedStimulusInput(['foo'])
+        input1.defer_group('foo', Mock(), key=('a',))
+        input2 = GroupedStimulusInput(['foo'])
+        input2.defer_group('foo', lambda: input2.add_chunk_to_group(cl.chunk('a'), 'foo'), key=('a',))
+        input2.materialize('foo')
+
+        assert input1.canonical_key() == input2.canonical_key()
+        assert input1.materialized_groups == []
+
+    def test_canonical_key_leaves_out_ignored_groups(self):
+        input1 = GroupedStimulusInput(['foo', 'bar'])
+        input1.add_chunk_to_group(cl.chunk('a'), 'foo')
+        build = Mock(side_effect=lambda: input1.add_chunk_to_group(cl.chunk('b'), 'bar'))
+        input1.defer_group('bar', build)
+        input2 = GroupedStimulusInput(['foo', 'bar'])
+        input2.add_chunk_to_group(cl.chunk('a'), 'foo')
+        input2.add_chunk_to_group(cl.chunk('c'), 'bar')
+
+        assert input1.canonical_key(ignored_groups=['bar']) == input2.canonical_key(ignored_groups=['bar'])
+        build.assert_not_called()
+
+    def test_group_stimulus_shared_until_group_changes(self):
+        input = GroupedStimulusInput(['foo'])
+        input.add_chunk_to_group(cl.chunk('a'), 'foo')
+        stimulus = input.group_stimulus('foo')
+
+        assert input.view()['foo'] is stimulus
+
+        input.add_chunk_to_group(cl.chunk('b'), 'foo')
+        assert input.group_stimulus('foo') is not stimulus
+        assert cl.chunk('b') in input.group_stimulus('foo')
+
+    def test_view_of_unknown_group(self):
+        with pytest.raises(KeyError):
+            GroupedStimulusInput(['foo']).view()['bar']
+
     @staticmethod
     def _get_first_chunk(input: GroupedStimulusInput) -> cl.chunk:
         return next(iter(input._inputs['foo'].keys()))
 
 
 class TestNamedStimuliComponentTest:
-    def test_input_adds_to_individual_stimuli(self):
+    def test_call_without_input_is_empty(self):
+        assert len(NamedStimuli().call({})) == 0
+
+    def test_call_reuses_flattened_stimuli(self):
         stimuli = NamedStimuli()
-        named_stimuli = GroupedStimulusInput(['foo', 'bar'])
+        named_stimuli = GroupedStimulusInput(['foo'])
         named_stimuli.add_chunk_to_group(cl.chunk('foo'), 'foo')
-        named_stimuli.add_chunk_to_group(cl.chunk('bar'), 'bar')
 
         stimuli.input(named_stimuli)
 
-        for name in named_stimuli.groups:
-            expected_chunk = cl.chunk(name)
-            stimulus = stimuli._stimuli[name].stimulus
-            assert expected_chunk in stimulus
+        assert stimuli.call({}) is stimuli.call({})
 
     def test_call_flattens_stimuli(self):
         named_stimuli = ['foo', 'bar', 'baz']
@@ -146,6 +294,21 @@ class TestNamedStimuliComponentTest:
             assert result[expected_chunk] == input[name][expected_chunk]
 
 
+    def test_deferred_groups_left_out_with_current_perception(self):
+        current_perception = CurrentPerception()
+        stimuli = NamedStimuli(current_perception)
+        named_stimuli = GroupedStimulusInput(['foo', 'bar'])
+        named_stimuli.add_chunk_to_group(cl.chunk('foo'), 'foo')
+        named_stimuli.defer_group('bar', lambda: named_stimuli.add_chunk_to_group(cl.chunk('bar'), 'bar'))
+
+        stimuli.input(named_stimuli)
+        result = stimuli.call({})
+
+        assert cl.chunk('foo') in result
+        assert cl.chunk('bar') not in result
+        assert cl.chunk('bar') in current_perception.view['bar']
+
+
 class TestAttentionFilter:
     @pytest.fixture
     def inputs(self) -> Mapping[Any, nd.NumDict]:
@@ -0,0 +1,99 @@
+from typing import Mapping, Any
+
+import numpy as np
+import pytest
+import pyClarion as cl
+from pyClarion import nd
+
+from battlemaster.clarion_ext.dense import DenseDomain, DenseBottomUp
+from battlemaster.clarion_ext.motivation import drive, DRIVE_DOMAIN
+
+
+class TestDenseDomain:
+    @pytest.fixture
+    def domain(self) -> DenseDomain:
+        return DenseDomain([drive.DO_DAMAGE, drive.KO_OPPONENT, drive.KEEP_HEALTHY])
+
+    def test_round_trip(self, domain: DenseDomain):
+        d = nd.NumDict({drive.KO_OPPONENT: 2., drive.KEEP_HEALTHY: 0.5}, default=0.)
+
+        vector = domain.to_vector(d)
+
+        assert list(vector) == [0., 2., 0.5]
+        assert domain.to_numdict(vector) == d
+
+    def test_stack(self, domain: DenseDomain):
+        matrix = domain.stack([nd.NumDict({drive.DO_DAMAGE: 1.}, default=0.), nd.NumDict({drive.KEEP_HEALTHY: 3.}, default=0.)])
+
+        assert matrix.shape == (2, 3)
+        assert list(matrix[1]) == [0., 0., 3.]
+
+    def test_covers(self, domain: DenseDomain):
+        assert domain.covers(nd.NumDict({drive.DO_DAMAGE: 1.}, default=0.))
+        assert not domain.covers(nd.NumDict({drive.BUFF_SELF: 1.}, default=0.))
+
+    def test_reject_duplicate_symbols(self):
+        with pytest.raises(ValueError):
+            DenseDomain([drive.DO_DAMAGE, drive.DO_DAMAGE])
+
+
+class _Squared(cl.Process):
+    _serves = cl.ConstructType.flow_bt
+
+    def __init__(self, source: cl.Symbol):
+        super().__init__(expected=[source])
+        self._source = source
+
+    def call(self, inputs: Mapping[Any, nd.NumDict]) -> nd.NumDict:
+        strength = inputs[self._source][drive.DO_DAMAGE]
+        return nd.NumDict({cl.chunk('attack'): strength ** 2}, default=0.)
+
+
+class TestDenseBottomUp:
+    @pytest.fixture
+    def source(self) -> cl.Symbol:
+        return cl.features('drive_strengths')
+
+    @pytest.fixture
+    def base(self, source) -> cl.BottomUp:
+        goal_chunks = cl.Chunks()
+        goal_chunks.define(cl.chunk('attack'), drive.DO_DAMAGE, drive.KO_OPPONENT)
+        goal_chunks.define(cl.chunk('retreat'), drive.KEEP_POKEMON_ALIVE, drive.KEEP_HEALTHY, drive.REVEAL_HIDDEN_INFORMATION)
+        return cl.BottomUp(source=source, chunks=goal_chunks)
+
+    @pytest.mark.parametrize('strengths', [
+        {drive.DO_DAMAGE: 1.5, drive.KO_OPPONENT: 0.2},
+        {drive.KEEP_POKEMON_ALIVE: 3., drive.KEEP_HEALTHY: 0.8, drive.REVEAL_HIDDEN_INFORMATION: 0.1},
+        {},
+    ])
+    def test_same_activations_as_bottom_up(self, base: cl.BottomUp, source, strengths):
+        dense = DenseBottomUp(base, source, DenseDomain(DRIVE_DOMAIN.features))
+        inputs = {source: nd.NumDict(strengths, default=0.)}
+
+        expected = base.call(inputs)
+        result = dense.call(inputs)
+
+        assert set(result.keys()) == set(expected.keys())
+        for goal in expected.keys():
+            assert result[goal] == pytest.approx(expected[goal])
+
+    def test_activate_batch(self, base: cl.BottomUp, source):
+        domain = DenseDomain(DRIVE_DOMAIN.features)
+        dense = DenseBottomUp(base, source, domain)
+        battles = [nd.NumDict({drive.DO_DAMAGE: 1.}, default=0.), nd.NumDict({drive.KEEP_HEALTHY: 2.}, default=0.)]
+        dense.call({source: battles[0]})
+
+        activations = dense.activate_batch(domain.stack(battles))
+
+        for row, strengths in zip(activations, battles):
+            expected = base.call({source: strengths})
+            assert list(row) == pytest.approx(list(dense.chunks.to_vector(expected)))
+
+    def test_falls_back_when_not_linear(self, source):
+        base = _Squared(source)
+        dense = DenseBottomUp(base, source, DenseDomain(DRIVE_DOMAIN.features))
+        inputs = {source: nd.NumDict({drive.DO_DAMAGE: 3.}, default=0.)}
+
+        assert dense.call(inputs)[cl.chunk('attack')] == 9.
+        with pytest.raises(ValueError):
+            dense.activate_batch(np.zeros((1, len(DRIVE_DOMAIN.features))))
@@ -0,0 +1,27 @@
+import pyClarion as cl
+from pyClarion import nd
+import pytest
+
+from battlemaster.adapters.clarion_adapter import BattleConcept
+from battlemaster.clarion_ext.attention import GroupedChunk, GroupedChunkInstance
+from battlemaster.clarion_ext.execution import ExecutionProfile, get_execution_profile
+
+
+@pytest.mark.parametrize('force_switch, expected_profile', [
+    (False, ExecutionProfile.NORMAL),
+    (True, ExecutionProfile.FORCE_SWITCH),
+])
+def test_profile_is_read_from_battle_metadata(force_switch: bool, expected_profile: ExecutionProfile):
+    metadata = GroupedChunkInstance('metadata', BattleConcept.BATTLE, [
+        cl.feature('force_switch', force_switch),
+        cl.feature('is_team_preview', False)
+    ])
+    stimulus = nd.NumDict({metadata: 1., GroupedChunk('pikachu', BattleConcept.TEAM): 1.}, default=0.)
+
+    assert get_execution_profile(stimulus) == expected_profile
+
+
+def test_profile_defaults_to_normal_without_battle_metadata():
+    stimulus = nd.NumDict({GroupedChunk('pikachu', BattleConcept.TEAM): 1.}, default=0.)
+
+    assert get_execution_profile(stimulus) == ExecutionProfile.NORMAL
@@ -4,7 +4,10 @@ import pyClarion as cl
 from pyClarion import nd
 import pytest
 
-from battlemaster.clarion_ext.filters import SwitchIfEmpty
+from battlemaster.adapters.clarion_adapter import BattleConcept
+from battlemaster.clarion_ext.attention import GroupedChunkInstance
+from battlemaster.clarion_ext.execution import ExecutionProfile
+from battlemaster.clarion_ext.filters import SwitchIfEmpty, ProfileGate
 
 
 class TestSwitchIfEmpty:
@@ -49,3 +52,29 @@ class TestSwitchIfEmpty:
         assert not cl.chunk('bar') in result
         assert cl.chunk('faz') in result
         assert cl.chunk('baz') in result
+
+
+class TestProfileGate:
+    @pytest.fixture
+    def stimulus_source(self) -> cl.Symbol:
+        return cl.buffer('stimulus')
+
+    @pytest.fixture
+    def process(self, stimulus_source):
+        base = cl.Constants(nd.NumDict({cl.chunk('thunderbolt'): 1.}, default=0.))
+        return ProfileGate(base, stimulus_source, [ExecutionProfile.NORMAL])
+
+    @staticmethod
+    def _given_stimulus(stimulus_source: cl.Symbol, force_switch: bool):
+        metadata = GroupedChunkInstance('metadata', BattleConcept.BATTLE, [cl.feature('force_switch', force_switch), cl.feature('is_team_preview', False)])
+        return {stimulus_source: nd.NumDict({metadata: 1.}, default=0.)}
+
+    def test_base_runs_in_profile(self, process: ProfileGate, stimulus_source):
+        result = process.call(self._given_stimulus(stimulus_source, force_switch=False))
+
+        assert cl.chunk('thunderbolt') in result
+
+    def test_base_is_severed_outside_profile(self, process: ProfileGate, stimulus_source):
+        result = process.call(self._given_stimulus(stimulus_source, force_switch=True))
+
+        assert len(result) == 0
@@ -0,0 +1,75 @@
+import pyClarion as cl
+import pytest
+
+from battlemaster.adapters.clarion_adapter import BattleConcept
+from battlemaster.clarion_ext.attention import GroupedChunkInstance
+from battlemaster.clarion_ext.knowledge import HiddenInformationLedger, SpeciesKnowledge
+
+
+def opponent_pokemon(species: str, *features: cl.feature) -> GroupedChunkInstance:
+    return GroupedChunkInstance(species, BattleConcept.OPPONENT_TEAM, [cl.feature('fainted', False), *features])
+
+
+class TestHiddenInformationLedger:
+    @pytest.fixture
+    def battle_tag(self) -> str:
+        return 'battle-gen9randombattle-1'
+
+    @pytest.fixture
+    def ledger(self, battle_tag) -> HiddenInformationLedger:
+        ledger = HiddenInformationLedger()
+        ledger.observe(battle_tag, [
+            opponent_pokemon('beldum', cl.feature('move', 'takedown'), cl.feature('ability', 'clearbody'), cl.feature('item', 'unknown_item')),
+            opponent_pokemon('litwick', cl.feature('ability', None), cl.feature('item', 'focussash'))
+        ])
+        return ledger
+
+    def test_counts_what_is_revealed(self, ledger, battle_tag):
+        hidden_information = ledger.hidden_information(battle_tag)
+
+        assert hidden_information.unknown_pokemon == 4
+        assert hidden_information.unknown_moves == 23
+        assert hidden_information.unknown_abilities == 5
+        assert hidden_information.unknown_items == 5
+
+    def test_knowledge_of_species(self, ledger, battle_tag):
+        knowledge = ledger.knowledge_of(battle_tag, 'beldum')
+
+        assert knowledge == SpeciesKnowledge(frozenset({'takedown'}), 'clearbody', None)
+        assert knowledge.unknown_moves == 3
+        assert not knowledge.is_item_known
+
+    def test_unseen_species_is_unknown(self, ledger, battle_tag):
+        assert ledger.knowledge_of(battle_tag, 'joltik') == SpeciesKnowledge()
+        assert ledger.knowledge_of('another-battle', 'beldum') == SpeciesKnowledge()
+
+    def test_revealed_information_only_grows(self, ledger, battle_tag):
+        ledger.observe(battle_tag, [opponent_pokemon('beldum', cl.feature('move', 'steelbeam'), cl.feature('item', 'choiceband'))])
+
+        knowledge = ledger.knowledge_of(battle_tag, 'beldum')
+        assert knowledge == SpeciesKnowledge(frozenset({'takedown', 'steelbeam'}), 'clearbody', 'choiceband')
+        assert ledger.hidden_information(battle_tag).unknown_moves == 22
+        assert ledger.hidden_information(battle_tag).unknown_items == 4
+
+    def test_complete_species_is_not_looked_at_again(self, battle_tag):
+        ledger = HiddenInformationLedger()
+        complete = opponent_pokemon('dratini', *[cl.feature('move', move) for move in ['wrap', 'agility', 'leer', 'extremespeed']],
+                                    cl.feature('ability', 'shedskin'), cl.feature('item', 'dragonscale'))
+        ledger.observe(battle_tag, [complete])
+
+        ledger.observe(battle_tag, [opponent_pokemon('dratini', cl.feature('item', 'leftovers'))])
+
+        assert ledger.knowledge_of(battle_tag, 'dratini').item == 'dragonscale'
+        assert ledger.hidden_information(battle_tag).unknown_moves == 20
+
+    def test_snapshot_is_a_copy(self, ledger, battle_tag):
+        snapshot = ledger.snapshot(battle_tag)
+        ledger.observe(battle_tag, [opponent_pokemon('joltik')])
+
+        assert set(snapshot.keys()) == {'beldum', 'litwick'}
+
+    def test_forget_battle(self, ledger, battle_tag):
+        ledger.forget_battle(battle_tag)
+
+        assert ledger.snapshot(battle_tag) == {}
+        assert ledger.hidden_information(battle_tag).unknown_pokemon == 6
@@ -6,11 +6,12 @@ import pytest
 
 from battlemaster.adapters.clarion_adapter import BattleConcept
 from battlemaster.clarion_ext.attention import GroupedChunk, GroupedChunkInstance
+from battlemaster.clarion_ext.execution import ExecutionProfile
 from battlemaster.clarion_ext.motivation import (
     goal, StickyBoltzmannSelector,
     drive, DoDamageDriveEvaluator, KoOpponentDriveEvaluator, DriveStrength, GroupedStimulus,
     KeepPokemonAliveEvaluator, KeepHealthyEvaluator, ConstantDriveEvaluator,
-    KeepTypeAdvantageDriveEvaluator, RevealHiddenInformationDriveEvaluator
+    KeepTypeAdvantageDriveEvaluator, RevealHiddenInformationDriveEvaluator, DriveEvaluator, DriveSummary
 )
 
 
@@ -65,6 +66,12 @@ class TestStickyBoltzmannSelector:
         assert goal('sleep') in result
         assert not goal('eat') in result
 
+    @pytest.mark.parametrize('given_previous_goal', [(goal('sleep'), 5.)], indirect=True)
+    def test_forget_battle_drops_previous_goal(self, process, battle_tag: str, given_previous_goal):
+        process.forget_battle(battle_tag)
+
+        assert battle_tag not in process._previous_goals
+
     @pytest.mark.parametrize('given_selection', [(goal('sleep'), 2.)], indirect=True)
     @pytest.mark.parametrize('given_previous_goal', [(goal('sleep'), 5.)], indirect=True)
     def test_stick_to_previous_goal_if_new_goal_is_the_same(self, process, inputs, goal_source, given_selection, given_previous_goal):
@@ -134,6 +141,51 @@ class TestDriveStrength:
         assert drive.DEBUFF_OPPONENT not in output
         assert output[drive.DEBUFF_OPPONENT] == output.default
 
+    def test_skipped_drive_is_not_evaluated_in_profile(self, stimulus_source, drive_evaluations, inputs):
+        process = DriveStrength(stimulus_source, drive_evaluations, skipped_drives={ExecutionProfile.FORCE_SWITCH: [drive.DO_DAMAGE]})
+        metadata = GroupedChunkInstance('metadata', BattleConcept.BATTLE, [cl.feature('force_switch', True), cl.feature('is_team_preview', False)])
+        inputs[stimulus_source] = nd.NumDict({**inputs[stimulus_source], metadata: 1.}, default=0.)
+
+        output = process.call(inputs)
+
+        assert drive.DO_DAMAGE not in output
+        assert output[drive.KO_OPPONENT] == 10.
+
+    def test_evaluators_share_the_turns_summary(self, stimulus_source, inputs):
+        class SummaryRecorder(DriveEvaluator):
+            def __init__(self):
+                self.summaries = []
+
+            def evaluate_summary(self, summary: DriveSummary) -> float:
+                self.summaries.append(summary)
+                return len(summary.stimulus[BattleConcept.TEAM])
+
+        first, second = SummaryRecorder(), SummaryRecorder()
+        process = DriveStrength(stimulus_source, {drive.DO_DAMAGE: first, drive.KO_OPPONENT: second})
+
+        output = process.call(inputs)
+
+        assert output[drive.DO_DAMAGE] == 2.
+        assert output[drive.KO_OPPONENT] == 2.
+        assert first.summaries[0] is second.summaries[0]
+
+    def test_battle_scoped_evaluators_forget_battle(self, stimulus_source, drive_evaluations):
+        evaluator = RevealHiddenInformationDriveEvaluator()
+        evaluator.ledger.observe('battle-1', [GroupedChunkInstance('joltik', BattleConcept.OPPONENT_TEAM, [])])
+        process = DriveStrength(stimulus_source, {**drive_evaluations, drive.REVEAL_HIDDEN_INFORMATION: evaluator})
+
+        process.forget_battle('battle-1')
+
+        assert evaluator.ledger.snapshot('battle-1') == {}
+
+    def test_stimulus_is_grouped_like_filtering_each_group(self, inputs, stimulus_source):
+        grouped_stimulus = DriveStrength._group_stimulus(inputs[stimulus_source])
+
+        assert set(grouped_stimulus.keys()) == set(BattleConcept)
+        assert set(grouped_stimulus[BattleConcept.TEAM].keys()) == {GroupedChunk('drapion', BattleConcept.TEAM), GroupedChunk('snorlax', BattleConcept.TEAM)}
+        assert set(grouped_stimulus[BattleConcept.OPPONENT_TEAM].keys()) == {GroupedChunk('joltik', BattleConcept.OPPONENT_TEAM)}
+        assert len(grouped_stimulus[BattleConcept.ACTIVE_POKEMON]) == 0
+
 
 class TestDoDamageDriveEvaluator:
     @pytest.fixture
@@ -333,6 +385,9 @@ class TestRevealHiddenInformationDriveEvaluator:
                 GroupedChunkInstance('litwick', BattleConcept.OPPONENT_TEAM,
                                      [cl.feature('ability', None), cl.feature('item', 'focussash'),
                                       cl.feature('fainted', False)]): 1.
+            }),
+            BattleConcept.BATTLE: nd.NumDict({
+                GroupedChunkInstance('metadata', BattleConcept.BATTLE, [cl.feature('tag', 'battle-gen9randombattle-1')]): 1.
             })
         }
 
@@ -340,35 +395,57 @@ class TestRevealHiddenInformationDriveEvaluator:
     def evaluator(self):
         return RevealHiddenInformationDriveEvaluator()
 
-    def test_count_pokemon(self, evaluator: RevealHiddenInformationDriveEvaluator, stimulus):
-        total, unknown = evaluator._count_unknown_pokemon(stimulus[BattleConcept.OPPONENT_ACTIVE_POKEMON], stimulus[BattleConcept.OPPONENT_TEAM])
+    @pytest.fixture
+    def hidden_information(self, evaluator, stimulus):
+        evaluator.evaluate(stimulus)
+        return evaluator.ledger.hidden_information('battle-gen9randombattle-1')
 
-        assert total == 6
-        assert unknown == 3
+    def test_count_pokemon(self, hidden_information):
+        assert hidden_information.total_pokemon == 6
+        assert hidden_information.unknown_pokemon == 3
 
-    def test_count_moves(self, evaluator: RevealHiddenInformationDriveEvaluator, stimulus):
-        total, unknown = evaluator._count_unknown_moves(6, stimulus[BattleConcept.OPPONENT_ACTIVE_POKEMON], stimulus[BattleConcept.OPPONENT_TEAM])
+    def test_count_moves(self, hidden_information):
+        assert hidden_information.total_moves == 24
+        assert hidden_information.unknown_moves == 19
 
-        assert total == 24
-        assert unknown == 19
+    def test_count_abilities(self, hidden_information):
+        assert hidden_information.total_abilities == 6
+        assert hidden_information.unknown_abilities == 4
 
-    def test_count_abilities(self, evaluator: RevealHiddenInformationDriveEvaluator, stimulus):
-        total, unknown = evaluator._count_unknown_abilities(6, stimulus[BattleConcept.OPPONENT_ACTIVE_POKEMON], stimulus[BattleConcept.OPPONENT_TEAM])
+    def test_count_items(self, hidden_information):
+        assert hidden_information.total_items == 6
+        assert hidden_information.unknown_items == 4
 
-        assert total == 6
-        assert unknown == 4
+    def test_evaluate(self, evaluator: RevealHiddenInformationDriveEvaluator, stimulus):
+        strength = evaluator.evaluate(stimulus)
 
-    def test_count_items(self, evaluator: RevealHiddenInformationDriveEvaluator, stimulus):
-        total, unknown = evaluator._count_unknown_items(6, stimulus[BattleConcept.OPPONENT_ACTIVE_POKEMON], stimulus[BattleConcept.OPPONENT_TEAM])
+        assert strength == 5 * 30/42
 
-        assert total == 6
-        assert unknown == 4
+    def test_revealed_information_is_remembered(self, evaluator: RevealHiddenInformationDriveEvaluator, stimulus):
+        evaluator.evaluate(stimulus)
+        stimulus[BattleConcept.OPPONENT_TEAM] = nd.NumDict({})
 
-    def test_evaluate(self, evaluator: RevealHiddenInformationDriveEvaluator, stimulus):
         strength = evaluator.evaluate(stimulus)
 
         assert strength == 5 * 30/42
 
+    def test_ledger_kept_elsewhere_is_only_read(self, stimulus):
+        evaluator = RevealHiddenInformationDriveEvaluator(observe=False)
+
+        strength = evaluator.evaluate(stimulus)
+
+        assert strength == 5.
+        assert evaluator.ledger.snapshot('battle-gen9randombattle-1') == {}
+
+    def test_forgotten_battle_is_recounted(self, evaluator: RevealHiddenInformationDriveEvaluator, stimulus):
+        evaluator.evaluate(stimulus)
+        evaluator.forget_battle('battle-gen9randombattle-1')
+        stimulus[BattleConcept.OPPONENT_TEAM] = nd.NumDict({})
+
+        strength = evaluator.evaluate(stimulus)
+
+        assert strength == 5 * 35/42
+
 
 class TestConstantDriveEvaluator:
     def test_evaluate(self):
@@ -0,0 +1,125 @@
+import numpy as np
+import pyClarion as cl
+from pyClarion import nd
+import pytest
+
+from battlemaster.adapters.clarion_adapter import BattleConcept
+from battlemaster.clarion_ext.attention import GroupedChunkInstance
+from battlemaster.clarion_ext.sampling import BattleRandomStreams, BoltzmannSampler, SeededBoltzmannSelector, boltzmann, draw
+
+
+class TestBattleRandomStreams:
+    def test_seeded_streams_are_reproducible(self):
+        first = BattleRandomStreams(42).generator('battle-1').random(5)
+        second = BattleRandomStreams(42).generator('battle-1').random(5)
+
+        assert np.array_equal(first, second)
+
+    def test_battles_have_their_own_stream(self):
+        streams = BattleRandomStreams(42)
+
+        assert streams.generator('battle-1').random() != streams.generator('battle-2').random()
+
+    def test_stream_does_not_depend_on_other_battles(self):
+        streams = BattleRandomStreams(42)
+        streams.generator('battle-2').random(10)
+
+        assert streams.generator('battle-1').random() == BattleRandomStreams(42).generator('battle-1').random()
+
+    def test_forgotten_battle_restarts_its_stream(self):
+        streams = BattleRandomStreams(42)
+        first = streams.generator('battle-1').random()
+        streams.forget_battle('battle-1')
+
+        assert streams.generator('battle-1').random() == first
+
+    def test_negative_seed_is_rejected(self):
+        with pytest.raises(ValueError):
+            BattleRandomStreams(-1)
+
+
+class TestBoltzmann:
+    def test_matches_softmax(self):
+        strengths = np.array([1., 2., 3.])
+
+        probabilities = boltzmann(strengths, 0.5)
+
+        expected = np.exp(strengths / 0.5) / np.sum(np.exp(strengths / 0.5))
+        assert np.allclose(probabilities, expected)
+
+    def test_padding_has_no_probability(self):
+        probabilities = boltzmann(np.array([[1., 1., -np.inf]]), 1.)
+
+        assert np.allclose(probabilities, [[0.5, 0.5, 0.]])
+
+    @pytest.mark.parametrize("uniform, expected_index", [(0., 0), (0.2, 0), (0.25, 1), (0.6, 1), (0.75, 2), (0.9999, 2)])
+    def test_draw(self, uniform, expected_index):
+        assert draw(np.array([[0.25, 0.5, 0.25]]), np.array([uniform]))[0] == expected_index
+
+
+class TestBoltzmannSampler:
+    @pytest.fixture
+    def sampler(self) -> BoltzmannSampler:
+        return BoltzmannSampler(BattleRandomStreams(7), temperature=0.2)
+
+    def test_nothing_to_sample(self, sampler):
+        assert sampler.sample('battle-1', nd.NumDict({}, default=0.)) is None
+
+    def test_samples_a_symbol_of_the_strengths(self, sampler):
+        strengths = nd.NumDict({cl.chunk('tackle'): 1., cl.chunk('ember'): 0.5}, default=0.)
+
+        assert sampler.sample('battle-1', strengths) in {cl.chunk('tackle'), cl.chunk('ember')}
+
+    def test_batch_samples_like_single_battles(self):
+        strengths = [
+            nd.NumDict({cl.chunk('tackle'): 1., cl.chunk('ember'): 0.9}, default=0.),
+            nd.NumDict({}, default=0.),
+            nd.NumDict({cl.chunk('surf'): 0.3, cl.chunk('growl'): 0.2, cl.chunk('protect'): 0.4}, default=0.)
+        ]
+        battle_tags = ['battle-1', 'battle-2', 'battle-3']
+        single = BoltzmannSampler(BattleRandomStreams(7), temperature=0.2)
+        batch = BoltzmannSampler(BattleRandomStreams(7), temperature=0.2)
+
+        for _ in range(20):
+            expected = [single.sample(battle_tag, battle_strengths) for battle_tag, battle_strengths in zip(battle_tags, strengths)]
+            assert batch.sample_many(battle_tags, strengths) == expected
+
+    def test_follows_the_boltzmann_distribution(self, sampler):
+        strengths = nd.NumDict({cl.chunk('tackle'): 0.4, cl.chunk('ember'): 0.2}, default=0.)
+
+        samples = [sampler.sample('battle-1', strengths) for _ in range(4000)]
+
+        expected = 1 / (1 + np.exp(-0.2 / 0.2))
+        assert samples.count(cl.chunk('tackle')) / len(samples) == pytest.approx(expected, abs=0.03)
+
+
+class TestSeededBoltzmannSelector:
+    @pytest.fixture
+    def source(self) -> cl.Symbol:
+        return cl.chunks('out')
+
+    @pytest.fixture
+    def stimulus_source(self) -> cl.Symbol:
+        return cl.buffer('stimulus')
+
+    @pytest.fixture
+    def inputs(self, source, stimulus_source):
+        metadata = GroupedChunkInstance('metadata', BattleConcept.BATTLE, [cl.feature('tag', 'battle-1')])
+        return {
+            source: nd.NumDict({cl.chunk('tackle'): 1., cl.chunk('ember'): 0.9, cl.chunk('growl'): 0.}, default=0.),
+            stimulus_source: nd.NumDict({metadata: 1.}, default=0.)
+        }
+
+    def test_emits_one_symbol_at_full_strength(self, source, stimulus_source, inputs):
+        process = SeededBoltzmannSelector(source, stimulus_source, BattleRandomStreams(3), temperature=0.2, threshold=0.)
+
+        output = process.call(inputs)
+
+        assert len(output) == 1
+        assert list(output.values()) == [1.]
+
+    def test_same_seed_selects_the_same(self, source, stimulus_source, inputs):
+        first = SeededBoltzmannSelector(source, stimulus_source, BattleRandomStreams(3), temperature=0.2, threshold=0.)
+        second = SeededBoltzmannSelector(source, stimulus_source, BattleRandomStreams(3), temperature=0.2, threshold=0.)
+
+        assert [list(first.call(inputs).keys()) for _ in range(10)] == [list(second.call(inputs).keys()) for _ in range(10)]
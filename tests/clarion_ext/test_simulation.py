@@ -0,0 +1,124 @@
+from concurrent.futures import Future
+from time import monotonic
+from typing import Optional
+from unittest.mock import Mock
+
+import pyClarion as cl
+from pyClarion import nd
+import pytest
+
+from battlemaster.adapters.clarion_adapter import BattleConcept
+from battlemaster.adapters.poke_engine_adapter import SearchStats, BattleStimulusAdapter, OptionFilter, Simulator
+from battlemaster.clarion_ext.attention import GroupedChunkInstance
+from battlemaster.clarion_ext.motivation import goal, GoalType
+from battlemaster.clarion_ext.simulation import CollectSimulation, PendingSimulation, LaunchSimulation, search_safest_move
+
+
+def _given_inputs(battle_tag: str):
+    metadata = GroupedChunkInstance('metadata', BattleConcept.BATTLE, [cl.feature('tag', battle_tag)])
+    return {cl.buffer('stimulus'): nd.NumDict({metadata: 1.}, default=0.)}
+
+
+class TestLaunchSimulation:
+    @pytest.fixture
+    def executor(self) -> Mock:
+        return Mock()
+
+    @pytest.fixture
+    def process(self, executor: Mock, monkeypatch) -> LaunchSimulation:
+        monkeypatch.setattr(BattleStimulusAdapter, 'from_stimulus', Mock(return_value='simulation'))
+        return LaunchSimulation(cl.buffer('stimulus'), cl.buffer('goal'), Mock(spec=Simulator), executor, PendingSimulation(),
+                                timeout=5., move_priority_sources=[cl.buffer('effective_moves')],
+                                switch_priority_sources=[cl.buffer('effective_switches'), cl.buffer('defensive_switches')])
+
+    def test_search_is_launched_with_efficacy_priority(self, process: LaunchSimulation, executor: Mock):
+        inputs = _given_inputs('battle-1')
+        inputs[cl.buffer('goal')] = nd.NumDict({goal('attack', GoalType.MOVE): 1.}, default=0.)
+        inputs[cl.buffer('effective_moves')] = nd.NumDict({cl.chunk('thunderbolt'): .8}, default=0.)
+        inputs[cl.buffer('effective_switches')] = nd.NumDict({cl.chunk('pikachu'): .3}, default=0.)
+        inputs[cl.buffer('defensive_switches')] = nd.NumDict({cl.chunk('pikachu'): .6}, default=0.)
+
+        result = process.call(inputs)
+
+        assert len(result) == 0
+        executor.submit.assert_called_once_with(search_safest_move, process._simulator, 'simulation', OptionFilter.MOVES,
+                                                {'thunderbolt': .8, 'switch pikachu': .6})
+
+
+class TestCollectSimulation:
+    @pytest.fixture
+    def pending(self) -> PendingSimulation:
+        return PendingSimulation()
+
+    @pytest.fixture
+    def process(self, pending: PendingSimulation) -> CollectSimulation:
+        return CollectSimulation(cl.chunks('launch'), cl.buffer('stimulus'), pending)
+
+    @staticmethod
+    def _given_search(pending: PendingSimulation, deadline: float, battle_tag: str = 'battle-1') -> Future:
+        future = Future()
+        pending.put(battle_tag, future, deadline)
+        return future
+
+    @staticmethod
+    def _given_result(future: Future, action: Optional[str]):
+        future.set_result((action, SearchStats()))
+
+    def test_nothing_launched_has_no_activation(self, process: CollectSimulation):
+        assert len(process.call(_given_inputs('battle-1'))) == 0
+
+    @pytest.mark.parametrize('action, expected_chunk', [
+        ('thunderbolt', cl.chunk('thunderbolt')),
+        ('switch pikachu', cl.chunk('pikachu')),
+    ])
+    def test_finished_search_activates_action(self, process: CollectSimulation, pending, action: str, expected_chunk: cl.chunk):
+        self._given_result(self._given_search(pending, monotonic() + 5), action)
+
+        result = process.call(_given_inputs('battle-1'))
+
+        assert result[expected_chunk] == 1.
+
+    def test_search_past_deadline_has_no_activation(self, process: CollectSimulation, pending):
+        future = self._given_search(pending, monotonic() - 1)
+
+        result = process.call(_given_inputs('battle-1'))
+
+        assert len(result) == 0
+        assert future.cancelled()
+
+    def test_failed_search_has_no_activation(self, process: CollectSimulation, pending):
+        self._given_search(pending, monotonic() + 5).set_exception(RuntimeError('no state'))
+
+        assert len(process.call(_given_inputs('battle-1'))) == 0
+
+    def test_search_is_only_collected_once(self, process: CollectSimulation, pending):
+        self._given_result(self._given_search(pending, monotonic() + 5), 'thunderbolt')
+        process.call(_given_inputs('battle-1'))
+
+        assert len(process.call(_given_inputs('battle-1'))) == 0
+
+    def test_search_of_another_battle_is_not_collected(self, process: CollectSimulation, pending):
+        self._given_result(self._given_search(pending, monotonic() + 5, battle_tag='battle-1'), 'thunderbolt')
+
+        assert len(process.call(_given_inputs('battle-2'))) == 0
+        assert len(process.call(_given_inputs('battle-1'))) == 1
+
+    def test_forgotten_battle_cancels_its_search(self, process: CollectSimulation, pending):
+        future = self._given_search(pending, monotonic() + 5)
+
+        process.forget_battle('battle-1')
+
+        assert future.cancelled()
+        assert len(process.call(_given_inputs('battle-1'))) == 0
+
+
+class TestPendingSimulation:
+    def test_new_search_replaces_uncollected_one(self):
+        pending = PendingSimulation()
+        stale, fresh = Future(), Future()
+        pending.put('battle-1', stale, 0.)
+
+        pending.put('battle-1', fresh, 1.)
+
+        assert stale.cancelled()
+        assert pending.take('battle-1') == (fresh, 1.)
@@ -0,0 +1,53 @@
+import pytest
+
+from battlemaster.perf.results import Timing, compare, save_results, load_medians, format_results, format_comparisons
+
+
+def test_timing_summarizes_samples():
+    timing = Timing([3., 1., 2.])
+
+    assert timing.runs == 3
+    assert timing.median_ms == 2.
+    assert timing.min_ms == 1.
+    assert timing.max_ms == 3.
+
+
+def test_timing_requires_samples():
+    with pytest.raises(ValueError):
+        Timing([])
+
+
+def test_save_and_load_medians(tmp_path):
+    path = str(tmp_path / 'results.json')
+    save_results({'perception_factory.map': {'early_game': Timing([1., 2., 3.])}}, path, repeat=3)
+
+    assert load_medians(path) == {'perception_factory.map': {'early_game': 2.}}
+
+
+@pytest.mark.parametrize('current_ms, regressed', [
+    (1.19, False),
+    (1.21, True),
+    (0.5, False),
+])
+def test_compare_flags_regressions_beyond_tolerance(current_ms, regressed):
+    results = {'mind_adapter.perceive': {'early_game': Timing([current_ms])}}
+    baseline = {'mind_adapter.perceive': {'early_game': 1.}}
+
+    comparisons = compare(results, baseline, tolerance=0.2)
+
+    assert len(comparisons) == 1
+    assert comparisons[0].regressed == regressed
+
+
+def test_compare_skips_benchmarks_missing_from_baseline():
+    results = {'mind_adapter.perceive': {'early_game': Timing([1.])}, 'new_benchmark': {'early_game': Timing([1.])}}
+    baseline = {'mind_adapter.perceive': {'force_switch': 1.}}
+
+    assert compare(results, baseline, tolerance=0.2) == []
+
+
+def test_format_tables():
+    results = {'mind_adapter.perceive': {'early_game': Timing([2.])}}
+
+    assert 'mind_adapter.perceive | early_game' in format_results(results)
+    assert 'REGRESSED' in format_comparisons(compare(results, {'mind_adapter.perceive': {'early_game': 1.}}, 0.2))
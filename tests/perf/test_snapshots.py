@@ -0,0 +1,60 @@
+from typing import Dict
+
+import pytest
+
+from battlemaster.perf.snapshots import BattleSnapshot, load_snapshots
+
+
+@pytest.fixture(scope='module')
+def snapshots() -> Dict[str, BattleSnapshot]:
+    return {snapshot.name: snapshot for snapshot in load_snapshots()}
+
+
+def test_corpus_covers_scenarios(snapshots: Dict[str, BattleSnapshot]):
+    assert set(snapshots) == {'early_game', 'force_switch', 'team_preview', 'late_game_1v1'}
+
+
+def test_early_game(snapshots: Dict[str, BattleSnapshot]):
+    battle = snapshots['early_game'].to_battle()
+
+    assert battle.turn == 2
+    assert battle.active_pokemon.species == 'garchomp'
+    assert battle.opponent_active_pokemon.species == 'greattusk'
+    assert [move.id for move in battle.available_moves] == ['earthquake', 'outrage', 'swordsdance', 'stoneedge']
+    assert len(battle.available_switches) == 5
+
+
+def test_force_switch(snapshots: Dict[str, BattleSnapshot]):
+    battle = snapshots['force_switch'].to_battle()
+
+    assert battle.force_switch
+    assert battle.active_pokemon.fainted
+    assert battle.available_moves == []
+    assert len(battle.available_switches) == 5
+
+
+def test_team_preview(snapshots: Dict[str, BattleSnapshot]):
+    battle = snapshots['team_preview'].to_battle()
+
+    assert battle.teampreview
+    assert battle.active_pokemon is None
+    assert len(battle.team) == 6
+    assert len(battle.opponent_team) == 6
+
+
+def test_late_game_1v1(snapshots: Dict[str, BattleSnapshot]):
+    battle = snapshots['late_game_1v1'].to_battle()
+
+    assert battle.active_pokemon.species == 'dragonite'
+    assert battle.available_switches == []
+    assert sum(not pokemon.fainted for pokemon in battle.team.values()) == 1
+    assert sum(not pokemon.fainted for pokemon in battle.opponent_team.values()) == 1
+    assert len(battle.weather) == 1
+    assert len(battle.fields) == 1
+    assert len(battle.side_conditions) == 1
+
+
+def test_replaying_twice_gives_independent_battles(snapshots: Dict[str, BattleSnapshot]):
+    snapshot = snapshots['early_game']
+
+    assert snapshot.to_battle() is not snapshot.to_battle()
@@ -0,0 +1,47 @@
+from unittest.mock import Mock
+
+from battlemaster.perf.snapshots import BattleSnapshot
+from battlemaster.perf.stress import StageReport, states_to_save
+
+
+def snapshot(name: str) -> BattleSnapshot:
+    return Mock(spec=BattleSnapshot, name=name)
+
+
+class TestStageReport:
+    def test_keeps_slowest_states(self):
+        report = StageReport('simulator.pick_safest_move', slowest=2)
+        snapshots = [snapshot(f'state-{index}') for index in range(5)]
+        for seconds, state in zip([0.003, 0.001, 0.005, 0.002, 0.004], snapshots):
+            report.record(state, seconds)
+
+        assert [state for _, state in report.slowest] == [snapshots[2], snapshots[4]]
+        assert report.states == 5
+
+    def test_throughput(self):
+        report = StageReport('perception_factory.map', slowest=1)
+        report.record(snapshot('a'), 0.25)
+        report.record(snapshot('b'), 0.25)
+
+        assert report.states_per_second == 4.
+        assert report.mean_ms == 250.
+
+    def test_errors_are_grouped(self):
+        report = StageReport('simulation_adapter.from_battle', slowest=1)
+        first, second = snapshot('a'), snapshot('b')
+        report.record_error(first, KeyError('tackle'))
+        report.record_error(second, KeyError('tackle'))
+
+        assert report.errors == {"KeyError: 'tackle'": 2}
+        assert report.failed["KeyError: 'tackle'"] is first
+
+
+def test_states_to_save_includes_slow_and_failing_states():
+    report = StageReport('mind_adapter.perceive', slowest=2)
+    fast, slow, failing = (BattleSnapshot(name, '', '', '', [], {}) for name in ('fast', 'slow', 'failing'))
+    report.record(fast, 0.001)
+    report.record(slow, 0.5)
+    report.record_error(failing, ValueError())
+
+    assert set(states_to_save([report], slow_ms=100)) == {'slow', 'failing'}
+    assert set(states_to_save([report])) == {'fast', 'slow', 'failing'}
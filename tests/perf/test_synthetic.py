@@ -0,0 +1,67 @@
+import pytest
+
+from battlemaster.perf.synthetic import SyntheticBattleGenerator
+from battlemaster.perf.snapshots import BattleSnapshot, save_snapshot, load_snapshots
+
+
+@pytest.fixture
+def generator(pokemon_database) -> SyntheticBattleGenerator:
+    return SyntheticBattleGenerator(seed=7, gen_data=pokemon_database)
+
+
+def test_generated_states_are_valid_battles(generator: SyntheticBattleGenerator):
+    for snapshot in generator.generate_many(300):
+        battle = snapshot.to_battle()
+
+        assert battle.active_pokemon is not None
+        assert battle.opponent_active_pokemon is not None
+        assert len(battle.team) == 6
+        if battle.force_switch:
+            assert battle.active_pokemon.fainted
+        else:
+            assert len(battle.available_moves) == 4
+
+
+def test_generated_openings_are_first_turns(generator: SyntheticBattleGenerator):
+    for snapshot in generator.generate_openings(100):
+        battle = snapshot.to_battle()
+
+        assert battle.turn == 1
+        assert not battle.force_switch
+        assert battle.opponent_active_pokemon is not None
+        assert len(battle.available_moves) == 4
+        assert len(battle.available_switches) == 5
+        assert all(move.current_pp == move.max_pp for move in battle.available_moves)
+
+
+def test_same_seed_and_index_give_same_state(generator: SyntheticBattleGenerator, pokemon_database):
+    other_generator = SyntheticBattleGenerator(seed=7, gen_data=pokemon_database)
+
+    assert generator.generate(42).to_json() == other_generator.generate(42).to_json()
+
+
+def test_different_seeds_give_different_states(generator: SyntheticBattleGenerator, pokemon_database):
+    other_generator = SyntheticBattleGenerator(seed=8, gen_data=pokemon_database)
+
+    assert generator.generate(42).messages != other_generator.generate(42).messages
+
+
+def test_states_vary(generator: SyntheticBattleGenerator):
+    battles = [snapshot.to_battle() for snapshot in generator.generate_many(300)]
+
+    assert any(battle.force_switch for battle in battles)
+    assert any(battle.weather for battle in battles)
+    assert any(battle.fields for battle in battles)
+    assert any(battle.side_conditions for battle in battles)
+    assert any(battle.opponent_active_pokemon.status is not None for battle in battles)
+    assert any(battle.active_pokemon.boosts['atk'] != 0 or battle.opponent_active_pokemon.boosts['atk'] != 0 for battle in battles)
+
+
+def test_saved_state_can_be_replayed(generator: SyntheticBattleGenerator, tmp_path):
+    snapshot = generator.generate(3)
+
+    save_snapshot(snapshot, str(tmp_path))
+    loaded, = load_snapshots(str(tmp_path))
+
+    assert isinstance(loaded, BattleSnapshot)
+    assert loaded.to_json() == snapshot.to_json()
@@ -1,4 +1,5 @@
-from unittest.mock import Mock, MagicMock
+import asyncio
+from unittest.mock import Mock, MagicMock, AsyncMock
 from typing import Optional, List
 
 from poke_env.environment import Battle, Move, Pokemon, PokemonType
@@ -6,11 +7,15 @@ import pytest
 import pyClarion as cl
 from pyClarion import nd
 
-from battlemaster.agents import BattleMasterPlayer
+from battlemaster.agents import BattleMasterPlayer, FinishedBattle
 from battlemaster.adapters.clarion_adapter import MindAdapter, PerceptionFactory, BattleConcept
 from battlemaster.clarion_ext.attention import GroupedStimulusInput
 from battlemaster.clarion_ext.effort import Effort
 from battlemaster.clarion_ext.motivation import drive
+from battlemaster.tracing import DecisionTracer
+from battlemaster.load import LoadMonitor
+from battlemaster.speculation import Speculator
+from battlemaster.opening_book import OpeningBook, BookEntry
 
 
 def _given_move(name: str) -> Move:
@@ -23,6 +28,7 @@ def _given_move(name: str) -> Move:
 def battle():
     battle = Mock(spec=Battle)
     battle.available_switches = []
+    battle._wait = False
     battle.can_mega_evolve = False
     battle.can_dynamax = False
     battle.can_tera = False
@@ -47,6 +53,14 @@ class TestBattleMasterPlayerUnitTests:
 
         assert issued_action.order.id == 'bodyslam'
 
+    def test_perceived_turn_is_not_observed_again(self, player: BattleMasterPlayer, battle, mind_adapter):
+        mind_adapter.choose_action = MagicMock(return_value='bodyslam')
+        battle.available_moves = [_given_move('sleeptalk'), _given_move('bodyslam')]
+
+        player.choose_move(battle)
+
+        mind_adapter.observe.assert_not_called()
+
     def test_choose_move_selects_random_if_chosen_move_is_not_available(self, player: BattleMasterPlayer, battle, mind_adapter):
         mind_adapter.choose_action = MagicMock(return_value='hyperbeam')
         battle.available_moves = [_given_move('sleeptalk')]
@@ -63,6 +77,163 @@ class TestBattleMasterPlayerUnitTests:
 
         assert issued_action.order.id == 'gigaimpact'
 
+    def test_choose_move_traces_fallback(self, mind_adapter, battle):
+        tracer = Mock(spec=DecisionTracer)
+        player = BattleMasterPlayer(mind_adapter, tracer=tracer, start_listening=False)
+        mind_adapter.choose_action = MagicMock(return_value='hyperbeam')
+        battle.available_moves = [_given_move('sleeptalk'), _given_move('snore')]
+
+        issued_action = player.choose_move(battle)
+
+        tracer.start.assert_called_once_with(battle.battle_tag, battle.turn)
+        tracer.finish.assert_called_once_with(issued_action.message, True)
+
+
+    def test_choose_move_records_decision_latency(self, mind_adapter, battle):
+        load_monitor = LoadMonitor(target_ms=100)
+        player = BattleMasterPlayer(mind_adapter, load_monitor=load_monitor, start_listening=False)
+        mind_adapter.choose_action = MagicMock(return_value='bodyslam')
+        battle.available_moves = [_given_move('sleeptalk'), _given_move('bodyslam')]
+
+        player.choose_move(battle)
+
+        assert load_monitor.latency_ms is not None
+
+    def test_speculates_after_deciding(self, mind_adapter, battle):
+        speculator = Mock(spec=Speculator)
+        player = BattleMasterPlayer(mind_adapter, speculator=speculator, start_listening=False)
+        mind_adapter.choose_action = MagicMock(return_value='bodyslam')
+        battle.available_moves = [_given_move('sleeptalk'), _given_move('bodyslam')]
+
+        issued_action = player.choose_move(battle)
+
+        speculator.cancel.assert_called_once_with(battle.battle_tag)
+        speculator.speculate.assert_called_once_with(battle.battle_tag, mind_adapter.perceive.return_value, issued_action,
+                                                     mind_adapter.opponent_knowledge.return_value)
+
+    def test_does_not_speculate_on_fallback(self, mind_adapter, battle):
+        speculator = Mock(spec=Speculator)
+        player = BattleMasterPlayer(mind_adapter, speculator=speculator, start_listening=False)
+        mind_adapter.choose_action = MagicMock(return_value='hyperbeam')
+        battle.available_moves = [_given_move('sleeptalk'), _given_move('snore')]
+
+        player.choose_move(battle)
+
+        speculator.speculate.assert_not_called()
+
+    def test_timer_is_read_from_battle_messages(self, mind_adapter):
+        load_monitor = LoadMonitor(target_ms=100)
+        player = BattleMasterPlayer(mind_adapter, load_monitor=load_monitor, start_listening=False)
+        player._battles['battle-gen9randombattle-1'] = Mock(spec=Battle)
+
+        asyncio.run(player._handle_battle_message([['>battle-gen9randombattle-1'], ['', 'inactive', 'Time left: 45 sec this turn ', ' 120 sec total']]))
+
+        assert load_monitor.time_left('battle-gen9randombattle-1') == 45
+
+    def test_single_option_skips_mind(self, player: BattleMasterPlayer, battle, mind_adapter):
+        battle.available_moves = [_given_move('outrage')]
+
+        issued_action = player.choose_move(battle)
+
+        assert issued_action.order.id == 'outrage'
+        mind_adapter.perceive.assert_not_called()
+
+    def test_single_option_still_observes_battle(self, player: BattleMasterPlayer, battle, mind_adapter):
+        battle.available_moves = [_given_move('outrage')]
+
+        player.choose_move(battle)
+
+        mind_adapter.observe.assert_called_once_with(battle)
+
+    def test_single_switch_on_force_switch_skips_mind(self, player: BattleMasterPlayer, battle, mind_adapter):
+        switch = Mock(spec=Pokemon)
+        battle.available_moves = []
+        battle.available_switches = [switch]
+
+        issued_action = player.choose_move(battle)
+
+        assert issued_action.order is switch
+        mind_adapter.perceive.assert_not_called()
+
+    def test_wait_skips_mind(self, player: BattleMasterPlayer, battle, mind_adapter):
+        battle._wait = True
+        battle.available_moves = []
+
+        issued_action = player.choose_move(battle)
+
+        assert issued_action.message == '/choose default'
+        mind_adapter.perceive.assert_not_called()
+
+    def test_single_option_with_gimmick_skips_mind(self, player: BattleMasterPlayer, battle, mind_adapter):
+        battle.can_tera = PokemonType.DRAGON
+        battle.available_moves = [_given_move('outrage')]
+
+        issued_action = player.choose_move(battle)
+
+        assert issued_action.order.id == 'outrage'
+        mind_adapter.perceive.assert_not_called()
+
+    def test_first_turn_is_answered_from_opening_book(self, mind_adapter, battle):
+        opening_book = Mock(spec=OpeningBook)
+        opening_book.opening = MagicMock(return_value='bodyslam')
+        player = BattleMasterPlayer(mind_adapter, opening_book=opening_book, start_listening=False)
+        battle.available_moves = [_given_move('sleeptalk'), _given_move('bodyslam')]
+
+        issued_action = player.choose_move(battle)
+
+        assert issued_action.order.id == 'bodyslam'
+        mind_adapter.perceive.assert_not_called()
+
+    def test_unavailable_book_option_uses_mind(self, mind_adapter, battle):
+        opening_book = OpeningBook()
+        opening_book.add('snorlax', 'eevee', BookEntry('hyperbeam', 0.5))
+        player = BattleMasterPlayer(mind_adapter, opening_book=opening_book, start_listening=False)
+        mind_adapter.choose_action = MagicMock(return_value='sleeptalk')
+        battle.turn, battle.force_switch = 1, False
+        battle.active_pokemon, battle.opponent_active_pokemon = Mock(species='snorlax'), Mock(species='eevee')
+        battle.available_moves = [_given_move('sleeptalk'), _given_move('bodyslam')]
+
+        issued_action = player.choose_move(battle)
+
+        assert issued_action.order.id == 'sleeptalk'
+        mind_adapter.perceive.assert_called_once_with(battle)
+        assert (opening_book.hits, opening_book.misses) == (0, 1)
+
+    def test_team_preview_is_answered_from_opening_book(self, mind_adapter, battle):
+        opening_book = Mock(spec=OpeningBook)
+        opening_book.team_order = MagicMock(return_value='/team 312456')
+        player = BattleMasterPlayer(mind_adapter, opening_book=opening_book, start_listening=False)
+
+        assert player.teampreview(battle) == '/team 312456'
+
+    def test_finished_battle_is_forgotten_and_evicted(self, player: BattleMasterPlayer, battle, mind_adapter):
+        battle.battle_tag = 'gen9randombattle-123'
+        battle.opponent_username = 'Sir Skaro'
+        battle.won, battle.lost, battle.finished = True, False, True
+        player._battles[battle.battle_tag] = battle
+
+        player._battle_finished_callback(battle)
+
+        mind_adapter.forget.assert_called_once_with('gen9randombattle-123')
+        assert isinstance(player.battles['gen9randombattle-123'], FinishedBattle)
+        assert player.n_won_battles == 1
+
+    @pytest.mark.parametrize('error', [
+        "[Invalid choice] Can't switch: The active Pok\u00e9mon is trapped",
+        "[Invalid choice] Can't move: Your Snorlax's Body Slam is disabled",
+        "[Invalid choice] Can't switch: You can't switch to an active Pok\u00e9mon",
+    ])
+    def test_late_error_of_finished_battle_is_ignored(self, player: BattleMasterPlayer, battle, error: str):
+        battle.battle_tag = 'battle-gen9randombattle-1'
+        battle.opponent_username = 'Sir Skaro'
+        battle.won, battle.lost, battle.finished = True, False, True
+        player._battle_finished_callback(battle)
+        player.ps_client.send_message = AsyncMock()
+
+        asyncio.run(player._handle_battle_message([['>battle-gen9randombattle-1'], ['', 'error', error]]))
+
+        player.ps_client.send_message.assert_not_called()
+
 
 class TestBattleMasterPlayerComponentTests:
     @pytest.fixture
@@ -0,0 +1,110 @@
+from unittest.mock import Mock
+
+import pytest
+from poke_env.player import Player
+from poke_env.environment import Battle
+
+from battlemaster.benchmarking import BenchmarkResult, collect_results, format_results_table, merge_results, split_battles, \
+    tally_results
+
+
+def _given_battle(opponent: str, won: bool, finished: bool = True) -> Battle:
+    battle = Mock(spec=Battle)
+    battle.opponent_username = opponent
+    battle.finished = finished
+    battle.won = finished and won
+    battle.lost = finished and not won
+    return battle
+
+
+def _given_player(username: str) -> Player:
+    player = Mock(spec=Player)
+    player.username = username
+    return player
+
+
+class TestBenchmarkResult:
+    def test_win_rate(self):
+        result = BenchmarkResult('random', wins=3, losses=1)
+
+        assert result.battles == 4
+        assert result.win_rate == 0.75
+
+    def test_win_rate_without_battles(self):
+        assert BenchmarkResult('random').win_rate == 0.
+
+    def test_merge(self):
+        merged = BenchmarkResult('random', 1, 2, 0).merge(BenchmarkResult('random', 3, 0, 1))
+
+        assert (merged.wins, merged.losses, merged.ties) == (4, 2, 1)
+
+    def test_merge_rejects_different_baselines(self):
+        with pytest.raises(ValueError):
+            BenchmarkResult('random').merge(BenchmarkResult('max_damage'))
+
+
+def test_collect_results_groups_battles_by_baseline():
+    agent = _given_player('btlmaster')
+    agent.battles = {
+        'battle-1': _given_battle('RandomPlayer 1', won=True),
+        'battle-2': _given_battle('RandomPlayer 1', won=False),
+        'battle-3': _given_battle('MaxDamagePlayer 1', won=True),
+        'battle-4': _given_battle('MaxDamagePlayer 1', won=True, finished=False),
+        'battle-5': _given_battle('Sir Skaro', won=True),
+    }
+    baselines = {'random': _given_player('RandomPlayer 1'), 'max_damage': _given_player('MaxDamagePlayer 1')}
+
+    results = {result.baseline: result for result in collect_results(agent, baselines)}
+
+    assert (results['random'].wins, results['random'].losses) == (1, 1)
+    assert (results['max_damage'].wins, results['max_damage'].losses) == (1, 0)
+
+
+def test_format_results_table():
+    table = format_results_table([BenchmarkResult('random', 1, 1), BenchmarkResult('exp_minmax', 0, 2)])
+    lines = table.splitlines()
+
+    assert len(lines) == 4
+    assert lines[0].startswith('baseline')
+    assert 'random' in lines[2] and '50.0%' in lines[2]
+    assert 'exp_minmax' in lines[3] and '0.0%' in lines[3]
+
+
+def test_merge_results():
+    shard_results = [
+        [BenchmarkResult('random', 2, 0), BenchmarkResult('max_damage', 1, 1)],
+        [BenchmarkResult('random', 1, 1), BenchmarkResult('max_damage', 0, 2)],
+    ]
+
+    merged = {result.baseline: result for result in merge_results(shard_results)}
+
+    assert (merged['random'].wins, merged['random'].losses) == (3, 1)
+    assert (merged['max_damage'].wins, merged['max_damage'].losses) == (1, 3)
+
+
+@pytest.mark.parametrize("number_battles, shards, expected_sizes", [
+    (10, 3, [4, 3, 3]),
+    (9, 3, [3, 3, 3]),
+    (2, 4, [1, 1]),
+])
+def test_split_battles(number_battles: int, shards: int, expected_sizes):
+    assert split_battles(number_battles, shards) == expected_sizes
+
+
+def test_split_battles_requires_a_shard():
+    with pytest.raises(ValueError):
+        split_battles(10, 0)
+
+
+def test_tally_results_matches_usernames_regardless_of_case():
+    agent = _given_player('btlmaster')
+    agent.battles = {
+        'battle-1': _given_battle('RandomPlayer 1', won=True),
+        'battle-2': _given_battle('ExpectiminimaxP 1', won=False),
+    }
+
+    results = {result.baseline: result for result in tally_results(agent, {'random': 'randomplayer1',
+                                                                          'exp_minmax': 'ExpectiminimaxP 1'})}
+
+    assert (results['random'].wins, results['random'].losses) == (1, 0)
+    assert (results['exp_minmax'].wins, results['exp_minmax'].losses) == (0, 1)
@@ -0,0 +1,76 @@
+from unittest.mock import Mock
+
+import numpy as np
+from poke_env.environment import Battle, Move, Pokemon, PokemonType
+import pytest
+
+from battlemaster.damage import MoveTable, DamageScorer
+
+
+def _given_battle(attacker: Pokemon, defender: Pokemon, moves) -> Battle:
+    battle = Mock(spec=Battle)
+    battle.active_pokemon = attacker
+    battle.opponent_active_pokemon = defender
+    battle.available_moves = [Move(move, gen=9) for move in moves]
+    return battle
+
+
+def _per_move_score(battle: Battle, move: Move) -> float:
+    stab_bonus = 1.5 if move.type in battle.active_pokemon.types else 1
+    return move.base_power * battle.opponent_active_pokemon.damage_multiplier(move) * stab_bonus
+
+
+class TestMoveTable:
+    @pytest.fixture
+    def table(self) -> MoveTable:
+        return MoveTable.for_gen(9)
+
+    def test_lookup_matches_moves(self, table):
+        moves = [Move(move, gen=9) for move in ['flamethrower', 'earthquake', 'swordsdance', 'hydropump']]
+
+        base_power, type_index, category = table.lookup(moves)
+
+        assert list(base_power) == [move.base_power for move in moves]
+        assert [table.types[index] for index in type_index] == [move.type for move in moves]
+
+    @pytest.mark.parametrize("move_type, type_1, type_2", [
+        (PokemonType.FIRE, PokemonType.GRASS, PokemonType.STEEL),
+        (PokemonType.GROUND, PokemonType.FLYING, None),
+        (PokemonType.WATER, PokemonType.WATER, PokemonType.DRAGON),
+        (PokemonType.NORMAL, PokemonType.THREE_QUESTION_MARKS, None),
+    ])
+    def test_effectiveness_matches_damage_multiplier(self, table, move_type, type_1, type_2):
+        effectiveness = table.effectiveness(np.array([table.index_of_type(move_type)]), type_1, type_2)
+
+        expected = move_type.damage_multiplier(type_1, type_2, type_chart=Pokemon(species='pikachu', gen=9)._data.type_chart)
+        assert effectiveness[0] == expected
+
+
+class TestDamageScorer:
+    @pytest.fixture
+    def battle(self) -> Battle:
+        return _given_battle(Pokemon(species='charizard', gen=9), Pokemon(species='ferrothorn', gen=9),
+                             ['flamethrower', 'earthquake', 'airslash', 'roost', 'thunderpunch'])
+
+    def test_scores_match_per_move_scores(self, battle):
+        scores = DamageScorer().score(battle, battle.available_moves)
+
+        assert list(scores) == [_per_move_score(battle, move) for move in battle.available_moves]
+
+    def test_no_moves(self, battle):
+        assert len(DamageScorer().score(battle, [])) == 0
+
+    def test_damage_formula_scores_status_moves_zero(self, battle):
+        scores = DamageScorer(use_stats=True).score(battle, battle.available_moves)
+
+        assert scores[3] == 0.
+        assert np.argmax(scores) == 0
+
+    def test_damage_formula_accounts_for_boosts(self, battle):
+        unboosted = DamageScorer(use_stats=True).score(battle, battle.available_moves)
+        battle.active_pokemon.boosts['spa'] = 2
+
+        boosted = DamageScorer(use_stats=True).score(battle, battle.available_moves)
+
+        assert boosted[0] > unboosted[0]
+        assert boosted[1] == unboosted[1]
@@ -0,0 +1,97 @@
+import logging
+import random
+
+import pytest
+
+from battlemaster.load import LoadMonitor, init_load_monitor
+
+
+class TestLoadMonitor:
+    @pytest.fixture
+    def monitor(self) -> LoadMonitor:
+        return LoadMonitor(target_ms=100, max_simulations=1, min_time_left=20, smoothing=0.5, rng=random.Random(0))
+
+    def test_idle_agent_can_try_hard(self, monitor: LoadMonitor):
+        assert monitor.shed_effort('battle-1') is None
+        assert len(monitor.downgrades) == 0
+
+    def test_latency_is_moving_average(self, monitor: LoadMonitor):
+        monitor.record_latency(0.1)
+        monitor.record_latency(0.3)
+
+        assert monitor.latency_ms == pytest.approx(200)
+
+    def test_sheds_while_simulation_in_flight(self, monitor: LoadMonitor):
+        with monitor.simulating():
+            assert monitor.simulations == 1
+            assert monitor.shed_effort('battle-1') == 'simulations'
+
+        assert monitor.simulations == 0
+        assert monitor.shed_effort('battle-1') is None
+
+    def test_sheds_when_turn_timer_runs_low(self, monitor: LoadMonitor):
+        monitor.record_time_left('battle-1', 'Time left: 15 sec this turn ')
+        monitor.record_time_left('battle-2', 'Time left: 150 sec this turn ')
+
+        assert monitor.shed_effort('battle-1') == 'timer'
+        assert monitor.shed_effort('battle-2') is None
+
+    def test_other_inactive_messages_are_ignored(self, monitor: LoadMonitor):
+        monitor.record_time_left('battle-1', 'Battle timer is ON: inactive players will automatically lose when time\'s up.')
+
+        assert monitor.time_left('battle-1') is None
+
+    def test_forgotten_battle_has_no_timer(self, monitor: LoadMonitor):
+        monitor.record_time_left('battle-1', 'Time left: 15 sec this turn ')
+
+        monitor.forget_battle('battle-1')
+
+        assert monitor.time_left('battle-1') is None
+
+    @pytest.mark.parametrize('latency_seconds, expected_share', [
+        (0.1, 0.),
+        (0.15, 0.5),
+        (0.2, 1.),
+        (0.5, 1.),
+    ])
+    def test_latency_shedding_grows_gradually(self, monitor: LoadMonitor, latency_seconds: float, expected_share: float):
+        monitor.record_latency(latency_seconds)
+
+        shed = sum(monitor.shed_effort('battle-1') == 'latency' for _ in range(1000))
+
+        assert shed / 1000 == pytest.approx(expected_share, abs=0.05)
+        assert monitor.downgrades['latency'] == shed
+
+    def test_target_must_be_positive(self):
+        with pytest.raises(ValueError):
+            LoadMonitor(target_ms=0)
+
+
+def test_init_load_monitor_is_disabled_without_target():
+    resource = init_load_monitor(None)
+
+    assert next(resource) is None
+
+
+def test_init_load_monitor_logs_downgrades_on_shutdown(caplog: pytest.LogCaptureFixture):
+    resource = init_load_monitor(100)
+    monitor = next(resource)
+    with monitor.simulating():
+        monitor.shed_effort('battle-1')
+
+    with caplog.at_level(logging.INFO):
+        with pytest.raises(StopIteration):
+            next(resource)
+
+    assert 'Downgraded 1 decisions to autopilot under load (simulations: 1)' in caplog.text
+
+
+def test_init_load_monitor_allows_a_simulation_per_worker():
+    monitor = next(init_load_monitor(100, simulation_workers=3))
+    for _ in range(2):
+        monitor.simulation_started()
+        assert monitor.shed_effort('battle-1') is None
+
+    monitor.simulation_started()
+
+    assert monitor.shed_effort('battle-1') == 'simulations'
@@ -0,0 +1,86 @@
+import io
+import logging
+import sys
+
+import pytest
+
+from battlemaster.logging_ext import ShowdownEventFilter, QueuedStreamHandler
+
+_RECEIVED = "\033[92m\033[1m<<<\033[0m %s"
+
+
+def _given_record(message: str, *args, level: int = logging.INFO) -> logging.LogRecord:
+    return logging.LogRecord('player', level, __file__, 1, message, args, None)
+
+
+class TestShowdownEventFilter:
+    @pytest.fixture
+    def event_filter(self) -> ShowdownEventFilter:
+        return ShowdownEventFilter(['request', 'move', 't:'])
+
+    @pytest.mark.parametrize("message", [
+        '|request|{"active": []}',
+        '>battle-gen9randombattle-1\n|\n|t:|1700000000\n|move|p1a: Pikachu|Thunderbolt|p2a: Eevee',
+    ])
+    def test_ignores_messages_with_ignored_events(self, event_filter: ShowdownEventFilter, message: str):
+        assert not event_filter.filter(_given_record(_RECEIVED, message))
+
+    @pytest.mark.parametrize("message", [
+        '>battle-gen9randombattle-1\n|\n|-damage|p2a: Eevee|20/100',
+        '|pm| Sir Skaro| btlmaster|I removed my last move',
+    ])
+    def test_keeps_messages_without_ignored_events(self, event_filter: ShowdownEventFilter, message: str):
+        assert event_filter.filter(_given_record(_RECEIVED, message))
+
+    def test_keeps_warnings(self, event_filter: ShowdownEventFilter):
+        assert event_filter.filter(_given_record(_RECEIVED, '|request|{}', level=logging.WARNING))
+
+    def test_matches_message_without_arguments(self, event_filter: ShowdownEventFilter):
+        assert not event_filter.filter(_given_record('|move|p1a: Pikachu|Thunderbolt|p2a: Eevee'))
+
+    def test_does_not_format_record(self, event_filter: ShowdownEventFilter):
+        class Unformattable:
+            def __str__(self):
+                raise AssertionError('record was formatted')
+
+        assert event_filter.filter(_given_record('I see %s', Unformattable()))
+
+
+def test_queued_stream_handler_writes_formatted_records():
+    stream = io.StringIO()
+    handler = QueuedStreamHandler(stream)
+    handler.setFormatter(logging.Formatter('[%(levelname)s] %(message)s'))
+
+    handler.handle(_given_record('I see %s', 'a pikachu'))
+    handler.close()
+
+    assert stream.getvalue() == '[INFO] I see a pikachu\n'
+
+
+def test_queued_stream_handler_renders_message_before_queueing():
+    stream = io.StringIO()
+    handler = QueuedStreamHandler(stream)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    state = ['pikachu']
+
+    handler.handle(_given_record('Searching through the state: %s', state))
+    state.append('eevee')
+    handler.close()
+
+    assert stream.getvalue() == "Searching through the state: ['pikachu']\n"
+
+
+def test_queued_stream_handler_writes_exceptions():
+    stream = io.StringIO()
+    handler = QueuedStreamHandler(stream)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    try:
+        raise ValueError('no moves left')
+    except ValueError:
+        record = logging.LogRecord('player', logging.ERROR, __file__, 1, 'Failed to decide', (), sys.exc_info())
+
+    handler.handle(record)
+    handler.close()
+
+    assert stream.getvalue().startswith('Failed to decide\nTraceback')
+    assert 'ValueError: no moves left' in stream.getvalue()
@@ -0,0 +1,46 @@
+import logging
+
+import pytest
+
+from battlemaster.memory import MemoryMonitor, resident_set_size, init_memory_monitor
+
+
+def test_resident_set_size():
+    assert resident_set_size() > 0
+
+
+class TestMemoryMonitor:
+    def test_sample_without_tracemalloc_has_no_growth(self):
+        monitor = MemoryMonitor(interval=60)
+
+        sample = monitor.sample()
+
+        assert sample.rss > 0
+        assert sample.top_growth == []
+
+    def test_sample_reports_top_growth(self):
+        monitor = MemoryMonitor(interval=60, tracemalloc_top=3)
+        monitor.start()
+        try:
+            monitor.sample()
+            leak = [bytearray(1024) for _ in range(1000)]
+            sample = monitor.sample()
+        finally:
+            monitor.stop()
+
+        assert 0 < len(sample.top_growth) <= 3
+        assert sample.top_growth[0].size_diff > 0
+        assert len(leak) == 1000
+
+    def test_stop_logs_final_sample(self, caplog: pytest.LogCaptureFixture):
+        monitor = MemoryMonitor(interval=60)
+        monitor.start()
+
+        with caplog.at_level(logging.INFO):
+            monitor.stop()
+
+        assert any(record.getMessage().startswith('RSS') for record in caplog.records)
+
+
+def test_init_memory_monitor_is_disabled_without_interval():
+    assert next(init_memory_monitor(None)) is None
@@ -0,0 +1,105 @@
+import gzip
+from unittest.mock import Mock, MagicMock
+from typing import List
+
+import pytest
+from poke_env.environment import Battle, Pokemon
+
+from battlemaster import opening_book as opening_book_module
+from battlemaster.adapters.poke_engine_adapter import Simulator
+from battlemaster.opening_book import OpeningBook, BookEntry, build_opening_book
+
+
+def _given_pokemon(species: str) -> Pokemon:
+    pokemon = Mock(spec=Pokemon)
+    pokemon.species = species
+    return pokemon
+
+
+def _given_battle(lead: str, opponent_lead: str, turn: int = 1) -> Battle:
+    battle = Mock(spec_set=Battle)
+    battle.turn = turn
+    battle.force_switch = False
+    battle.active_pokemon = _given_pokemon(lead)
+    battle.opponent_active_pokemon = _given_pokemon(opponent_lead)
+    return battle
+
+
+def _given_team_preview(team: List[str], opponent_team: List[str]) -> Battle:
+    battle = Mock(spec_set=Battle)
+    battle.team = {f'p1: {species}': _given_pokemon(species) for species in team}
+    battle.opponent_team = {f'p2: {species}': _given_pokemon(species) for species in opponent_team}
+    return battle
+
+
+@pytest.fixture
+def book() -> OpeningBook:
+    return OpeningBook({
+        ('garchomp', 'dragonite'): BookEntry('dragonclaw', 0.6),
+        ('garchomp', 'skarmory'): BookEntry('earthquake', -0.2),
+        ('corviknight', 'dragonite'): BookEntry('bravebird', 0.1),
+        ('corviknight', 'skarmory'): BookEntry('bulkup', 0.3),
+    })
+
+
+def test_opening_is_looked_up_by_leads(book: OpeningBook):
+    assert book.opening(_given_battle('garchomp', 'dragonite')) == 'dragonclaw'
+    assert book.opening(_given_battle('garchomp', 'gholdengo')) is None
+    assert (book.hits, book.misses) == (1, 1)
+
+
+def test_unavailable_opening_is_a_miss(book: OpeningBook):
+    assert book.opening(_given_battle('garchomp', 'dragonite'), lambda option: option != 'dragonclaw') is None
+    assert (book.hits, book.misses) == (0, 1)
+
+
+def test_only_first_turn_is_looked_up(book: OpeningBook):
+    assert book.opening(_given_battle('garchomp', 'dragonite', turn=2)) is None
+    assert (book.hits, book.misses) == (0, 0)
+
+
+def test_team_order_leads_with_best_average_payoff(book: OpeningBook):
+    battle = _given_team_preview(['pikachu', 'garchomp', 'corviknight'], ['dragonite', 'skarmory', 'gholdengo'])
+
+    # garchomp averages 0.2 against the opponent's team and corviknight 0.3
+    book.add('corviknight', 'gholdengo', BookEntry('roost', 0.5))
+
+    assert book.team_order(battle) == '/team 312'
+
+
+def test_team_order_without_openings_for_the_team(book: OpeningBook):
+    battle = _given_team_preview(['pikachu', 'snorlax'], ['dragonite'])
+
+    assert book.team_order(battle) is None
+
+
+def test_save_and_load(book: OpeningBook, tmp_path):
+    path = str(tmp_path / 'openings.json.gz')
+    book.save(path)
+
+    loaded = OpeningBook.load(path)
+
+    assert len(loaded) == len(book)
+    assert loaded.get('garchomp', 'dragonite') == BookEntry('dragonclaw', 0.6)
+
+
+def test_load_rejects_other_versions(tmp_path):
+    path = tmp_path / 'openings.json.gz'
+    with gzip.open(path, 'wt') as file:
+        file.write('{"version": 0, "entries": []}')
+
+    with pytest.raises(ValueError):
+        OpeningBook.load(str(path))
+
+
+def test_build_keeps_most_frequent_option(monkeypatch):
+    monkeypatch.setattr(opening_book_module.BattleSimulationAdapter, 'from_battle', MagicMock(side_effect=lambda battle: battle))
+    battles = [_given_battle('garchomp', 'dragonite') for _ in range(3)] + [_given_battle('garchomp', 'skarmory')]
+    simulator = Mock(spec=Simulator)
+    simulator.pick_safest_option = MagicMock(side_effect=[('dragonclaw', 0.4), ('switch corviknight', 0.9),
+                                                          ('dragonclaw', 0.6), ('switch corviknight', 0.1)])
+
+    book = build_opening_book(battles, simulator)
+
+    assert book.get('garchomp', 'dragonite') == BookEntry('dragonclaw', 0.5)
+    assert book.get('garchomp', 'skarmory') == BookEntry('corviknight', 0.1)
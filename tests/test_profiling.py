@@ -0,0 +1,93 @@
+import asyncio
+import pstats
+import threading
+import time
+
+import pytest
+
+from battlemaster.profiling import LoopProfiler, StackSampler, profile_loop
+
+
+def busy_decision():
+    total = 0
+    for i in range(200000):
+        total += i * i
+    return total
+
+
+async def play(loop_iterations: int):
+    for _ in range(loop_iterations):
+        busy_decision()
+        await asyncio.sleep(0)
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield loop
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+class TestLoopProfiler:
+    def test_profiles_the_loop_thread(self, loop, tmp_path):
+        profiler = LoopProfiler(loop, sample_interval=0.001)
+        profiler.start()
+        asyncio.run_coroutine_threadsafe(play(20), loop).result()
+        profiler.stop()
+        profiler.dump(str(tmp_path / 'run'))
+
+        stats = pstats.Stats(str(tmp_path / 'run.pstats'))
+        profiled_functions = [function_name for (_, _, function_name) in stats.stats]
+        assert 'busy_decision' in profiled_functions
+
+
+    def test_writes_collapsed_stacks(self, loop, tmp_path):
+        profiler = LoopProfiler(loop, sample_interval=0.001)
+        profiler.start()
+        asyncio.run_coroutine_threadsafe(play(20), loop).result()
+        profiler.stop()
+        profiler.dump(str(tmp_path / 'run'))
+
+        lines = (tmp_path / 'run.collapsed').read_text().splitlines()
+        assert len(lines) > 0
+        for line in lines:
+            stack, count = line.rsplit(' ', 1)
+            assert int(count) > 0
+        assert any('busy_decision' in line.split(';')[-1] for line in lines)
+
+
+    def test_profile_loop_writes_files_named_after_run(self, loop, tmp_path):
+        output_dir = tmp_path / 'profiles'
+        with profile_loop(str(output_dir), 'benchmark', loop):
+            asyncio.run_coroutine_threadsafe(play(5), loop).result()
+
+        written = sorted(path.suffix for path in output_dir.iterdir())
+        assert written == ['.collapsed', '.pstats']
+        assert all(path.name.startswith('benchmark-') for path in output_dir.iterdir())
+
+
+class TestStackSampler:
+    def test_collapses_stack_from_root_to_leaf(self):
+        sampler = StackSampler(threading.get_ident())
+
+        def leaf():
+            sampler.sample()
+
+        leaf()
+
+        stack = next(iter(sampler.stacks))
+        frames = stack.split(';')
+        # sampling the current thread, so the sampler itself is on top of the stack
+        assert frames[-1].startswith('sample ')
+        assert frames[-2].startswith('leaf ')
+        assert frames[-3].startswith('test_collapses_stack_from_root_to_leaf ')
+
+
+    def test_ignores_unknown_thread(self):
+        sampler = StackSampler(thread_id=-1)
+        sampler.sample()
+        assert len(sampler.stacks) == 0
@@ -0,0 +1,92 @@
+import json
+from pathlib import Path
+from unittest.mock import Mock
+
+import pytest
+
+from battlemaster.tracing import DecisionTracer, SpanWriter, TurnSpan, init_tracer
+
+
+@pytest.fixture
+def trace_path(tmp_path: Path) -> Path:
+    return tmp_path / 'spans.jsonl'
+
+
+def _read_spans(path: Path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+class TestSpanWriter:
+    def test_writes_spans_as_json_lines(self, trace_path: Path):
+        writer = SpanWriter(str(trace_path))
+        writer.write(TurnSpan('gen9randombattle-1', 1))
+        writer.write(TurnSpan('gen9randombattle-2', 7))
+        writer.close()
+
+        spans = _read_spans(trace_path)
+
+        assert [(span['battle_tag'], span['turn']) for span in spans] == [('gen9randombattle-1', 1), ('gen9randombattle-2', 7)]
+
+
+class TestDecisionTracer:
+    @pytest.fixture
+    def writer(self) -> SpanWriter:
+        return Mock(spec=SpanWriter)
+
+    @pytest.fixture
+    def tracer(self, writer: SpanWriter) -> DecisionTracer:
+        return DecisionTracer(writer)
+
+    def test_finish_writes_span(self, tracer: DecisionTracer, writer):
+        tracer.start('gen9randombattle-1', 3)
+        tracer.finish('/choose move tackle', False)
+
+        span: TurnSpan = writer.write.call_args.args[0]
+        assert span.turn == 3
+        assert span.order == '/choose move tackle'
+        assert not span.fallback
+        assert span.total_ms >= 0
+        assert tracer.current is None
+
+    def test_finish_without_span_does_nothing(self, tracer: DecisionTracer, writer):
+        tracer.finish('/choose move tackle', True)
+
+        writer.write.assert_not_called()
+
+    def test_instrument_times_subsystem_steps_into_current_span(self, tracer: DecisionTracer):
+        subsystem = Mock()
+        subsystem.step = Mock(return_value=None)
+        tracer.instrument({'nacs': subsystem})
+
+        span = tracer.start('gen9randombattle-1', 3)
+        subsystem.step()
+        subsystem.step()
+
+        assert 'nacs' in span.step_ms
+        assert span.step_ms['nacs'] >= 0
+
+    def test_instrumented_steps_outside_of_span_are_not_recorded(self, tracer: DecisionTracer):
+        subsystem = Mock()
+        subsystem.step = Mock(return_value=None)
+        tracer.instrument({'acs': subsystem})
+
+        subsystem.step()
+        span = tracer.start('gen9randombattle-1', 3)
+
+        assert span.step_ms == {}
+
+
+def test_init_tracer_is_disabled_without_path():
+    assert next(init_tracer(None)) is None
+
+
+def test_init_tracer_closes_writer(trace_path: Path):
+    resource = init_tracer(str(trace_path))
+    tracer = next(resource)
+    tracer.start('gen9randombattle-1', 1)
+    tracer.finish('/choose switch pikachu', True)
+
+    with pytest.raises(StopIteration):
+        next(resource)
+
+    assert _read_spans(trace_path)[0]['fallback'] is True